@@ -0,0 +1,756 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for finding tests without importing their modules.
+
+Importing a large test suite can take a long time, since test modules tend to
+import heavy toolkit bindings. Instead, test modules are parsed, and the test
+ids they would contain are worked out from the syntax tree, following the same
+rules as unittest's test discovery. What is learned from each file is cached
+on disk, keyed by the file's modification time, size and content hash.
+
+Modules are only imported once one of their tests is about to run, or when
+the syntax tree isn't enough to know which tests a module contains (for
+example, if it defines a load_tests function, or builds its test classes at
+import time). Those modules are imported during discovery, as before.
+
+"""
+
+import ast
+from collections import OrderedDict
+from fnmatch import fnmatch
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+from unittest import TestLoader, TestSuite
+from unittest.loader import _make_failed_import_test
+
+from testtools import iterate_tests
+
+
+_logger = logging.getLogger(__name__)
+
+# Bump this whenever the format of the cached module details changes.
+INDEX_VERSION = 1
+
+DEFAULT_PATTERN = 'test*.py'
+
+# The same module file names unittest's test discovery accepts.
+_VALID_MODULE_NAME = re.compile(r'[_a-z]\w*\.py$', re.IGNORECASE)
+
+# Base classes that live outside of the indexed tree, that are known to make
+# a class a test case, without adding any test methods to it.
+_TEST_CASE_BASES = frozenset([
+    'autopilot.testcase.AutopilotTestCase',
+    'testscenarios.TestWithScenarios',
+    'testscenarios.testcase.TestWithScenarios',
+    'testtools.TestCase',
+    'testtools.testcase.TestCase',
+    'unittest.TestCase',
+    'unittest.case.TestCase',
+])
+
+# Base classes that live outside of the indexed tree, that are known not to
+# add test methods or scenarios to a class.
+_OTHER_BASES = frozenset([
+    'builtins.object',
+    'testscenarios.WithScenarios',
+    'testscenarios.testcase.WithScenarios',
+])
+
+# The scenarios of a test that can only be found by importing its module.
+UNKNOWN_SCENARIOS = object()
+
+
+class _NeedsImport(Exception):
+    """Raised when a module must be imported to find the tests in it."""
+
+
+def get_default_index_path():
+    """Return the path of the discovery index in the user's cache directory.
+    """
+    cache_directory = os.environ.get(
+        'XDG_CACHE_HOME',
+        os.path.expanduser('~/.cache')
+    )
+    return os.path.join(cache_directory, 'autopilot', 'discovery-index.json')
+
+
+def parse_module(source):
+    """Return what can be learned about a test module from its source.
+
+    :param source: The source code of the module, as bytes.
+    :returns: A JSON-serialisable dictionary. If 'dynamic' is true, the module
+        must be imported to find the tests in it. If 'load_tests' is true, the
+        module has a load_tests function.
+
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return dict(dynamic=True, load_tests=False)
+
+    details = dict(
+        dynamic=False,
+        load_tests=False,
+        imports={},
+        required=[],
+        classes={},
+    )
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            details['classes'][node.name] = _parse_class(node)
+            details['imports'].pop(node.name, None)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name == 'load_tests':
+                details['load_tests'] = True
+            details['classes'].pop(node.name, None)
+            details['imports'].pop(node.name, None)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            _parse_import(node, details)
+        elif isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign)):
+            _parse_module_assignment(node, details)
+        elif any(isinstance(n, ast.ClassDef) for n in ast.walk(node)):
+            # Classes defined conditionally, or in a loop.
+            details['dynamic'] = True
+    if 'load_tests' in details['imports']:
+        details['load_tests'] = True
+    if details['load_tests']:
+        details['dynamic'] = True
+    return details
+
+
+def _parse_import(node, details):
+    if isinstance(node, ast.Import):
+        for alias in node.names:
+            if alias.asname:
+                local_name, target = alias.asname, alias.name
+            else:
+                local_name = target = alias.name.split('.')[0]
+            details['imports'][local_name] = [0, target]
+            details['classes'].pop(local_name, None)
+            details['required'].append(alias.name.split('.')[0])
+    else:
+        module = node.module or ''
+        for alias in node.names:
+            if alias.name == '*':
+                continue
+            target = '.'.join(filter(None, [module, alias.name]))
+            local_name = alias.asname or alias.name
+            details['imports'][local_name] = [node.level, target]
+            details['classes'].pop(local_name, None)
+        if node.level == 0:
+            details['required'].append(module.split('.')[0])
+
+
+def _parse_module_assignment(node, details):
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+    for target in targets:
+        for name_node in ast.walk(target):
+            if isinstance(name_node, ast.Name):
+                if name_node.id == 'load_tests':
+                    details['load_tests'] = True
+                # A name that is later rebound is no longer the class or
+                # import that was recorded for it.
+                details['classes'].pop(name_node.id, None)
+                details['imports'].pop(name_node.id, None)
+            elif isinstance(name_node, ast.Attribute):
+                # Something like 'SomeTests.scenarios = ...'.
+                details['dynamic'] = True
+
+
+def _parse_class(node):
+    details = dict(
+        bases=[_get_dotted_name(base) for base in node.bases],
+        tests=[],
+        dynamic=bool(node.keywords),
+    )
+    for item in node.body:
+        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if item.name.startswith('test') or item.name == 'runTest':
+                details['tests'].append(item.name)
+        elif isinstance(item, (ast.Assign, ast.AnnAssign)):
+            targets = (
+                item.targets if isinstance(item, ast.Assign) else [item.target]
+            )
+            for target in targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                if target.id == 'scenarios':
+                    details['scenarios'] = _parse_scenarios(item.value)
+                elif target.id.startswith('test') or target.id == 'runTest':
+                    # Can't tell whether the attribute is callable.
+                    details['dynamic'] = True
+    details['tests'] = sorted(set(details['tests']))
+    return details
+
+
+def _parse_scenarios(node):
+    """Return the scenario names from a class's 'scenarios' assignment.
+
+    Scenario names that aren't string literals are None. Scenarios that
+    aren't a list literal are None, as autopilot only uses scenarios that
+    are lists, and 'unknown' if they can only be found by running code.
+
+    """
+    if isinstance(node, ast.List):
+        return [
+            _get_scenario_name(scenario) for scenario in node.elts
+        ]
+    if isinstance(node, ast.Constant):
+        return None
+    return 'unknown'
+
+
+def _get_scenario_name(node):
+    if (
+        isinstance(node, ast.Tuple)
+        and node.elts
+        and isinstance(node.elts[0], ast.Constant)
+        and isinstance(node.elts[0].value, str)
+    ):
+        return node.elts[0].value
+    return None
+
+
+def _get_dotted_name(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.insert(0, node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.insert(0, node.id)
+    return '.'.join(parts)
+
+
+class DiscoveryIndex(object):
+
+    """An on-disk cache of what was learned from parsing each test module."""
+
+    def __init__(self, path=None):
+        self.path = path or get_default_index_path()
+        self._entries = self._read_entries()
+        self._changed = False
+
+    def _read_entries(self):
+        try:
+            with open(self.path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (
+            not isinstance(index, dict)
+            or index.get('version') != INDEX_VERSION
+        ):
+            return {}
+        return index.get('files', {})
+
+    def get_module_details(self, path):
+        """Return the parsed details of the module at *path*.
+
+        The module is only parsed again if it has changed since it was last
+        parsed.
+
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self._entries.get(path)
+        if (
+            entry is not None
+            and entry['mtime_ns'] == stat.st_mtime_ns
+            and entry['size'] == stat.st_size
+        ):
+            return entry['details']
+
+        with open(path, 'rb') as f:
+            source = f.read()
+        digest = hashlib.sha1(source).hexdigest()
+        if entry is None or entry['sha1'] != digest:
+            entry = dict(sha1=digest, details=parse_module(source))
+        entry['mtime_ns'] = stat.st_mtime_ns
+        entry['size'] = stat.st_size
+        self._entries[path] = entry
+        self._changed = True
+        return entry['details']
+
+    def save(self):
+        """Write the index back to disk, if anything changed.
+
+        Failing to write the index is not an error, it just means the modules
+        have to be parsed again next time.
+
+        """
+        if not self._changed:
+            return
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Several autopilot processes may be saving the index at once,
+            # so write it to a temporary file and move that into place.
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(
+                    dict(version=INDEX_VERSION, files=self._entries),
+                    f
+                )
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            _logger.debug(
+                "Unable to save discovery index to %s: %s",
+                self.path,
+                e
+            )
+        else:
+            self._changed = False
+
+
+class IndexedTest(object):
+
+    """A test that was found without importing its module.
+
+    The module is imported, and the real test loaded from it, by
+    load_indexed_tests().
+    """
+
+    def __init__(self, test_id, module_name, scenarios, module_loader,
+                 module_path=None):
+        self._test_id = test_id
+        self.module_name = module_name
+        self.module_path = module_path
+        self._scenarios = scenarios
+        self._module_loader = module_loader
+
+    def id(self):
+        return self._test_id
+
+    def __str__(self):
+        return self._test_id
+
+    def __repr__(self):
+        return '<IndexedTest %s>' % self._test_id
+
+    def countTestCases(self):
+        return 1
+
+    @property
+    def scenarios(self):
+        if self._scenarios is UNKNOWN_SCENARIOS:
+            test = self.load()
+            self._scenarios = getattr(test, 'scenarios', None)
+        return self._scenarios
+
+    def load(self):
+        """Import the test's module, and return the real test."""
+        return self._module_loader.get_test(self.module_name, self._test_id)
+
+    def run(self, result=None):
+        return self.load().run(result)
+
+    def __call__(self, result=None):
+        return self.run(result)
+
+
+class _ModuleLoader(object):
+
+    """Import test modules, each at most once, and look up tests in them."""
+
+    def __init__(self):
+        self._loader = TestLoader()
+        self._modules = {}
+
+    def get_test(self, module_name, test_id):
+        """Return the test with id *test_id* from module *module_name*.
+
+        If the module can't be imported, or the test isn't in it, the returned
+        test reports that as an error when it is run.
+
+        """
+        if module_name not in self._modules:
+            self._modules[module_name] = self._load_module(module_name)
+        tests, load_errors = self._modules[module_name]
+        if test_id in tests:
+            return tests[test_id]
+        if load_errors:
+            return load_errors[0]
+        return _first_test(self._loader.loadTestsFromName(test_id))
+
+    def _load_module(self, module_name):
+        tests = OrderedDict()
+        load_errors = []
+        for test in iterate_tests(_load_module_tests(module_name)):
+            if test.id().startswith('unittest.loader'):
+                load_errors.append(test)
+            else:
+                tests.setdefault(test.id(), test)
+        return tests, load_errors
+
+
+def _load_module_tests(module_name):
+    """Import a module, and return a TestSuite of the tests in it.
+
+    If the module can't be imported, the suite contains a test that reports
+    the error, just like the ones unittest's test discovery creates.
+
+    """
+    try:
+        __import__(module_name)
+    except Exception:
+        failed_test, _ = _make_failed_import_test(module_name, TestSuite)
+        return failed_test
+    return TestLoader().loadTestsFromModule(sys.modules[module_name])
+
+
+def _first_test(test_suite):
+    return next(iter(iterate_tests(test_suite)))
+
+
+def load_indexed_tests(test_suite):
+    """Return a TestSuite with the real tests in place of any IndexedTests.
+
+    Only the modules of indexed tests in *test_suite* are imported. A module
+    that can't be imported is reported once, however many of its tests were
+    requested.
+
+    """
+    tests = []
+    load_errors = set()
+    for test in iterate_tests(test_suite):
+        if isinstance(test, IndexedTest):
+            test = test.load()
+            if test.id().startswith('unittest.loader'):
+                if test in load_errors:
+                    continue
+                load_errors.add(test)
+        tests.append(test)
+    return TestSuite(tests)
+
+
+def discover_tests(test_name, top_level_dir, discovery_index,
+                   pattern=DEFAULT_PATTERN):
+    """Find the tests for *test_name* in the same way that run.py's
+    _discover_test does, but without importing modules that don't need to be.
+
+    :param test_name: A dotted package, module or test name.
+    :param top_level_dir: The directory *test_name* is relative to.
+    :param discovery_index: The DiscoveryIndex to use.
+    :returns: A TestSuite, or None if the tests for *test_name* can only be
+        found by importing it.
+
+    """
+    location = _find_module_in_tree(test_name, top_level_dir)
+    if location is None:
+        return None
+    module_name, path, is_package = location
+
+    if top_level_dir not in sys.path:
+        # Test discovery does the same, so test modules can be imported.
+        sys.path.insert(0, top_level_dir)
+    finder = _TestFinder(top_level_dir, discovery_index)
+    try:
+        if module_name != test_name:
+            # A class or test in a module, which is loaded by name.
+            tests = [
+                t for t in finder.get_module_tests(module_name, path)
+                if t.id() == test_name or t.id().startswith(test_name + '.')
+            ]
+            return TestSuite(tests) if tests else None
+        if not is_package:
+            # Discovering from a module name discovers the whole package
+            # that contains it.
+            if '.' not in module_name:
+                return None
+            module_name = module_name.rpartition('.')[0]
+        return TestSuite(
+            finder.find_package_tests(
+                module_name,
+                os.path.dirname(path),
+                pattern
+            )
+        )
+    except _NeedsImport:
+        return None
+
+
+def _find_module_in_tree(test_name, top_level_dir):
+    """Return the longest leading part of *test_name* that is a module in
+    *top_level_dir*, as a tuple of (module name, path, is package), or None.
+    """
+    parts = test_name.split('.')
+    for i in range(len(parts), 0, -1):
+        base_path = os.path.join(top_level_dir, *parts[:i])
+        init_path = os.path.join(base_path, '__init__.py')
+        if os.path.isfile(init_path):
+            return '.'.join(parts[:i]), init_path, True
+        if os.path.isfile(base_path + '.py'):
+            return '.'.join(parts[:i]), base_path + '.py', False
+    return None
+
+
+class _TestFinder(object):
+
+    """Work out the tests in a tree of modules from their parsed details."""
+
+    def __init__(self, top_level_dir, discovery_index):
+        self._top_level_dir = top_level_dir
+        self._index = discovery_index
+        self._module_loader = _ModuleLoader()
+        self._class_details = {}
+        self._required_modules = {}
+
+    def find_package_tests(self, package_name, directory, pattern):
+        """Return the tests in a package, in test discovery order.
+
+        :raises _NeedsImport: if a package in the tree has a load_tests
+            function, which controls discovery in that package.
+
+        """
+        init_path = os.path.join(directory, '__init__.py')
+        if self._index.get_module_details(init_path)['load_tests']:
+            raise _NeedsImport()
+        tests = self.get_module_tests(package_name, init_path)
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                if _VALID_MODULE_NAME.match(name) and fnmatch(name, pattern):
+                    tests.extend(
+                        self.get_module_tests(
+                            package_name + '.' + name[:-3],
+                            path
+                        )
+                    )
+            elif os.path.isfile(os.path.join(path, '__init__.py')):
+                tests.extend(
+                    self.find_package_tests(
+                        package_name + '.' + name,
+                        path,
+                        pattern
+                    )
+                )
+        return tests
+
+    def get_module_tests(self, module_name, path):
+        """Return the tests in one module, in the order unittest loads them.
+
+        Modules whose tests can't be found from their syntax tree are
+        imported, and their real tests returned.
+
+        """
+        details = self._index.get_module_details(path)
+        try:
+            return self._get_indexed_module_tests(module_name, details)
+        except _NeedsImport:
+            pass
+        return list(iterate_tests(_load_module_tests(module_name)))
+
+    def _get_indexed_module_tests(self, module_name, details):
+        if details['dynamic']:
+            raise _NeedsImport()
+        self._check_required_modules(details)
+        tests = []
+        # unittest loads test cases from a module in the order of dir(), so
+        # imported test cases are loaded too.
+        for name in sorted(set(details['classes']) | set(details['imports'])):
+            try:
+                location = self._resolve(module_name, name)
+            except _NeedsImport:
+                if name in details['classes']:
+                    raise
+                # Something imported from the tree that isn't a class.
+                continue
+            if isinstance(location, str):
+                # Test cases from outside of the tree aren't looked for.
+                continue
+            is_test_case, test_names, scenarios = self._get_class_details(
+                *location
+            )
+            if not is_test_case:
+                continue
+            class_module, class_name = location
+            tests.extend(
+                IndexedTest(
+                    '%s.%s.%s' % (class_module, class_name, test_name),
+                    class_module,
+                    None if scenarios is _NOT_SET else scenarios,
+                    self._module_loader,
+                    self._find_module_path(class_module)
+                )
+                for test_name in _get_test_names(test_names)
+            )
+        return tests
+
+    def _check_required_modules(self, details):
+        for required in details['required']:
+            if required not in self._required_modules:
+                self._required_modules[required] = (
+                    self._find_module_path(required) is not None
+                    or _is_importable(required)
+                )
+            if not self._required_modules[required]:
+                # Import the module, so the import error is reported.
+                raise _NeedsImport()
+
+    def _find_module_path(self, module_name):
+        base_path = os.path.join(self._top_level_dir, *module_name.split('.'))
+        init_path = os.path.join(base_path, '__init__.py')
+        for path in (init_path, base_path + '.py'):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _get_module_details(self, module_name):
+        path = self._find_module_path(module_name)
+        if path is None:
+            return None
+        return self._index.get_module_details(path)
+
+    def _resolve(self, module_name, dotted_name, seen=None):
+        """Find what *dotted_name* refers to in module *module_name*.
+
+        :returns: A tuple of (module name, class name) for a class defined in
+            the tree, or the full dotted name of something outside it.
+        :raises _NeedsImport: if the name can't be resolved.
+
+        """
+        if dotted_name is None:
+            raise _NeedsImport()
+        seen = seen or set()
+        if (module_name, dotted_name) in seen:
+            raise _NeedsImport()
+        seen.add((module_name, dotted_name))
+
+        details = self._get_module_details(module_name)
+        if details is None:
+            return '%s.%s' % (module_name, dotted_name)
+        if details['dynamic']:
+            raise _NeedsImport()
+        first, _, rest = dotted_name.partition('.')
+        if first in details['classes'] and not rest:
+            return module_name, first
+        if first in details['imports']:
+            level, target = details['imports'][first]
+            target = _make_absolute(
+                target,
+                level,
+                module_name,
+                self._is_package(module_name)
+            )
+            return self._resolve_absolute(
+                '.'.join(filter(None, [target, rest])),
+                seen
+            )
+        if first == 'object' and not rest:
+            return 'builtins.object'
+        raise _NeedsImport()
+
+    def _resolve_absolute(self, dotted_name, seen):
+        parts = dotted_name.split('.')
+        for i in range(len(parts) - 1, 0, -1):
+            module_name = '.'.join(parts[:i])
+            if self._find_module_path(module_name) is not None:
+                return self._resolve(module_name, '.'.join(parts[i:]), seen)
+        return dotted_name
+
+    def _is_package(self, module_name):
+        path = self._find_module_path(module_name)
+        return path is not None and os.path.basename(path) == '__init__.py'
+
+    def _get_class_details(self, module_name, class_name):
+        """Return a tuple of (is test case, test method names, scenarios)
+        for a class defined in the tree.
+        """
+        key = (module_name, class_name)
+        if key not in self._class_details:
+            # Guard against a class that (indirectly) inherits from itself.
+            self._class_details[key] = None
+            self._class_details[key] = self._work_out_class_details(
+                module_name,
+                class_name
+            )
+        if self._class_details[key] is None:
+            raise _NeedsImport()
+        return self._class_details[key]
+
+    def _work_out_class_details(self, module_name, class_name):
+        details = self._get_module_details(module_name)
+        class_details = details['classes'][class_name]
+        if class_details['dynamic']:
+            raise _NeedsImport()
+        is_test_case = False
+        test_names = set(class_details['tests'])
+        scenarios = _get_own_scenarios(class_details)
+        for base in class_details['bases']:
+            location = self._resolve(module_name, base)
+            if isinstance(location, str):
+                if location in _TEST_CASE_BASES:
+                    is_test_case = True
+                elif location not in _OTHER_BASES:
+                    raise _NeedsImport()
+                continue
+            base_is_test_case, base_test_names, base_scenarios = (
+                self._get_class_details(*location)
+            )
+            is_test_case = is_test_case or base_is_test_case
+            test_names |= base_test_names
+            if scenarios is _NOT_SET:
+                scenarios = base_scenarios
+        return is_test_case, frozenset(test_names), scenarios
+
+
+_NOT_SET = object()
+
+
+def _get_own_scenarios(class_details):
+    if 'scenarios' not in class_details:
+        return _NOT_SET
+    scenarios = class_details['scenarios']
+    if scenarios == 'unknown':
+        return UNKNOWN_SCENARIOS
+    return scenarios
+
+
+def _get_test_names(test_names):
+    """Return the test method names unittest would load from a class."""
+    names = sorted(n for n in test_names if n.startswith('test'))
+    if not names and 'runTest' in test_names:
+        return ['runTest']
+    return names
+
+
+def _make_absolute(target, level, module_name, is_package):
+    if level == 0:
+        return target
+    package_parts = module_name.split('.')
+    if not is_package:
+        package_parts = package_parts[:-1]
+    if level > 1:
+        package_parts = package_parts[:-(level - 1)]
+    return '.'.join(filter(None, ['.'.join(package_parts), target]))
+
+
+def _is_importable(module_name):
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,244 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for merging the results of several test runs.
+
+Results files are read twice, one test at a time, so that memory use doesn't
+grow with the number of tests or the size of their details. The first pass
+finds the last run of each test and the span of time the runs cover. The
+second pass reports only those last runs, so a test that was run again, by a
+later shard or a rerun, is reported once, with its latest outcome.
+
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import os
+from xml.etree import ElementTree
+
+from subunit import ByteStreamToStreamResult
+from testtools import StreamResult, StreamToExtendedDecorator
+
+
+# The first byte of every subunit v2 packet.
+_SUBUNIT_SIGNATURE = b'\xb3'
+
+_FINAL_STATUSES = frozenset(('success', 'fail', 'skip', 'xfail', 'uxsuccess'))
+
+
+def get_results_format(path):
+    """Return the format of the results file at *path*.
+
+    :returns: 'subunit' or 'xml'.
+    :raises ValueError: if the file is in neither format.
+
+    """
+    with open(path, 'rb') as results_file:
+        head = results_file.read(4096)
+    if head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<'):
+        return 'xml'
+    if _SUBUNIT_SIGNATURE in head:
+        return 'subunit'
+    raise ValueError(
+        "%s is not a subunit or JUnit XML results file." % path
+    )
+
+
+def merge_results(paths, result):
+    """Report the tests in the results files at *paths* to *result*.
+
+    Each test is reported once, with the outcome of its last run. Runs in
+    later files come after runs in earlier files. Test durations are kept,
+    but the runs are moved in time to start when the merge starts, so that
+    the duration of the merged run covers all of them.
+
+    :param paths: The paths of subunit or JUnit XML results files.
+    :param result: The test result to report to. startTestRun and
+        stopTestRun are called on it.
+    :returns: *result*
+    :raises ValueError: if any of the files cannot be read.
+
+    """
+    formats = [get_results_format(path) for path in paths]
+    last_runs = {}
+    scanners = []
+    for index, (path, format) in enumerate(zip(paths, formats)):
+        scanner = _ResultsScanner(index, last_runs)
+        _read_results(path, format, scanner)
+        scanners.append(scanner)
+
+    timestamps = [
+        t for s in scanners for t in (s.first_timestamp, s.last_timestamp)
+        if t is not None
+    ]
+    start_time = datetime.now(timezone.utc)
+    time_offset = start_time - min(timestamps, default=start_time)
+    end_time = max(timestamps, default=start_time) + time_offset
+
+    merged_result = _MergedStreamToExtendedDecorator(result, end_time)
+    merged_result.startTestRun()
+    try:
+        for index, (path, format) in enumerate(zip(paths, formats)):
+            _read_results(
+                path,
+                format,
+                _LastRunFilter(merged_result, index, last_runs, time_offset)
+            )
+    finally:
+        merged_result.stopTestRun()
+    return result
+
+
+class _MergedStreamToExtendedDecorator(StreamToExtendedDecorator):
+
+    """Forward stream events to *decorated*, ending the run at *end_time*."""
+
+    def __init__(self, decorated, end_time):
+        super().__init__(decorated)
+        self._end_time = end_time
+
+    def stopTestRun(self):
+        self.hook.stopTestRun()
+        self.decorated.time(self._end_time)
+        self.decorated.stopTestRun()
+
+
+class _ResultsScanner(StreamResult):
+
+    """Record the last run of each test in a results file, and the first and
+    last times in it.
+
+    """
+
+    def __init__(self, file_index, last_runs):
+        super().__init__()
+        self._file_index = file_index
+        self._last_runs = last_runs
+        self._run_counts = defaultdict(int)
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def status(self, test_id=None, test_status=None, timestamp=None,
+               **kwargs):
+        if timestamp is not None:
+            if self.first_timestamp is None:
+                self.first_timestamp = self.last_timestamp = timestamp
+            self.first_timestamp = min(self.first_timestamp, timestamp)
+            self.last_timestamp = max(self.last_timestamp, timestamp)
+        if test_id is not None and test_status in _FINAL_STATUSES:
+            run = self._run_counts[test_id]
+            self._run_counts[test_id] += 1
+            self._last_runs[test_id] = (self._file_index, run)
+
+
+class _LastRunFilter(StreamResult):
+
+    """Forward the events of the last run of each test to *target*, moved in
+    time by *time_offset*.
+
+    """
+
+    def __init__(self, target, file_index, last_runs, time_offset):
+        super().__init__()
+        self._target = target
+        self._file_index = file_index
+        self._last_runs = last_runs
+        self._time_offset = time_offset
+        self._run_counts = defaultdict(int)
+
+    def status(self, test_id=None, test_status=None, timestamp=None,
+               **kwargs):
+        # Output that isn't part of any test isn't merged.
+        if test_id is None:
+            return
+        run = self._run_counts[test_id]
+        if test_status in _FINAL_STATUSES:
+            self._run_counts[test_id] += 1
+        if self._last_runs.get(test_id) != (self._file_index, run):
+            return
+        if timestamp is not None:
+            timestamp += self._time_offset
+        self._target.status(
+            test_id=test_id,
+            test_status=test_status,
+            timestamp=timestamp,
+            **kwargs
+        )
+
+
+def _read_results(path, format, stream_result):
+    if format == 'subunit':
+        with open(path, 'rb') as results_file:
+            ByteStreamToStreamResult(
+                results_file,
+                non_subunit_name='stdout'
+            ).run(stream_result)
+    else:
+        try:
+            _read_junit_xml(path, stream_result)
+        except ElementTree.ParseError as e:
+            raise ValueError("Unable to read %s: %s" % (path, e))
+
+
+def _read_junit_xml(path, stream_result):
+    """Report the tests in the JUnit XML file at *path* to *stream_result*.
+
+    JUnit XML only records test durations, so tests are given times one after
+    the other, ending when the file was last modified.
+
+    """
+    time = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+    for event, element in ElementTree.iterparse(path, ('start', 'end')):
+        if event == 'start' and element.tag == 'testsuite':
+            time -= timedelta(seconds=float(element.get('time', 0)))
+        elif event == 'end' and element.tag == 'testcase':
+            test_id = '%s.%s' % (element.get('classname'), element.get('name'))
+            stream_result.status(
+                test_id=test_id, test_status='inprogress', timestamp=time)
+            time += timedelta(seconds=float(element.get('time', 0)))
+            test_status, file_name, text = _get_junit_outcome(element)
+            if file_name is not None:
+                stream_result.status(
+                    test_id=test_id,
+                    file_name=file_name,
+                    file_bytes=text.encode('utf-8'),
+                    mime_type='text/plain;charset=utf8',
+                    eof=True,
+                    timestamp=time,
+                )
+            stream_result.status(
+                test_id=test_id, test_status=test_status, timestamp=time)
+            element.clear()
+
+
+def _get_junit_outcome(testcase):
+    """Return a tuple of (test status, detail name, detail text) for the
+    JUnit XML *testcase* element. The detail name is None if there is no
+    detail.
+
+    """
+    for child in testcase:
+        text = child.text or child.get('message') or ''
+        if child.tag in ('failure', 'error'):
+            if child.get('type', '').endswith('_UnexpectedSuccess'):
+                return 'uxsuccess', None, None
+            return 'fail', 'traceback', text
+        if child.tag in ('skip', 'skipped'):
+            return 'skip', 'reason', text
+    return 'success', None, None
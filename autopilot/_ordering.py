@@ -0,0 +1,170 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for choosing the order tests are run in.
+
+Each ordering is a function that is passed the list of tests to run, in
+discovery order, and a TestHistory describing previous test runs, and returns
+the tests in the order they should be run in. Orderings sort stably, so tests
+that an ordering considers equal stay in discovery order.
+
+"""
+
+import os
+import sys
+
+from autopilot._timing import (
+    get_recorded_durations,
+    get_recorded_last_runs,
+    split_scenario_from_test_id,
+)
+
+
+class TestHistory(object):
+
+    """What is known about previous runs of tests.
+
+    The timing database is only read once something from it is needed.
+    """
+
+    def __init__(self, timing_database_path=None):
+        self._timing_database_path = timing_database_path
+        self._durations = None
+        self._last_runs = None
+        self._module_mtimes = {}
+
+    def get_duration(self, test):
+        """Return the recorded duration of *test* in seconds, or None."""
+        if self._durations is None:
+            self._durations = get_recorded_durations(
+                self._timing_database_path
+            )
+        return self._durations.get(_get_base_id(test))
+
+    def get_last_run(self, test):
+        """Return the LastRun of *test*, or None if it was never recorded."""
+        if self._last_runs is None:
+            self._last_runs = get_recorded_last_runs(
+                self._timing_database_path
+            )
+        return self._last_runs.get(_get_base_id(test))
+
+    def get_module_mtime(self, test):
+        """Return when the module *test* is defined in last changed, or None
+        if that can't be found.
+        """
+        path = _get_module_path(test)
+        if path not in self._module_mtimes:
+            try:
+                self._module_mtimes[path] = os.stat(path).st_mtime
+            except (OSError, TypeError):
+                self._module_mtimes[path] = None
+        return self._module_mtimes[path]
+
+
+def _get_base_id(test):
+    test_id, _ = split_scenario_from_test_id(test.id())
+    return test_id
+
+
+def _get_module_path(test):
+    # Tests found by the discovery index know their module's path, without
+    # the module having been imported.
+    path = getattr(test, 'module_path', None)
+    if path is None:
+        module = sys.modules.get(type(test).__module__)
+        path = getattr(module, '__file__', None)
+    return path
+
+
+def get_test_orderings():
+    """Get the different orders tests can be run in.
+
+    :returns: dict of ordering names and the functions that order tests
+
+    """
+    return {
+        'failed-first': _order_failed_first,
+        'slowest-first': _order_slowest_first,
+        'fastest-first': _order_fastest_first,
+        'changed-first': _order_changed_first,
+    }
+
+
+def order_tests(tests, ordering, timing_database_path=None):
+    """Return *tests* in the order named *ordering*.
+
+    :param tests: An iterable of tests, in discovery order.
+    :param ordering: The name of one of the orderings returned by
+        get_test_orderings().
+    :param timing_database_path: The path to the timing database previous
+        test runs were recorded in, or None to use the default location.
+    :returns: A list of tests.
+
+    """
+    order = get_test_orderings()[ordering]
+    return order(list(tests), TestHistory(timing_database_path))
+
+
+def _order_failed_first(tests, history):
+    """Run tests that failed last time first, quickest first, followed by
+    every other test.
+    """
+    def key(test):
+        last_run = history.get_last_run(test)
+        if last_run is None or not last_run.failed:
+            return (1, 0.0)
+        return (0, history.get_duration(test) or 0.0)
+    return sorted(tests, key=key)
+
+
+def _order_slowest_first(tests, history):
+    """Run the slowest tests first. Tests with no recorded duration might be
+    slow, so they go before every other test.
+    """
+    def key(test):
+        duration = history.get_duration(test)
+        return (0, 0.0) if duration is None else (1, -duration)
+    return sorted(tests, key=key)
+
+
+def _order_fastest_first(tests, history):
+    """Run the fastest tests first. Tests with no recorded duration go after
+    every other test.
+    """
+    def key(test):
+        duration = history.get_duration(test)
+        return (1, 0.0) if duration is None else (0, duration)
+    return sorted(tests, key=key)
+
+
+def _order_changed_first(tests, history):
+    """Run tests whose modules changed since they last ran first, most
+    recently changed first, followed by every other test. Tests that never
+    ran count as changed.
+    """
+    def key(test):
+        mtime = history.get_module_mtime(test)
+        last_run = history.get_last_run(test)
+        if last_run is None or (
+            mtime is not None and mtime > last_run.recorded_at
+        ):
+            return (0, -(mtime or 0.0))
+        return (1, 0.0)
+    return sorted(tests, key=key)
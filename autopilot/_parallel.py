@@ -0,0 +1,403 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for running autopilot tests in parallel.
+
+Each worker is a separate autopilot process running inside its own sandbox: an
+Xvfb display and a private DBus session bus, in the same way that
+autopilot3-sandbox-run sets them up. The parent process hands test ids out to
+the workers one at a time over their stdin, and workers stream their results
+back as subunit v2 on their stdout. The parent then merges every worker stream
+into the single result object the test run reports to.
+
+"""
+
+from collections import defaultdict
+import logging
+import os
+import queue
+import select
+import shutil
+import subprocess
+import sys
+
+from subunit import ByteStreamToStreamResult, StreamResultToBytes
+from testscenarios import generate_scenarios
+from testtools import (
+    ConcurrentStreamTestSuite,
+    CopyStreamResult,
+    ExtendedToStreamDecorator,
+    StreamToExtendedDecorator,
+    TimestampingStreamResult,
+    iterate_tests,
+)
+
+from autopilot._timing import split_scenario_from_test_id
+
+
+_logger = logging.getLogger(__name__)
+
+# The name of the file attachment a worker sends once it has finished running
+# a test, and is ready to be sent another one.
+WORKER_READY_FILE_NAME = 'autopilot-worker-ready'
+
+SANDBOX_START_TIMEOUT = 10
+DEFAULT_SCREEN = '1024x768x24'
+
+
+class Sandbox(object):
+
+    """An Xvfb display and a private DBus session bus for a worker to use."""
+
+    def __init__(self, screen=DEFAULT_SCREEN):
+        self._screen = screen
+        self._xvfb = None
+        self._dbus_daemon = None
+        self.display = None
+        self.dbus_address = None
+
+    def start(self):
+        try:
+            self._start_xvfb()
+            self._start_dbus_daemon()
+        except Exception:
+            self.stop()
+            raise
+
+    def stop(self):
+        for process in (self._dbus_daemon, self._xvfb):
+            if process is not None and process.poll() is None:
+                process.terminate()
+                process.wait()
+        self._dbus_daemon = None
+        self._xvfb = None
+
+    def get_environment(self, environment=None):
+        """Return a copy of *environment* that points at this sandbox.
+
+        :param environment: The environment to base the sandbox environment
+            on. Defaults to the environment of the current process.
+
+        """
+        environment = dict(os.environ if environment is None else environment)
+        environment['DISPLAY'] = self.display
+        environment['DBUS_SESSION_BUS_ADDRESS'] = self.dbus_address
+        environment['XAUTHORITY'] = '/dev/null'
+        return environment
+
+    def _start_xvfb(self):
+        # Xvfb picks a free display number itself, and writes it to the
+        # -displayfd pipe once it is ready for clients to connect.
+        read_fd, write_fd = os.pipe()
+        try:
+            self._xvfb = subprocess.Popen(
+                [
+                    'Xvfb', '-displayfd', str(write_fd),
+                    '-screen', '0', self._screen,
+                    '-nolisten', 'tcp',
+                ],
+                pass_fds=(write_fd,),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            os.close(write_fd)
+            write_fd = None
+            with os.fdopen(read_fd, 'rb') as display_pipe:
+                read_fd = None
+                display_number = _read_line(display_pipe, 'Xvfb')
+        finally:
+            for fd in (read_fd, write_fd):
+                if fd is not None:
+                    os.close(fd)
+        self.display = ':%s' % display_number
+
+    def _start_dbus_daemon(self):
+        self._dbus_daemon = subprocess.Popen(
+            ['dbus-daemon', '--session', '--nofork', '--print-address'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self.dbus_address = _read_line(self._dbus_daemon.stdout, 'dbus-daemon')
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+        return False
+
+
+def _read_line(stream, program_name):
+    ready, _, _ = select.select([stream], [], [], SANDBOX_START_TIMEOUT)
+    line = stream.readline() if ready else b''
+    if not line.strip():
+        raise RuntimeError(
+            "%s did not start within %d seconds."
+            % (program_name, SANDBOX_START_TIMEOUT)
+        )
+    return line.decode().strip()
+
+
+def check_sandbox_requirements():
+    """Raise RuntimeError if sandboxes cannot be created on this machine."""
+    for executable, package in (('Xvfb', 'xvfb'), ('dbus-daemon', 'dbus')):
+        if shutil.which(executable) is None:
+            raise RuntimeError(
+                "%s executable not found. Please install %s"
+                % (executable, package)
+            )
+
+
+def run_tests_in_sandboxes(test_suite, result, jobs, worker_command):
+    """Run *test_suite* in *jobs* sandboxed worker processes.
+
+    :param test_suite: The tests to run. Every worker loads the same suite
+        itself, and is then sent test ids to run from it.
+    :param result: The test result to report to. The caller is responsible
+        for calling startTestRun and stopTestRun on it.
+    :param jobs: The number of workers to start.
+    :param worker_command: The command line that starts a worker process.
+    :returns: *result*
+
+    """
+    check_sandbox_requirements()
+    test_ids = queue.Queue()
+    for test in iterate_tests(test_suite):
+        test_ids.put(test.id())
+
+    def should_stop():
+        return getattr(result, 'shouldStop', False)
+
+    def make_workers():
+        return [
+            (_SandboxWorker(worker_command, test_ids, should_stop), str(i))
+            for i in range(jobs)
+        ]
+
+    merged_result = _StartedStreamToExtendedDecorator(result)
+    merged_result.startTestRun()
+    try:
+        ConcurrentStreamTestSuite(make_workers).run(merged_result)
+    finally:
+        merged_result.stopTestRun()
+    return result
+
+
+class _StartedStreamToExtendedDecorator(StreamToExtendedDecorator):
+
+    """Forward stream events to a result that has already been started."""
+
+    def startTestRun(self):
+        self.hook.startTestRun()
+
+    def stopTestRun(self):
+        self.hook.stopTestRun()
+
+
+class _SandboxWorker(object):
+
+    """Run tests from a shared queue in a worker process inside a sandbox.
+
+    ConcurrentStreamTestSuite calls run() from its own thread, with a
+    StreamResult that feeds events back to the main thread.
+    """
+
+    def __init__(self, worker_command, test_ids, should_stop, sandbox=None):
+        self._worker_command = worker_command
+        self._test_ids = test_ids
+        self._should_stop = should_stop
+        self._sandbox = sandbox or Sandbox()
+        self._process = None
+        self._current_test_id = None
+
+    def run(self, result):
+        with self._sandbox:
+            self._process = subprocess.Popen(
+                self._worker_command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                env=self._sandbox.get_environment(),
+            )
+            self._send_next_test()
+            ByteStreamToStreamResult(
+                self._process.stdout,
+                non_subunit_name='stdout'
+            ).run(_WorkerStreamResult(result, self._send_next_test))
+            self._close_worker_input()
+            returncode = self._process.wait()
+        if self._current_test_id is not None:
+            self._report_lost_test(result, returncode)
+
+    def _send_next_test(self):
+        self._current_test_id = None
+        if self._process.stdin.closed:
+            return
+        test_id = None
+        if not self._should_stop():
+            try:
+                test_id = self._test_ids.get_nowait()
+            except queue.Empty:
+                pass
+        if test_id is None:
+            self._close_worker_input()
+            return
+        self._current_test_id = test_id
+        try:
+            self._process.stdin.write(test_id.encode() + b'\n')
+            self._process.stdin.flush()
+        except BrokenPipeError:
+            # The worker has died. The lost test is reported once its output
+            # ends.
+            pass
+
+    def _close_worker_input(self):
+        if not self._process.stdin.closed:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def _report_lost_test(self, result, returncode):
+        _logger.error(
+            "Worker exited with code %d while running %s",
+            returncode,
+            self._current_test_id
+        )
+        result.status(
+            test_id=self._current_test_id,
+            test_status='fail',
+            file_name='traceback',
+            file_bytes=(
+                "The autopilot worker running this test exited with code %d "
+                "before the test finished." % returncode
+            ).encode('utf-8'),
+            mime_type='text/plain;charset=utf8',
+            eof=True,
+        )
+
+
+class _WorkerStreamResult(CopyStreamResult):
+
+    """Forward a worker's results, and ask for more work when it is ready."""
+
+    def __init__(self, target, on_worker_ready):
+        super().__init__([target])
+        self._on_worker_ready = on_worker_ready
+
+    def status(self, *args, **kwargs):
+        if kwargs.get('file_name') == WORKER_READY_FILE_NAME:
+            self._on_worker_ready()
+        else:
+            super().status(*args, **kwargs)
+
+
+def run_worker(test_suite, input_stream=None, output_stream=None,
+               decorate_result=None):
+    """Run tests from *test_suite* as their ids are read from *input_stream*.
+
+    Results are written to *output_stream* as subunit v2. After each test
+    a worker-ready file attachment is written, to ask for the next test id.
+    The worker exits once *input_stream* is closed.
+
+    :param input_stream: A binary stream test ids are read from, one per
+        line. Defaults to stdin.
+    :param output_stream: A binary stream results are written to. Defaults to
+        stdout, which is then redirected to stderr so that anything else
+        written to stdout doesn't corrupt the subunit stream.
+    :param decorate_result: If set, a callable that is passed the test result
+        the worker reports to, and returns a decorated result to use instead.
+
+    """
+    if input_stream is None:
+        input_stream = sys.stdin.buffer
+    if output_stream is None:
+        output_stream = _take_over_stdout()
+    tests = defaultdict(list)
+    for test in iterate_tests(test_suite):
+        tests[test.id()].append(test)
+
+    stream = StreamResultToBytes(output_stream)
+    result = ExtendedToStreamDecorator(TimestampingStreamResult(stream))
+    if decorate_result is not None:
+        result = decorate_result(result)
+    result.startTestRun()
+    try:
+        for line in input_stream:
+            test_id = line.decode().strip()
+            if not test_id:
+                break
+            test = _take_test(tests, test_id)
+            if test is not None:
+                test.run(result)
+            else:
+                _report_unknown_test(result, test_id)
+            stream.status(
+                file_name=WORKER_READY_FILE_NAME,
+                file_bytes=test_id.encode(),
+                mime_type='text/plain;charset=utf8',
+                eof=True,
+            )
+            output_stream.flush()
+    finally:
+        result.stopTestRun()
+        output_stream.flush()
+
+
+def _take_test(tests, test_id):
+    """Return the test with the id *test_id* from *tests*, or None.
+
+    A test id with a scenario name, as sent when a failed test is run again,
+    is found by applying the scenarios of the test it was generated from.
+
+    :param tests: A dictionary mapping test ids to lists of tests with that
+        id. Tests found by their own id are removed from it.
+
+    """
+    if tests.get(test_id):
+        return tests[test_id].pop(0)
+    base_id, scenario = split_scenario_from_test_id(test_id)
+    if scenario:
+        for test in tests.get(base_id, []):
+            for scenario_test in generate_scenarios(test):
+                if scenario_test.id() == test_id:
+                    return scenario_test
+    return None
+
+
+def _report_unknown_test(result, test_id):
+    result.status(
+        test_id=test_id,
+        test_status='fail',
+        file_name='traceback',
+        file_bytes=(
+            "The autopilot worker could not find the test %s." % test_id
+        ).encode('utf-8'),
+        mime_type='text/plain;charset=utf8',
+        eof=True,
+    )
+
+
+def _take_over_stdout():
+    """Return a binary stream for the real stdout, and point stdout at stderr.
+    """
+    sys.stdout.flush()
+    output_stream = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return output_stream
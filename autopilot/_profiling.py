@@ -0,0 +1,245 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for profiling tests one at a time.
+
+When profiling is enabled every test gets a detail with the time it spent in
+each phase, and every operation timed while it ran: queries sent to the
+application under test along with the size of their replies, proxy searches,
+application launches, input events and sleeps.
+
+The profiles are read back from the test details to rank the costliest
+queries and waits of the whole run, so the summary covers tests run by
+parallel workers too, and can be made again later from a subunit results
+file.
+
+"""
+
+from collections import defaultdict
+import json
+import logging
+
+from subunit import ByteStreamToStreamResult
+from testtools import StreamResult
+from testtools.content import json_content
+
+from autopilot._timing import (
+    CLEANUP_PHASE,
+    DBUS_PHASE,
+    SETUP_PHASE,
+    SLEEP_PHASE,
+    TEARDOWN_PHASE,
+    TEST_PHASE,
+    phase_timer,
+)
+
+
+_logger = logging.getLogger(__name__)
+
+PROFILE_DETAIL_NAME = 'autopilot-profile'
+
+# The phases that make up the whole of a test, without overlapping.
+_TEST_PHASES = (SETUP_PHASE, TEST_PHASE, TEARDOWN_PHASE, CLEANUP_PHASE)
+
+
+def enable_profiling():
+    """Record the operations of every test, so that they can be profiled."""
+    phase_timer.recording_operations = True
+
+
+def get_profile_content():
+    """Return a JSON content object with the profile of the running test."""
+    return json_content({
+        'phases': phase_timer.get_durations(),
+        'operations': [
+            {
+                'phase': operation.phase,
+                'description': operation.description,
+                'duration': operation.duration,
+                'size': operation.size,
+            }
+            for operation in phase_timer.get_operations()
+        ],
+    })
+
+
+class _Cost(object):
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.largest = None
+
+    def add(self, duration, size=None):
+        self.count += 1
+        self.total += duration
+        self.longest = max(self.longest, duration)
+        if size is not None:
+            self.largest = max(self.largest or 0, size)
+
+
+class ProfileSummary(object):
+
+    """Add up the profiles of the tests in a run."""
+
+    def __init__(self, limit=10):
+        """Construct a new ProfileSummary.
+
+        :param limit: How many of the costliest queries and waits to show.
+
+        """
+        self._limit = limit
+        self._test_count = 0
+        self._phases = defaultdict(float)
+        self._queries = defaultdict(_Cost)
+        self._waits = defaultdict(_Cost)
+        self._sleep_call_sites = defaultdict(_Cost)
+
+    def add_content(self, test_id, content):
+        """Add the profile in the detail *content* of the test *test_id*."""
+        self.add_bytes(test_id, b''.join(content.iter_bytes()))
+
+    def add_bytes(self, test_id, profile_bytes):
+        """Add the profile in the JSON *profile_bytes* of the test
+        *test_id*.
+        """
+        try:
+            profile = json.loads(profile_bytes.decode('utf-8'))
+        except ValueError as e:
+            _logger.warning("Unable to read profile of %s: %s", test_id, e)
+            return
+        self.add_profile(test_id, profile)
+
+    def add_profile(self, test_id, profile):
+        """Add the *profile* of the test *test_id*.
+
+        :param profile: A dictionary in the form of the detail made by
+            get_profile_content().
+
+        """
+        self._test_count += 1
+        for phase, duration in profile.get('phases', {}).items():
+            self._phases[phase] += duration
+        for operation in profile.get('operations', []):
+            if operation['phase'] == DBUS_PHASE:
+                self._queries[operation['description']].add(
+                    operation['duration'],
+                    operation['size']
+                )
+            elif operation['phase'] == SLEEP_PHASE:
+                self._waits[test_id].add(operation['duration'])
+                self._sleep_call_sites[operation['description']].add(
+                    operation['duration']
+                )
+
+    def format(self):
+        """Return the summary as text."""
+        if not self._test_count:
+            return "No tests were profiled."
+        lines = ["Profiled %d tests." % self._test_count, ""]
+        lines.append("Time spent in each phase:")
+        for phase, duration in sorted(
+                self._phases.items(), key=lambda p: p[1], reverse=True):
+            lines.append("    %10.3fs  %s" % (duration, phase))
+        lines += ["", "Costliest queries:"]
+        lines.append("    %11s %7s %11s %11s  %s" % (
+            'total', 'calls', 'longest', 'largest', 'query'))
+        for query, cost in self._get_costliest(self._queries):
+            lines.append("    %10.3fs %7d %10.3fs %11s  %s" % (
+                cost.total,
+                cost.count,
+                cost.longest,
+                '-' if cost.largest is None else '%dB' % cost.largest,
+                query
+            ))
+        lines += ["", "Costliest waits:"]
+        lines.append("    %11s %7s %11s  %s" % (
+            'total', 'sleeps', 'longest', 'test'))
+        for test_id, cost in self._get_costliest(self._waits):
+            lines.append("    %10.3fs %7d %10.3fs  %s" % (
+                cost.total, cost.count, cost.longest, test_id))
+        lines += ["", "Costliest sleeps by call site:"]
+        lines.append("    %11s %7s %11s  %s" % (
+            'total', 'sleeps', 'longest', 'call site'))
+        for call_site, cost in self._get_costliest(self._sleep_call_sites):
+            lines.append("    %10.3fs %7d %10.3fs  %s" % (
+                cost.total, cost.count, cost.longest, call_site))
+        lines += ["", self._format_time_sleeping()]
+        return "\n".join(lines)
+
+    def _format_time_sleeping(self):
+        test_time = sum(self._phases[phase] for phase in _TEST_PHASES)
+        sleep_time = self._phases[SLEEP_PHASE]
+        if not test_time:
+            return "Slept for %.3fs." % sleep_time
+        return (
+            "Slept for %.3fs of %.3fs in tests (%.1f%%), and worked for "
+            "%.3fs." % (
+                sleep_time,
+                test_time,
+                100 * sleep_time / test_time,
+                test_time - sleep_time
+            )
+        )
+
+    def _get_costliest(self, costs):
+        return sorted(
+            costs.items(),
+            key=lambda c: c[1].total,
+            reverse=True
+        )[:self._limit]
+
+
+class _ProfileReader(StreamResult):
+
+    """Add the profiles in a subunit stream to a summary."""
+
+    def __init__(self, summary):
+        super().__init__()
+        self._summary = summary
+        self._profile_chunks = defaultdict(list)
+
+    def status(self, test_id=None, file_name=None, file_bytes=None,
+               eof=False, **kwargs):
+        if test_id is None or file_name != PROFILE_DETAIL_NAME:
+            return
+        self._profile_chunks[test_id].append(file_bytes)
+        if eof:
+            self._summary.add_bytes(
+                test_id,
+                b''.join(self._profile_chunks.pop(test_id))
+            )
+
+
+def summarize_results(path, summary=None):
+    """Add up the test profiles in the subunit results file at *path*.
+
+    :param summary: The ProfileSummary to add the profiles to. A new one is
+        made if it's None.
+    :returns: The ProfileSummary.
+
+    """
+    summary = summary or ProfileSummary()
+    with open(path, 'rb') as results_file:
+        ByteStreamToStreamResult(
+            results_file,
+            non_subunit_name='stdout'
+        ).run(_ProfileReader(summary))
+    return summary
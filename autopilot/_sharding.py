@@ -0,0 +1,111 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for splitting a test run across several machines.
+
+Tests with recorded durations are packed into shards greedily, longest first,
+each going to the shard with the least work so far. Tests with no recorded
+duration are spread across shards by a stable hash of their id. Every machine
+must see the same recorded durations for the shards to line up.
+
+"""
+
+from argparse import ArgumentTypeError
+import heapq
+import zlib
+
+
+def parse_shard(value):
+    """Parse a shard specification of the form 'K/N'.
+
+    K is the 1-based index of the shard to select, and N is the number of
+    shards.
+
+    :returns: A tuple of (K, N).
+    :raises ArgumentTypeError: if *value* is not a valid specification.
+
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ArgumentTypeError(
+            "%r is not a shard specification of the form K/N." % value
+        )
+    if not 1 <= index <= count:
+        raise ArgumentTypeError(
+            "Shard index must be between 1 and %d, not %d." % (count, index)
+        )
+    return index, count
+
+
+def partition_test_ids(test_ids, shard_count, durations=None):
+    """Partition *test_ids* into *shard_count* shards.
+
+    :param test_ids: An iterable of test ids.
+    :param shard_count: The number of shards to create.
+    :param durations: A dictionary mapping test ids to their recorded
+        durations, in seconds.
+    :returns: A list of *shard_count* sets of test ids.
+
+    """
+    durations = durations or {}
+    shards = [set() for _ in range(shard_count)]
+    timed_ids = []
+    for test_id in set(test_ids):
+        if test_id in durations:
+            timed_ids.append(test_id)
+        else:
+            shards[_hash_test_id(test_id) % shard_count].add(test_id)
+
+    # Longest processing time first: every test goes to the shard with the
+    # least work, breaking ties on shard number so the result is
+    # deterministic.
+    loads = [(0.0, index) for index in range(shard_count)]
+    for test_id in sorted(timed_ids, key=lambda t: (-durations[t], t)):
+        load, index = heapq.heappop(loads)
+        shards[index].add(test_id)
+        heapq.heappush(loads, (load + durations[test_id], index))
+    return shards
+
+
+def select_shard(tests, shard_index, shard_count, durations=None):
+    """Return the tests from *tests* that belong to shard *shard_index*.
+
+    :param tests: An iterable of test cases.
+    :param shard_index: The 1-based index of the shard to select.
+    :param shard_count: The number of shards.
+    :param durations: A dictionary mapping test ids to their recorded
+        durations, in seconds.
+    :returns: A list of the selected tests, in their original order.
+
+    """
+    tests = list(tests)
+    shards = partition_test_ids(
+        (test.id() for test in tests),
+        shard_count,
+        durations
+    )
+    selected_ids = shards[shard_index - 1]
+    return [test for test in tests if test.id() in selected_ids]
+
+
+def _hash_test_id(test_id):
+    # Python's hash() of a string changes between runs, so it can't be used
+    # to agree on shards across machines.
+    return zlib.crc32(test_id.encode('utf-8'))
@@ -0,0 +1,131 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for following a subunit results file as it's written.
+
+A test run using the subunit output format writes each test detail to its
+results file as soon as the detail is attached, so following the file shows
+what a long run is doing while it runs.
+
+"""
+
+from collections import defaultdict
+import time
+
+from subunit import ByteStreamToStreamResult
+from testtools import StreamResult
+
+
+_OUTCOME_LABELS = {
+    'success': 'OK',
+    'fail': 'FAIL',
+    'skip': 'SKIP',
+    'xfail': 'EXPECTED FAILURE',
+    'uxsuccess': 'UNEXPECTED SUCCESS',
+}
+
+
+class _FollowedFile(object):
+
+    """A binary file whose reads wait for more data to be written to it.
+
+    Reads only return less than was asked for once *should_stop* returns
+    True.
+
+    """
+
+    def __init__(self, file_obj, should_stop, poll_interval=0.5):
+        self._file = file_obj
+        self._should_stop = should_stop
+        self._poll_interval = poll_interval
+
+    def read(self, size=-1):
+        if size < 0:
+            return self._file.read()
+        data = b''
+        while len(data) < size:
+            more = self._file.read(size - len(data))
+            if more:
+                data += more
+            elif self._should_stop():
+                break
+            else:
+                time.sleep(self._poll_interval)
+        return data
+
+
+class _TailStreamResult(StreamResult):
+
+    """Print test progress and attachments to *output* as they arrive."""
+
+    def __init__(self, output):
+        super().__init__()
+        self._output = output
+        self._file_sizes = defaultdict(int)
+        self._text_files = defaultdict(list)
+
+    def status(self, test_id=None, test_status=None, test_tags=None,
+               runnable=True, file_name=None, file_bytes=None, eof=False,
+               mime_type=None, route_code=None, timestamp=None):
+        if test_id is None:
+            return
+        if test_status == 'inprogress':
+            self._print("RUNNING: %s" % test_id)
+        elif test_status in _OUTCOME_LABELS:
+            self._print("%s: %s" % (_OUTCOME_LABELS[test_status], test_id))
+        if file_name is not None:
+            self._add_file_bytes(
+                test_id, file_name, file_bytes, eof, mime_type)
+
+    def _add_file_bytes(self, test_id, file_name, file_bytes, eof,
+                        mime_type):
+        key = (test_id, file_name)
+        self._file_sizes[key] += len(file_bytes)
+        is_text = (mime_type or '').startswith('text/')
+        if is_text:
+            self._text_files[key].append(file_bytes)
+        if not eof:
+            return
+        size = self._file_sizes.pop(key)
+        text = b''.join(self._text_files.pop(key, []))
+        if is_text:
+            self._print("    %s: {{{\n%s}}}" % (
+                file_name, text.decode('utf-8', 'replace')))
+        else:
+            self._print("    Binary attachment: \"%s\" (%s, %d bytes)" % (
+                file_name, mime_type, size))
+
+    def _print(self, message):
+        print(message, file=self._output, flush=True)
+
+
+def follow_results(path, output, follow=True):
+    """Print the progress of the test run writing subunit results to *path*.
+
+    :param output: A text stream to print the progress to.
+    :param follow: If True, keep waiting for more results to be written,
+        until interrupted. Otherwise, stop at the end of the file.
+
+    """
+    with open(path, 'rb') as results_file:
+        source = _FollowedFile(results_file, should_stop=lambda: not follow)
+        ByteStreamToStreamResult(
+            source,
+            non_subunit_name='stdout'
+        ).run(_TailStreamResult(output))
@@ -97,6 +97,6 @@ def _do_timeout(timeout):
     while timeout - time_elapsed > 0.0:
         yield time_elapsed
         time_to_sleep = min(timeout - time_elapsed, 1.0)
-        sleep(time_to_sleep)
+        sleep(time_to_sleep, 'Timeout loop')
         time_elapsed += time_to_sleep
     yield time_elapsed
@@ -0,0 +1,383 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for the on-disk store of how long tests take to run.
+
+Durations are stored per test id and scenario, and per phase of the test
+(the 'total' phase covers the whole test), so that the runner can make
+decisions based on real data from previous runs.
+
+"""
+
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+import logging
+import os
+import sqlite3
+import time
+
+from autopilot import _tracing
+
+_logger = logging.getLogger(__name__)
+
+TOTAL_PHASE = 'total'
+SETUP_PHASE = 'setUp'
+TEST_PHASE = 'test'
+TEARDOWN_PHASE = 'tearDown'
+CLEANUP_PHASE = 'cleanups'
+LAUNCH_PHASE = 'launch'
+DBUS_PHASE = 'dbus'
+SEARCH_PHASE = 'search'
+INPUT_PHASE = 'input'
+SLEEP_PHASE = 'sleep'
+
+# The recorded outcomes of tests that did not pass.
+FAILING_OUTCOMES = frozenset(['error', 'fail', 'uxsuccess'])
+
+LastRun = namedtuple('LastRun', ['failed', 'recorded_at'])
+
+AttemptCounts = namedtuple('AttemptCounts', ['passed', 'failed'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS timings (
+    test_id TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    duration REAL NOT NULL,
+    outcome TEXT,
+    recorded_at REAL NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS timings_by_phase ON timings (phase, recorded_at);
+"""
+
+
+class Operation(object):
+
+    """One timed run of a phase.
+
+    :ivar phase: The name of the phase.
+    :ivar description: A description of what was done, such as the query
+        sent, or None.
+    :ivar duration: How long the operation took in seconds, or None while it
+        is still running.
+    :ivar size: The size in bytes of the data the operation returned, or None
+        if that isn't known.
+
+    """
+
+    __slots__ = ('phase', 'description', 'duration', 'size')
+
+    def __init__(self, phase, description=None):
+        self.phase = phase
+        self.description = description
+        self.duration = None
+        self.size = None
+
+
+class _PhaseTimer(object):
+
+    """Accumulate how long the currently running test spends in each phase.
+
+    Phases may be timed more than once per test, and may overlap: an
+    application launch happens during setUp, for example. The time spent in
+    each phase is added up until reset() is called at the start of the next
+    test.
+
+    When recording operations is enabled, every timed run of a phase is kept
+    as well, so the test can be profiled.
+    """
+
+    def __init__(self):
+        self._durations = defaultdict(float)
+        self._operations = []
+        self.recording_operations = False
+
+    @contextmanager
+    def time_phase(self, phase, description=None):
+        """Time the code run within the context as part of *phase*.
+
+        :param description: A description of the operation, kept when
+            operations are recorded.
+        :returns: The :class:`Operation` being timed, so that its size can be
+            set.
+
+        """
+        operation = Operation(phase, description)
+        if _tracing.HAVE_TRACEPOINT:
+            _trace_operation(operation, 'started')
+        start = time.monotonic()
+        try:
+            yield operation
+        finally:
+            operation.duration = time.monotonic() - start
+            self._durations[phase] += operation.duration
+            if self.recording_operations:
+                self._operations.append(operation)
+            if _tracing.HAVE_TRACEPOINT:
+                _trace_operation(operation, 'ended')
+
+    def get_durations(self):
+        """Return a dictionary mapping phase names to durations in seconds.
+        """
+        return dict(self._durations)
+
+    def get_operations(self):
+        """Return a list of the operations recorded since the last reset, in
+        the order they finished.
+        """
+        return list(self._operations)
+
+    def reset(self):
+        self._durations.clear()
+        del self._operations[:]
+
+
+phase_timer = _PhaseTimer()
+
+
+def _trace_operation(operation, started_or_ended):
+    """Emit the tracepoint for *operation* starting or ending, if its phase
+    has one.
+    """
+    description = operation.description or ''
+    if operation.phase == DBUS_PHASE:
+        size = -1 if operation.size is None else operation.size
+        _tracing.emit_query_event(started_or_ended, description, size)
+    elif operation.phase == SEARCH_PHASE:
+        _tracing.emit_search_event(started_or_ended, description)
+    elif operation.phase == INPUT_PHASE:
+        _tracing.emit_input_event(started_or_ended, description)
+    elif operation.phase == SLEEP_PHASE:
+        _tracing.emit_sleep_event(started_or_ended, description)
+    elif operation.phase == LAUNCH_PHASE:
+        _tracing.emit_launch_event(
+            'launch ' + started_or_ended, description)
+
+
+def get_default_database_path():
+    """Return the path of the timing database in the user's cache directory.
+    """
+    cache_directory = os.environ.get(
+        'XDG_CACHE_HOME',
+        os.path.expanduser('~/.cache')
+    )
+    return os.path.join(cache_directory, 'autopilot', 'timings.sqlite')
+
+
+def split_scenario_from_test_id(test_id):
+    """Split a test id into the id of the test and the name of its scenario.
+
+    testscenarios appends the scenario name to a test id in parentheses, as in
+    'module.Class.test_method(scenario)'. Test ids without a scenario have an
+    empty scenario name.
+
+    :returns: A tuple of (test id, scenario name).
+
+    """
+    if test_id.endswith(')') and '(' in test_id:
+        base_id, _, scenario = test_id[:-1].partition('(')
+        return base_id, scenario
+    return test_id, ''
+
+
+class TimingDatabase(object):
+
+    """Record and look up test durations."""
+
+    def __init__(self, path=None):
+        """Open the timing database at *path*, creating it if needed.
+
+        :param path: The path to the database file, or None to use the
+            default location in the user's cache directory.
+
+        """
+        self.path = path or get_default_database_path()
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # Parallel test run workers share the database, so wait for each
+        # other's writes rather than failing straight away.
+        self._connection = sqlite3.connect(self.path, timeout=30)
+        self._connection.executescript(_SCHEMA)
+        self._add_attempt_column()
+
+    def _add_attempt_column(self):
+        # Databases written before failed tests could be run again have no
+        # attempt column.
+        columns = [
+            row[1] for row in
+            self._connection.execute("PRAGMA table_info(timings)")
+        ]
+        if 'attempt' not in columns:
+            with self._connection:
+                self._connection.execute(
+                    "ALTER TABLE timings "
+                    "ADD COLUMN attempt INTEGER NOT NULL DEFAULT 1"
+                )
+
+    def record(self, test_id, durations, outcome=None, timestamp=None,
+               attempt=1):
+        """Record the phase durations of one run of a test.
+
+        :param test_id: The id of the test that ran, including its scenario
+            name if it has one.
+        :param durations: A dictionary mapping phase names to durations in
+            seconds.
+        :param outcome: A string describing the test outcome, such as
+            'success' or 'fail'.
+        :param timestamp: When the test ran. Defaults to now.
+        :param attempt: Which attempt at running the test this was, in the
+            test run. Failed tests are run again on later attempts.
+
+        """
+        base_id, scenario = split_scenario_from_test_id(test_id)
+        recorded_at = time.time() if timestamp is None else timestamp
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO timings (test_id, scenario, phase, duration, "
+                "outcome, recorded_at, attempt) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        base_id, scenario, phase, duration, outcome,
+                        recorded_at, attempt
+                    )
+                    for phase, duration in durations.items()
+                ]
+            )
+
+    def get_durations(self, phase=TOTAL_PHASE):
+        """Return the most recent duration of every recorded test.
+
+        The durations of a test's scenarios are added together, since the
+        test runner only sees the scenarios once the test is run.
+
+        :returns: A dictionary mapping test ids (without scenario names) to
+            durations in seconds.
+
+        """
+        latest = {}
+        rows = self._connection.execute(
+            "SELECT test_id, scenario, duration FROM timings "
+            "WHERE phase = ? ORDER BY recorded_at",
+            (phase,)
+        )
+        for test_id, scenario, duration in rows:
+            latest[(test_id, scenario)] = duration
+        durations = defaultdict(float)
+        for (test_id, _), duration in latest.items():
+            durations[test_id] += duration
+        return dict(durations)
+
+    def get_last_runs(self):
+        """Return how the most recent run of every recorded test went.
+
+        :returns: A dictionary mapping test ids (without scenario names) to a
+            LastRun tuple. The run failed if the latest recorded run of any of
+            the test's scenarios failed, and was recorded when the most
+            recently run of its scenarios was.
+
+        """
+        latest = {}
+        rows = self._connection.execute(
+            "SELECT test_id, scenario, outcome, recorded_at FROM timings "
+            "WHERE phase = ? ORDER BY recorded_at",
+            (TOTAL_PHASE,)
+        )
+        for test_id, scenario, outcome, recorded_at in rows:
+            latest[(test_id, scenario)] = (outcome, recorded_at)
+        last_runs = {}
+        for (test_id, _), (outcome, recorded_at) in latest.items():
+            failed, last_recorded_at = last_runs.get(test_id, (False, 0.0))
+            last_runs[test_id] = LastRun(
+                failed or outcome in FAILING_OUTCOMES,
+                max(last_recorded_at, recorded_at)
+            )
+        return last_runs
+
+    def get_attempt_counts(self):
+        """Return how often each attempt at running each recorded test passed
+        and failed.
+
+        Skipped runs, and runs with no recorded outcome, aren't counted. The
+        counts of a test's scenarios are added together.
+
+        :returns: A dictionary mapping test ids (without scenario names) to
+            dictionaries mapping attempt numbers to AttemptCounts tuples.
+
+        """
+        counts = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        rows = self._connection.execute(
+            "SELECT test_id, attempt, outcome, COUNT(*) FROM timings "
+            "WHERE phase = ? AND outcome IS NOT NULL AND outcome != 'skip' "
+            "GROUP BY test_id, attempt, outcome",
+            (TOTAL_PHASE,)
+        )
+        for test_id, attempt, outcome, count in rows:
+            counts[test_id][attempt][outcome in FAILING_OUTCOMES] += count
+        return {
+            test_id: {
+                attempt: AttemptCounts(*attempt_counts)
+                for attempt, attempt_counts in test_counts.items()
+            }
+            for test_id, test_counts in counts.items()
+        }
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+
+def get_recorded_durations(path=None):
+    """Return recorded test durations from the timing database at *path*.
+
+    :returns: A dictionary mapping test ids to durations in seconds, which is
+        empty if there is no usable timing database.
+
+    """
+    return _read_timing_database(path, TimingDatabase.get_durations)
+
+
+def get_recorded_last_runs(path=None):
+    """Return the last recorded runs of tests from the timing database at
+    *path*.
+
+    :returns: A dictionary mapping test ids to LastRun tuples, which is empty
+        if there is no usable timing database.
+
+    """
+    return _read_timing_database(path, TimingDatabase.get_last_runs)
+
+
+def _read_timing_database(path, read):
+    path = path or get_default_database_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with TimingDatabase(path) as database:
+            return read(database)
+    except sqlite3.Error as e:
+        _logger.warning("Unable to read timing database %s: %s", path, e)
+        return {}
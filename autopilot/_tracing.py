@@ -0,0 +1,64 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for emitting LTTng tracepoints.
+
+The tracepoints are emitted by the autopilot.tracepoint extension module,
+installed by the python3-autopilot-trace package. Tracing autopilot along
+with the application under test shows where the time between autopilot's
+actions and the application's responses goes.
+
+When the extension module isn't installed, or was built before some of the
+tracepoints were added, the missing tracepoints do nothing.
+
+"""
+
+try:
+    from autopilot import tracepoint as _tracepoint_module
+except ImportError:
+    _tracepoint_module = None
+
+
+HAVE_TRACEPOINT = _tracepoint_module is not None
+
+
+def _do_nothing(*args):
+    pass
+
+
+def _get_tracepoint(name):
+    return getattr(_tracepoint_module, name, _do_nothing)
+
+
+# emit_test_started(test_id), emit_test_ended(test_id)
+emit_test_started = _get_tracepoint('emit_test_started')
+emit_test_ended = _get_tracepoint('emit_test_ended')
+# emit_query_event(started_or_ended, query, size), where size is the size
+# of the reply in bytes, or -1 when it isn't known.
+emit_query_event = _get_tracepoint('emit_query_event')
+# emit_search_event(started_or_ended, criteria)
+emit_search_event = _get_tracepoint('emit_search_event')
+# emit_proxy_event(class_name, object_path)
+emit_proxy_event = _get_tracepoint('emit_proxy_event')
+# emit_input_event(started_or_ended, event)
+emit_input_event = _get_tracepoint('emit_input_event')
+# emit_sleep_event(started_or_ended, reason)
+emit_sleep_event = _get_tracepoint('emit_sleep_event')
+# emit_launch_event(milestone, application)
+emit_launch_event = _get_tracepoint('emit_launch_event')
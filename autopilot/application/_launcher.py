@@ -19,6 +19,7 @@
 
 """Base module for application launchers."""
 
+import atexit
 import fixtures
 from gi import require_version
 try:
@@ -38,6 +39,7 @@ from autopilot.utilities import safe_text_content
 
 from autopilot._timeout import Timeout
 from autopilot._fixtures import FixtureWithDirectAddDetail
+from autopilot._tracing import emit_launch_event
 from autopilot.application._environment import (
     GtkApplicationEnvironment,
     QtApplicationEnvironment,
@@ -45,6 +47,8 @@ from autopilot.application._environment import (
 from autopilot.introspection import (
     get_proxy_object_for_existing_process,
 )
+from autopilot.introspection._search import get_new_connection_watcher
+from autopilot.process._tree import get_process_tree
 
 _logger = logging.getLogger(__name__)
 
@@ -142,8 +146,11 @@ class UpstartApplicationLauncher(ApplicationLauncher):
             state.get('message', '')
         )
         pid = self._get_pid_for_launched_app(app_id)
+        emit_launch_event('process started', app_id)
 
-        return self._get_proxy_object(pid)
+        proxy_object = self._get_proxy_object(pid)
+        emit_launch_event('proxy ready', app_id)
+        return proxy_object
 
     def _get_proxy_object(self, pid):
         return get_proxy_object_for_existing_process(
@@ -310,9 +317,22 @@ class ClickApplicationLauncher(UpstartApplicationLauncher):
 
 class NormalApplicationLauncher(ApplicationLauncher):
 
-    """Fixture to manage launching an application."""
+    """Fixture to manage launching an application.
+
+    :keyword prelaunch: If True, every time an application is launched, a
+        spare copy of it is started in the background, and handed to the
+        next launch of the same application with the same arguments, options
+        and environment, so that it doesn't have to wait for the application
+        to start. The spare copy is paused while it's waiting to be used.
+        Defaults to False.
+    """
     __doc__ += ApplicationLauncher.__doc__
 
+    def __init__(self, case_addDetail=None, emulator_base=None,
+                 dbus_bus='session', prelaunch=False):
+        super().__init__(case_addDetail, emulator_base, dbus_bus)
+        self.prelaunch = prelaunch
+
     def launch(self, application, arguments=[], app_type=None, launch_dir=None,
                capture_output=True):
         """Launch an application and return a proxy object.
@@ -400,15 +420,45 @@ class NormalApplicationLauncher(ApplicationLauncher):
         app_path = _get_application_path(application)
         app_path, arguments = self._setup_environment(
             app_path, app_type, arguments)
-        process = self._launch_application_process(
-            app_path, capture_output, launch_dir, arguments)
-        proxy_object = get_proxy_object_for_existing_process(
-            dbus_bus=self.dbus_bus,
-            emulator_base=self.proxy_base,
-            process=process,
-            pid=process.pid
-        )
+        spare_key = _get_spare_application_key(
+            app_path, arguments, launch_dir, capture_output, self.dbus_bus)
+        spare = _take_spare_application(spare_key) if self.prelaunch else None
+        if spare is not None:
+            _logger.info("Using prelaunched process %d", spare.process.pid)
+            connection_watcher = spare.connection_watcher
+        else:
+            # Start watching the bus before the process exists, so we hear
+            # about its connection the moment it appears.
+            connection_watcher = get_new_connection_watcher(self.dbus_bus)
+        try:
+            if spare is not None:
+                process = spare.process
+                self.addCleanup(
+                    self._kill_process_and_attach_logs, process, app_path)
+            else:
+                process = self._launch_application_process(
+                    app_path, capture_output, launch_dir, arguments)
+            emit_launch_event('process started', app_path)
+            proxy_object = get_proxy_object_for_existing_process(
+                dbus_bus=self.dbus_bus,
+                emulator_base=self.proxy_base,
+                process=process,
+                pid=process.pid,
+                connection_watcher=connection_watcher,
+            )
+        finally:
+            if connection_watcher is not None:
+                connection_watcher.stop()
         proxy_object.set_process(process)
+        emit_launch_event('proxy ready', app_path)
+        if self.prelaunch:
+            _start_spare_application(
+                spare_key,
+                self.dbus_bus,
+                lambda: launch_process(
+                    app_path, arguments, capture_output, cwd=launch_dir)
+            )
+            self.addCleanup(_pause_spare_application)
         return proxy_object
 
     def _setup_environment(self, app_path, app_type, arguments):
@@ -449,6 +499,107 @@ class NormalApplicationLauncher(ApplicationLauncher):
         )
 
 
+class _SpareApplication(object):
+
+    """An application process started ahead of the launch that will use it.
+
+    The process is started in its own process group, so pausing and resuming
+    the group reaches any processes it started too.
+
+    """
+
+    def __init__(self, key, process, connection_watcher):
+        self.key = key
+        self.process = process
+        self.connection_watcher = connection_watcher
+        self._paused = False
+
+    def is_running(self):
+        return self.process.poll() is None
+
+    def pause(self):
+        if not self._paused:
+            _attempt_kill_pid(self.process.pid, signal.SIGSTOP)
+            self._paused = True
+
+    def resume(self):
+        if self._paused:
+            _attempt_kill_pid(self.process.pid, signal.SIGCONT)
+            self._paused = False
+
+    def kill(self):
+        # A stopped process can't act on SIGTERM.
+        self.resume()
+        if self.connection_watcher is not None:
+            self.connection_watcher.stop()
+        _kill_process(self.process)
+
+
+_spare_application = None
+
+
+def _get_spare_application_key(app_path, arguments, launch_dir,
+                               capture_output, dbus_bus):
+    return (
+        app_path,
+        tuple(arguments),
+        launch_dir,
+        capture_output,
+        dbus_bus,
+        tuple(sorted(os.environ.items())),
+    )
+
+
+def _take_spare_application(key):
+    """Return the running spare application launched with *key*, resumed,
+    or None if there isn't one.
+
+    Any other spare application is stopped, since only one is kept.
+
+    """
+    global _spare_application
+    spare, _spare_application = _spare_application, None
+    if spare is None:
+        return None
+    if spare.key == key and spare.is_running():
+        spare.resume()
+        return spare
+    spare.kill()
+    return None
+
+
+def _start_spare_application(key, dbus_bus, launch):
+    """Start a spare application for the next launch with *key*, by calling
+    *launch*, which must return the new process.
+
+    """
+    global _spare_application
+    _discard_spare_application()
+    connection_watcher = get_new_connection_watcher(dbus_bus)
+    try:
+        process = launch()
+    except Exception:
+        if connection_watcher is not None:
+            connection_watcher.stop()
+        raise
+    _spare_application = _SpareApplication(key, process, connection_watcher)
+
+
+def _pause_spare_application():
+    if _spare_application is not None:
+        _spare_application.pause()
+
+
+def _discard_spare_application():
+    global _spare_application
+    spare, _spare_application = _spare_application, None
+    if spare is not None:
+        spare.kill()
+
+
+atexit.register(_discard_spare_application)
+
+
 def launch_process(application, args, capture_output=False, **kwargs):
     """Launch an autopilot-enabled process and return the process object."""
     commandline = [application]
@@ -583,6 +734,7 @@ def _kill_process(process):
             "Killing process group, since it hasn't exited after "
             "10 seconds."
         )
+        _kill_escaped_descendants(process.pid)
         _attempt_kill_pid(process.pid, signal.SIGKILL)
     return ''.join(stdout_parts), ''.join(stderr_parts), process.returncode
 
@@ -595,5 +747,24 @@ def _attempt_kill_pid(pid, sig=signal.SIGTERM):
         _logger.info("Appears process has already exited.")
 
 
+def _kill_escaped_descendants(pid, sig=signal.SIGKILL):
+    """Kill any descendants of *pid* that left its process group.
+
+    Killing the process group doesn't reach children that called setsid() or
+    setpgid(), so find those in the process tree and kill them individually.
+    This must happen before the group is killed, while the children can still
+    be traced back to *pid*.
+
+    """
+    for child_pid in get_process_tree(max_age=0).get_descendant_pids(pid):
+        try:
+            if os.getpgid(child_pid) == pid:
+                continue
+            _logger.info("Killing escaped child process %d", child_pid)
+            os.kill(child_pid, sig)
+        except OSError:
+            pass
+
+
 def _is_process_running(pid):
     return psutil.pid_exists(pid)
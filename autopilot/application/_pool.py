@@ -0,0 +1,136 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for keeping launched applications running between tests.
+
+Tests that only read the state of an application don't need a freshly
+launched copy of it. The pool keeps the application launched by one test
+running, and hands it to the following tests in the same scope that launch
+the same application in the same way, instead of launching it again.
+
+"""
+
+import atexit
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class ApplicationPool(object):
+
+    """Holds at most one launched application, and the launcher fixture that
+    launched it.
+
+    A pooled application belongs to a scope, such as a test case class or a
+    module, and is known by a key describing how it was launched. It's only
+    handed out again for the same scope and key, and only once it has passed
+    a health check.
+
+    """
+
+    def __init__(self):
+        self._scope = None
+        self._key = None
+        self._launcher = None
+        self._application = None
+        self._add_detail = None
+
+    def get_application(self, scope, key, launch, add_detail):
+        """Return the pooled application, launching it first if the pool
+        doesn't hold a healthy application launched with *key* in *scope*.
+
+        :param scope: The scope the application is shared within.
+        :param key: A hashable description of how the application is
+            launched.
+        :param launch: A callable that is passed the addDetail method the
+            launcher should use, and returns the launcher fixture, already
+            set up, and the proxy object for the application it launched.
+        :param add_detail: The addDetail method of the test using the
+            application. Details added by the launcher are attached to this
+            test until end_test is called.
+        :returns: A tuple of the application proxy object and whether it was
+            launched by this call.
+
+        """
+        self._add_detail = add_detail
+        if (self._scope, self._key) == (scope, key) and self._is_healthy():
+            return self._application, False
+        self.release()
+        self._launcher, self._application = launch(self._add_launcher_detail)
+        self._scope = scope
+        self._key = key
+        return self._application, True
+
+    def end_test(self, discard=False):
+        """Stop attaching details to the test using the pooled application.
+
+        :param discard: If True, the application is stopped instead of being
+            kept for the next test.
+
+        """
+        if discard:
+            self.release()
+        self._add_detail = None
+
+    def release_unless_in_scope(self, scope):
+        """Stop the pooled application if it doesn't belong to *scope*."""
+        if self._scope != scope:
+            self.release()
+
+    def release(self):
+        """Stop the pooled application, if there is one."""
+        launcher = self._launcher
+        self._scope = None
+        self._key = None
+        self._launcher = None
+        self._application = None
+        if launcher is not None:
+            launcher.cleanUp()
+
+    def _is_healthy(self):
+        process = self._application.process
+        if process is not None and process.poll() is not None:
+            _logger.info(
+                "Pooled application exited with code %d, relaunching it.",
+                process.returncode
+            )
+            return False
+        try:
+            self._application.refresh_state()
+        except Exception as e:
+            _logger.info(
+                "Pooled application failed its health check (%s), "
+                "relaunching it.",
+                e
+            )
+            return False
+        return True
+
+    def _add_launcher_detail(self, name, content):
+        if self._add_detail is not None:
+            self._add_detail(name, content)
+
+
+_application_pool = ApplicationPool()
+atexit.register(_application_pool.release)
+
+
+def get_application_pool():
+    """Return the application pool shared by every test in this process."""
+    return _application_pool
@@ -61,6 +61,57 @@ def get_custom_bus(bus_address):
     """Return a custom bus that has had the DBus GLib main loop
     initialised.
 
+    Connections are pooled, so asking for the same *bus_address* again
+    returns the same connection for as long as it stays connected.
+
     """
     _ensure_glib_loop_set()
-    return BusConnection(bus_address)
+    return _custom_bus_pool.get_connection(bus_address)
+
+
+def close_custom_buses():
+    """Close every pooled custom bus connection.
+
+    The autopilot runner calls this once the test run has finished.
+
+    """
+    _custom_bus_pool.close_all()
+
+
+class _BusConnectionPool(object):
+
+    """Keep one open connection per custom bus address.
+
+    Opening a BusConnection means a new socket and another authentication
+    handshake with the bus daemon, so connections are reused for as long as
+    they stay connected.
+    """
+
+    def __init__(self):
+        self._connections = {}
+
+    def get_connection(self, bus_address):
+        connection = self._connections.get(bus_address)
+        if connection is None or not _connection_is_alive(connection):
+            connection = BusConnection(bus_address)
+            self._connections[bus_address] = connection
+        return connection
+
+    def close_all(self):
+        connections = list(self._connections.values())
+        self._connections.clear()
+        for connection in connections:
+            try:
+                connection.close()
+            except dbus.DBusException:
+                pass
+
+
+def _connection_is_alive(connection):
+    try:
+        return connection.get_is_connected()
+    except dbus.DBusException:
+        return False
+
+
+_custom_bus_pool = _BusConnectionPool()
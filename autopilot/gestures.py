@@ -65,7 +65,7 @@ def pinch(center, vector_start, vector_end):
     for i in range(0, 100):
         finger_1.move(*finger_1_cur)
         finger_2.move(*finger_2_cur)
-        sleep(0.005)
+        sleep(0.005, 'gesture step')
 
         finger_1_cur = [finger_1_cur[0] + dx, finger_1_cur[1] + dy]
         finger_2_cur = [finger_2_cur[0] - dx, finger_2_cur[1] - dy]
@@ -42,6 +42,8 @@ from Xlib import X, XK
 from Xlib.display import Display
 from Xlib.ext.xtest import fake_input
 
+from autopilot._timing import INPUT_PHASE, phase_timer
+
 
 _PRESSED_KEYS = []
 _PRESSED_MOUSE_BUTTONS = []
@@ -144,7 +146,7 @@ class Keyboard(KeyboardBase):
         _logger.debug("Pressing keys %r with delay %f", keys, delay)
         for key in self.__translate_keys(keys):
             self.__perform_on_key(key, X.KeyPress)
-            sleep(delay)
+            sleep(delay, 'input delay')
 
     def release(self, keys, delay=0.2):
         """Send key release events only.
@@ -166,7 +168,7 @@ class Keyboard(KeyboardBase):
         keys.reverse()
         for key in keys:
             self.__perform_on_key(key, X.KeyRelease)
-            sleep(delay)
+            sleep(delay, 'input delay')
 
     def press_and_release(self, keys, delay=0.2):
         """Press and release all items in 'keys'.
@@ -201,9 +203,9 @@ class Keyboard(KeyboardBase):
             # Don't call press or release here, as they translate keys to
             # keysyms.
             self.__perform_on_key(key, X.KeyPress)
-            sleep(delay)
+            sleep(delay, 'input delay')
             self.__perform_on_key(key, X.KeyRelease)
-            sleep(delay)
+            sleep(delay, 'input delay')
 
     @classmethod
     def on_test_end(cls, test_instance):
@@ -244,8 +246,10 @@ class Keyboard(KeyboardBase):
                     "Generating release event for keycode %d that was not "
                     "pressed.", keycode)
 
-        fake_input(get_display(), event, keycode)
-        get_display().sync()
+        event_name = 'key press' if event == X.KeyPress else 'key release'
+        with phase_timer.time_phase(INPUT_PHASE, event_name):
+            fake_input(get_display(), event, keycode)
+            get_display().sync()
 
     def __get_keysym(self, key):
         keysym = XK.string_to_keysym(key)
@@ -304,8 +308,9 @@ class Mouse(MouseBase):
         """Press mouse button at current mouse location."""
         _logger.debug("Pressing mouse button %d", button)
         _PRESSED_MOUSE_BUTTONS.append(button)
-        fake_input(get_display(), X.ButtonPress, button)
-        get_display().sync()
+        with phase_timer.time_phase(INPUT_PHASE, 'button press'):
+            fake_input(get_display(), X.ButtonPress, button)
+            get_display().sync()
 
     def release(self, button=1):
         """Releases mouse button at current mouse location."""
@@ -316,14 +321,15 @@ class Mouse(MouseBase):
             _logger.warning(
                 "Generating button release event or button %d that was not "
                 "pressed.", button)
-        fake_input(get_display(), X.ButtonRelease, button)
-        get_display().sync()
+        with phase_timer.time_phase(INPUT_PHASE, 'button release'):
+            fake_input(get_display(), X.ButtonRelease, button)
+            get_display().sync()
 
     def click(self, button=1, press_duration=0.10, time_between_events=0.1):
         """Click mouse at current location."""
         self.event_delayer.delay(time_between_events)
         self.press(button)
-        sleep(press_duration)
+        sleep(press_duration, 'input delay')
         self.release(button)
 
     def move(self, x, y, animate=True, rate=10, time_between_events=0.01):
@@ -334,16 +340,17 @@ class Mouse(MouseBase):
 
         """
         def perform_move(x, y, sync):
-            fake_input(
-                get_display(),
-                X.MotionNotify,
-                sync,
-                X.CurrentTime,
-                X.NONE,
-                x=int(x),
-                y=int(y))
-            get_display().sync()
-            sleep(time_between_events)
+            with phase_timer.time_phase(INPUT_PHASE, 'pointer motion'):
+                fake_input(
+                    get_display(),
+                    X.MotionNotify,
+                    sync,
+                    X.CurrentTime,
+                    X.NONE,
+                    x=int(x),
+                    y=int(y))
+                get_display().sync()
+            sleep(time_between_events, 'gesture step')
 
         dest_x, dest_y = int(x), int(y)
         _logger.debug(
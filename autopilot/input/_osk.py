@@ -81,7 +81,7 @@ class Keyboard(KeyboardBase):
 
         try:
             self._keyboard.press_key(key)
-            sleep(delay)
+            sleep(delay, 'input delay')
         except ValueError as e:
             e.args += ("OSK Backend is unable to type the key '%s" % key,)
             raise
@@ -28,6 +28,7 @@ from autopilot.input import Touch as TouchBase
 from autopilot.input import get_center_point
 from autopilot.platform import model
 from autopilot.utilities import deprecated, EventDelay, sleep
+from autopilot._timing import INPUT_PHASE, phase_timer
 
 
 _logger = logging.getLogger(__name__)
@@ -71,8 +72,10 @@ class _UInputKeyboardDevice(object):
         self._emit(ecode, press_value)
 
     def _emit(self, ecode, value):
-        self._device.write(e.EV_KEY, ecode, value)
-        self._device.syn()
+        event_name = 'key press' if value else 'key release'
+        with phase_timer.time_phase(INPUT_PHASE, event_name):
+            self._device.write(e.EV_KEY, ecode, value)
+            self._device.syn()
 
     def release(self, key):
         """Release one key button.
@@ -136,7 +139,7 @@ class Keyboard(KeyboardBase):
         for key in self._sanitise_keys(keys):
             for key_button in self._get_key_buttons(key):
                 self._device.press(key_button)
-                sleep(delay)
+                sleep(delay, 'input delay')
 
     def release(self, keys, delay=0.1):
         """Send key release events only.
@@ -160,7 +163,7 @@ class Keyboard(KeyboardBase):
         for key in reversed(self._sanitise_keys(keys)):
             for key_button in reversed(self._get_key_buttons(key)):
                 self._device.release(key_button)
-                sleep(delay)
+                sleep(delay, 'input delay')
 
     def press_and_release(self, keys, delay=0.1):
         """Press and release all items in 'keys'.
@@ -368,15 +371,17 @@ class _UInputTouchDevice(object):
             raise RuntimeError("Cannot press finger: it's already pressed.")
         self._touch_finger_slot = self._get_free_touch_finger_slot()
 
-        self._device.write(e.EV_ABS, e.ABS_MT_SLOT, self._touch_finger_slot)
-        self._device.write(
-            e.EV_ABS, e.ABS_MT_TRACKING_ID, self._get_next_tracking_id())
-        press_value = 1
-        self._device.write(e.EV_KEY, _get_touch_tool(), press_value)
-        self._device.write(e.EV_ABS, e.ABS_MT_POSITION_X, int(x))
-        self._device.write(e.EV_ABS, e.ABS_MT_POSITION_Y, int(y))
-        self._device.write(e.EV_ABS, e.ABS_MT_PRESSURE, 400)
-        self._device.syn()
+        with phase_timer.time_phase(INPUT_PHASE, 'touch down'):
+            self._device.write(
+                e.EV_ABS, e.ABS_MT_SLOT, self._touch_finger_slot)
+            self._device.write(
+                e.EV_ABS, e.ABS_MT_TRACKING_ID, self._get_next_tracking_id())
+            press_value = 1
+            self._device.write(e.EV_KEY, _get_touch_tool(), press_value)
+            self._device.write(e.EV_ABS, e.ABS_MT_POSITION_X, int(x))
+            self._device.write(e.EV_ABS, e.ABS_MT_POSITION_Y, int(y))
+            self._device.write(e.EV_ABS, e.ABS_MT_PRESSURE, 400)
+            self._device.syn()
 
     def _get_free_touch_finger_slot(self):
         """Return the id of a free touch finger.
@@ -406,10 +411,12 @@ class _UInputTouchDevice(object):
         if not self.pressed:
             raise RuntimeError('Attempting to move without finger being down.')
         _logger.debug("Moving pointing 'finger' to position %d,%d.", x, y)
-        self._device.write(e.EV_ABS, e.ABS_MT_SLOT, self._touch_finger_slot)
-        self._device.write(e.EV_ABS, e.ABS_MT_POSITION_X, int(x))
-        self._device.write(e.EV_ABS, e.ABS_MT_POSITION_Y, int(y))
-        self._device.syn()
+        with phase_timer.time_phase(INPUT_PHASE, 'touch move'):
+            self._device.write(
+                e.EV_ABS, e.ABS_MT_SLOT, self._touch_finger_slot)
+            self._device.write(e.EV_ABS, e.ABS_MT_POSITION_X, int(x))
+            self._device.write(e.EV_ABS, e.ABS_MT_POSITION_Y, int(y))
+            self._device.syn()
         _logger.debug("The pointing 'finger' is now at position %d,%d.", x, y)
 
     def finger_up(self):
@@ -420,12 +427,15 @@ class _UInputTouchDevice(object):
         """
         if not self.pressed:
             raise RuntimeError("Cannot release finger: it's not pressed.")
-        self._device.write(e.EV_ABS, e.ABS_MT_SLOT, self._touch_finger_slot)
-        lift_tracking_id = -1
-        self._device.write(e.EV_ABS, e.ABS_MT_TRACKING_ID, lift_tracking_id)
-        release_value = 0
-        self._device.write(e.EV_KEY, _get_touch_tool(), release_value)
-        self._device.syn()
+        with phase_timer.time_phase(INPUT_PHASE, 'touch up'):
+            self._device.write(
+                e.EV_ABS, e.ABS_MT_SLOT, self._touch_finger_slot)
+            lift_tracking_id = -1
+            self._device.write(
+                e.EV_ABS, e.ABS_MT_TRACKING_ID, lift_tracking_id)
+            release_value = 0
+            self._device.write(e.EV_KEY, _get_touch_tool(), release_value)
+            self._device.syn()
         self._release_touch_finger()
 
     def _release_touch_finger(self):
@@ -479,7 +489,7 @@ class Touch(TouchBase):
         _logger.debug("Tapping at: %d,%d", x, y)
         self.event_delayer.delay(time_between_events)
         self._finger_down(x, y)
-        sleep(press_duration)
+        sleep(press_duration, 'input delay')
         self._device.finger_up()
 
     def _finger_down(self, x, y):
@@ -577,7 +587,7 @@ class Touch(TouchBase):
 
             self._device.finger_move(current_x, current_y)
 
-            sleep(time_between_events)
+            sleep(time_between_events, 'gesture step')
 
     def drag(self, x1, y1, x2, y2, rate=10, time_between_events=0.01):
         """Perform a drag gesture.
@@ -700,5 +710,5 @@ class UInputHardwareKeysDevice:
                 self._device.device = device
                 return
             else:
-                sleep(retry_interval)
+                sleep(retry_interval, 'device wait')
         raise RuntimeError('Failed to find UInput device.')
@@ -0,0 +1,171 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for working out what an autopilot backend can do.
+
+The DBus introspection xml for the autopilot object path lists every
+interface, and every method on those interfaces, that the toolkit driver in
+the application under test implements. This module parses that xml once into
+a :class:`BackendCapabilities` object, and caches it so that connecting to the
+same driver again doesn't require another Introspect call.
+
+"""
+
+import logging
+from xml.etree import ElementTree
+
+from autopilot.introspection.constants import (
+    AP_INTROSPECTION_IFACE,
+    QT_AUTOPILOT_IFACE,
+)
+
+
+_logger = logging.getLogger(__name__)
+
+
+# Interfaces that a toolkit driver may implement in addition to the core
+# autopilot introspection interface.
+OPTIONAL_EXTENSION_IFACES = (
+    QT_AUTOPILOT_IFACE,
+)
+
+
+class BackendCapabilities(object):
+
+    """The interfaces and methods exported by an autopilot backend."""
+
+    def __init__(self, interfaces):
+        """Construct a new BackendCapabilities instance.
+
+        :param interfaces: A dictionary mapping interface names to an iterable
+            of the method names on that interface.
+
+        """
+        self._interfaces = {
+            name: frozenset(methods) for name, methods in interfaces.items()
+        }
+
+    @classmethod
+    def from_introspection_xml(cls, introspection_xml):
+        """Create a BackendCapabilities instance from DBus introspection xml.
+
+        Xml that cannot be parsed results in an instance with no interfaces.
+
+        """
+        try:
+            root = ElementTree.fromstring(introspection_xml)
+        except ElementTree.ParseError as e:
+            _logger.warning("Unable to parse introspection xml: %s", e)
+            return cls({})
+        return cls({
+            iface.get('name'): [
+                method.get('name') for method in iface.iter('method')
+            ]
+            for iface in root.iter('interface')
+        })
+
+    @property
+    def interfaces(self):
+        """A frozenset of the interface names exported by the backend."""
+        return frozenset(self._interfaces)
+
+    @property
+    def extensions(self):
+        """A frozenset of the optional protocol extensions available."""
+        return frozenset(
+            iface for iface in OPTIONAL_EXTENSION_IFACES
+            if iface in self._interfaces
+        )
+
+    def has_autopilot_interface(self):
+        """Return True if the core autopilot interface is exported."""
+        return self.has_interface(AP_INTROSPECTION_IFACE)
+
+    def has_interface(self, interface_name):
+        """Return True if *interface_name* is exported by the backend."""
+        return interface_name in self._interfaces
+
+    def has_method(self, interface_name, method_name):
+        """Return True if *interface_name* has a method named *method_name*."""
+        return method_name in self._interfaces.get(interface_name, ())
+
+    def __eq__(self, other):
+        return self._interfaces == other._interfaces
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "<BackendCapabilities %s>" % ', '.join(sorted(self._interfaces))
+
+
+class _CapabilitiesCache(object):
+
+    """Cache BackendCapabilities per backend address and driver version."""
+
+    def __init__(self):
+        self._cache = {}
+        self._latest_versions = {}
+
+    def get(self, dbus_address, version):
+        """Return the capabilities recorded for *dbus_address* when it
+        reported wire protocol *version*, or None.
+
+        """
+        return self._cache.get((dbus_address, version))
+
+    def get_latest(self, dbus_address):
+        """Return the most recently recorded capabilities for *dbus_address*,
+        whatever version it reported, or None.
+
+        """
+        version = self._latest_versions.get(dbus_address)
+        if version is None:
+            return None
+        return self._cache[(dbus_address, version)]
+
+    def has_address(self, dbus_address):
+        """Return True if capabilities have been recorded for *dbus_address*.
+        """
+        return dbus_address in self._latest_versions
+
+    def add(self, dbus_address, version, capabilities):
+        """Record *capabilities* for *dbus_address* at *version*."""
+        self._cache[(dbus_address, version)] = capabilities
+        self._latest_versions[dbus_address] = version
+
+    def reset_cache(self):
+        self._cache.clear()
+        self._latest_versions.clear()
+
+
+capabilities_cache = _CapabilitiesCache()
+
+
+def get_backend_capabilities(dbus_address):
+    """Return the known capabilities of the backend at *dbus_address*.
+
+    No DBus calls are made. Features that have a fast path for some protocol
+    extension can use this to decide whether to take it.
+
+    :returns: A :class:`BackendCapabilities` instance, or None if no proxy
+        object has been created for *dbus_address* yet.
+
+    """
+    return capabilities_cache.get_latest(dbus_address)
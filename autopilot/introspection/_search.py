@@ -22,15 +22,23 @@
 import dbus
 import logging
 import os
-import psutil
 import subprocess
+import time
 from functools import partial
+from gi.repository import GLib
 from operator import methodcaller
 
 from autopilot import dbus_handler
 from autopilot._timeout import Timeout
+from autopilot._timing import DBUS_PHASE, SEARCH_PHASE, phase_timer
+from autopilot._tracing import HAVE_TRACEPOINT, emit_proxy_event
 from autopilot.exceptions import ProcessSearchError
+from autopilot.globals import get_default_timeout_period
 from autopilot.introspection import backends
+from autopilot.introspection._capabilities import (
+    BackendCapabilities,
+    capabilities_cache,
+)
 from autopilot.introspection import constants
 from autopilot.introspection import dbus as ap_dbus
 from autopilot.introspection import _object_registry
@@ -38,9 +46,11 @@ from autopilot.introspection._xpathselect import get_classname_from_path
 from autopilot.introspection.backends import WireProtocolVersionMismatch
 from autopilot.introspection.utilities import (
     _get_bus_connections_pid,
+    _get_bus_connections_pids,
     _pid_is_running,
     process_util,
 )
+from autopilot.process._tree import get_process_tree
 from autopilot.utilities import deprecated
 
 
@@ -109,6 +119,11 @@ def get_proxy_object_for_existing_process(**kwargs):
     :param emulator_base: The custom emulator to use when creating the
         resulting proxy object.
         Defaults to None
+    :param connection_watcher: A watcher returned by
+        :func:`get_new_connection_watcher` before the application was started.
+        If supplied, only connections that appeared after the watcher was
+        created are searched, and the search wakes up as soon as one appears.
+        Defaults to None
 
     **Exceptions possibly thrown by this function:**
 
@@ -156,6 +171,7 @@ def get_proxy_object_for_existing_process(**kwargs):
     dbus_bus = _get_dbus_bus_from_string(kwargs.pop('dbus_bus', 'session'))
     process = kwargs.pop('process', None)
     emulator_base = kwargs.pop('emulator_base', None)
+    connection_watcher = kwargs.pop('connection_watcher', None)
 
     # Force default object_path
     kwargs['object_path'] = kwargs.get('object_path', constants.AUTOPILOT_PATH)
@@ -166,11 +182,14 @@ def get_proxy_object_for_existing_process(**kwargs):
 
     matcher_function = _filter_function_from_search_params(kwargs)
 
-    connections = _find_matching_connections(
-        dbus_bus,
-        matcher_function,
-        process
-    )
+    search_criteria = _get_search_criteria_string_representation(**kwargs)
+    with phase_timer.time_phase(SEARCH_PHASE, search_criteria):
+        connections = _find_matching_connections(
+            dbus_bus,
+            matcher_function,
+            process,
+            connection_watcher
+        )
 
     if pid is not None:
         # Due to the filtering including children parents, if there exists a
@@ -182,10 +201,7 @@ def get_proxy_object_for_existing_process(**kwargs):
             dbus_bus
         )
 
-    _raise_if_not_single_result(
-        connections,
-        _get_search_criteria_string_representation(**kwargs)
-    )
+    _raise_if_not_single_result(connections, search_criteria)
 
     object_path = kwargs['object_path']
     connection_name = connections[0]
@@ -220,7 +236,7 @@ def get_proxy_object_for_existing_process_by_name(
 
 def _map_connection_to_pid(connection, dbus_bus):
     try:
-        return _get_bus_connections_pid(dbus_bus, connection)
+        return _connection_pids.get_pid(dbus_bus, connection)
     except dbus.DBusException as e:
         logger.info(
             "dbus.DBusException while attempting to get PID for %s: %r" %
@@ -359,7 +375,8 @@ def _filter_runner(filter_list, search_parameters, dbus_tuple):
     )
 
 
-def _find_matching_connections(bus, connection_matcher, process=None):
+def _find_matching_connections(
+        bus, connection_matcher, process=None, connection_watcher=None):
     """Returns a list of connection names that have passed the
     connection_matcher.
 
@@ -371,13 +388,25 @@ def _find_matching_connections(bus, connection_matcher, process=None):
         dbus connection.
         Used to ensure that the process is in fact still running
         while we're searching for it.
+    :param connection_watcher: (optional) A _NewConnectionWatcher that was
+        created before the process was started. If set, only the connections
+        it has seen are considered, and we wait on it rather than sleeping
+        between attempts.
 
     """
-    for _ in Timeout.default():
+    if connection_watcher is None:
+        timeout = Timeout.default()
+        list_names = bus.list_names
+    else:
+        timeout = _watched_timeout(connection_watcher)
+        list_names = connection_watcher.get_connection_names
+
+    for _ in timeout:
         _get_child_pids.reset_cache()
         _raise_if_process_has_exited(process)
 
-        connections = bus.list_names()
+        connections = list_names()
+        _connection_pids.reset_cache(bus, connections)
 
         valid_connections = [
             c for c
@@ -391,6 +420,29 @@ def _find_matching_connections(bus, connection_matcher, process=None):
     return []
 
 
+def _watched_timeout(connection_watcher):
+    """Start a polling loop with the default timeout that waits on
+    *connection_watcher* between iterations instead of sleeping.
+
+    The watcher only tracks a handful of connections, so polling them often
+    is cheap, and the loop wakes up as soon as a new connection appears.
+
+    """
+    timeout = float(get_default_timeout_period())
+    start_time = time.monotonic()
+    while True:
+        time_elapsed = time.monotonic() - start_time
+        yield time_elapsed
+        if time_elapsed >= timeout:
+            break
+        connection_watcher.wait_for_connection(
+            min(timeout - time_elapsed, _WATCHED_POLL_INTERVAL)
+        )
+
+
+_WATCHED_POLL_INTERVAL = 0.1
+
+
 def _raise_if_process_has_exited(process):
     """Raises ProcessSearchError if process is no longer running."""
     if process is not None and not _process_is_running(process):
@@ -406,13 +458,13 @@ def _process_is_running(process):
 
 
 def _dedupe_connections_on_pid(valid_connections, bus):
-    seen_pids = []
+    seen_pids = set()
     deduped_connections = []
 
     for connection in valid_connections:
-        pid = _get_bus_connections_pid(bus, connection)
+        pid = _connection_pids.get_pid(bus, connection)
         if pid not in seen_pids:
-            seen_pids.append(pid)
+            seen_pids.add(pid)
             deduped_connections.append(connection)
     return deduped_connections
 
@@ -455,12 +507,17 @@ def _make_proxy_object(dbus_address, emulator_base):
     emulator_base = emulator_base or _make_default_emulator_base()
     _raise_if_base_class_not_actually_base(emulator_base)
 
-    # Get the dbus introspection Xml for the backend.
-    intro_xml = _get_introspection_xml_from_backend(dbus_address)
+    # Get the backend capabilities, the wire protocol version and the root
+    # state of the backend in a single round trip.
+    with phase_timer.time_phase(DBUS_PHASE, 'root state'):
+        capabilities, version, state_data = _get_root_introspection_details(
+            dbus_address
+        )
+    dbus_address.check_wire_protocol_version(version)
     try:
         # Figure out if the backend has any extension methods, and return
         # classes that understand how to use each of those extensions:
-        extension_classes = _get_proxy_bases_from_introspection_xml(intro_xml)
+        extension_classes = _get_proxy_bases_from_capabilities(capabilities)
 
         # Register those base classes for everything that will derive from this
         # emulator base class.
@@ -475,9 +532,7 @@ def _make_proxy_object(dbus_address, emulator_base):
         )
         raise e
 
-    cls_name, path, cls_state = _get_proxy_object_class_name_and_state(
-        dbus_address
-    )
+    cls_name, path, cls_state = _get_details_from_state_data(state_data)
 
     proxy_class = _object_registry._get_proxy_object_class(
         emulator_base._id,
@@ -488,6 +543,8 @@ def _make_proxy_object(dbus_address, emulator_base):
     # root of the tree. Ideally this would be nicer...
     if ApplicationProxyObject not in proxy_class.__bases__:
         proxy_class.__bases__ += (ApplicationProxyObject, )
+    if HAVE_TRACEPOINT:
+        emit_proxy_event(proxy_class.__name__, path.decode('utf-8'))
     return proxy_class(cls_state, path, backends.Backend(dbus_address))
 
 
@@ -586,6 +643,96 @@ def _make_proxy_object_async(
     )
 
 
+def _get_root_introspection_details(dbus_address):
+    """Get the capabilities, wire protocol version and root state of a
+    backend.
+
+    The Introspect, GetVersion and GetState('/') calls are issued at the same
+    time, and a GLib main loop is run until all three have replied. This
+    makes creating the root proxy object cost one round trip to the
+    application under test, rather than three.
+
+    The parsed introspection xml is cached per backend and wire protocol
+    version. If we have seen this backend before the Introspect call is
+    skipped, unless it now reports a different version.
+
+    :param dbus_address: The DBusAddress object we're querying.
+    :returns: A tuple containing a BackendCapabilities instance, the wire
+        protocol version string and the state data of the root node.
+    :raises RuntimeError: if the backend does not reply within the default
+        timeout period.
+    :raises DBusException: if the Introspect or GetState calls fail.
+
+    """
+    need_introspection_xml = not capabilities_cache.has_address(dbus_address)
+    num_calls = 3 if need_introspection_xml else 2
+    state = dict(replies={}, error=None, timed_out=False)
+    loop = GLib.MainLoop()
+
+    def on_reply(name, value):
+        state['replies'][name] = value
+        if len(state['replies']) == num_calls:
+            loop.quit()
+
+    def on_error(error):
+        state['error'] = error
+        loop.quit()
+
+    def on_timeout():
+        state['timed_out'] = True
+        loop.quit()
+        return False
+
+    iface = dbus_address.unchecked_introspection_iface
+    if need_introspection_xml:
+        _get_introspection_xml_from_backend(
+            dbus_address,
+            reply_handler=partial(on_reply, 'xml'),
+            error_handler=on_error,
+        )
+    # Backends older than wire protocol 1.3 don't implement GetVersion:
+    iface.GetVersion(
+        reply_handler=partial(on_reply, 'version'),
+        error_handler=lambda e: on_reply('version', '1.2'),
+    )
+    iface.GetState(
+        '/',
+        reply_handler=lambda r: on_reply('state', r[0]),
+        error_handler=on_error,
+    )
+    if len(state['replies']) < num_calls and state['error'] is None:
+        timeout_id = GLib.timeout_add_seconds(
+            int(get_default_timeout_period()),
+            on_timeout
+        )
+        loop.run()
+        if not state['timed_out']:
+            GLib.source_remove(timeout_id)
+
+    if state['error'] is not None:
+        raise state['error']
+    if state['timed_out']:
+        raise RuntimeError(
+            "Timed out waiting for the introspection details of %s"
+            % dbus_address
+        )
+    replies = state['replies']
+    version = replies['version']
+    capabilities = capabilities_cache.get(dbus_address, version)
+    if capabilities is None:
+        # Either a new backend, or the driver has changed underneath us:
+        introspection_xml = replies.get('xml')
+        if introspection_xml is None:
+            introspection_xml = _get_introspection_xml_from_backend(
+                dbus_address
+            )
+        capabilities = BackendCapabilities.from_introspection_xml(
+            introspection_xml
+        )
+        capabilities_cache.add(dbus_address, version, capabilities)
+    return capabilities, version, replies['state']
+
+
 def _get_introspection_xml_from_backend(
         backend, reply_handler=None, error_handler=None):
     """Get DBus Introspection xml from a backend.
@@ -670,9 +817,6 @@ def _get_details_from_state_data(state_data):
 def _get_proxy_bases_from_introspection_xml(introspection_xml):
     """Return  tuple of the base classes to use when creating a proxy object.
 
-    Currently this works by looking for certain interface names in the XML. In
-    the future we may want to parse the XML and perform more rigerous checks.
-
     :param introspection_xml: An xml string that describes the exported object
         on the dbus backend. This determines which capabilities are present in
         the backend, and therefore which base classes should be used to create
@@ -680,14 +824,28 @@ def _get_proxy_bases_from_introspection_xml(introspection_xml):
 
     :raises RuntimeError: if the autopilot interface cannot be found.
 
+    """
+    return _get_proxy_bases_from_capabilities(
+        BackendCapabilities.from_introspection_xml(introspection_xml)
+    )
+
+
+def _get_proxy_bases_from_capabilities(capabilities):
+    """Return  tuple of the base classes to use when creating a proxy object.
+
+    :param capabilities: A BackendCapabilities instance that describes the
+        interfaces exported by the backend.
+
+    :raises RuntimeError: if the autopilot interface cannot be found.
+
     """
 
     bases = []
 
-    if constants.AP_INTROSPECTION_IFACE not in introspection_xml:
+    if not capabilities.has_autopilot_interface():
         raise RuntimeError("Could not find Autopilot interface.")
 
-    if constants.QT_AUTOPILOT_IFACE in introspection_xml:
+    if constants.QT_AUTOPILOT_IFACE in capabilities.extensions:
         from autopilot.introspection.qt import QtObjectProxyMixin
         bases.append(QtObjectProxyMixin)
 
@@ -742,33 +900,168 @@ def _get_dbus_address_object(connection_name, object_path, bus):
 
 
 class _cached_get_child_pids(object):
-    """Get a list of all child process Ids, for the given parent.
+    """Get a set of all child process Ids, for the given parent.
 
     Since we call this often, and it's a very expensive call, we optimise this
     such that the return value will be cached for each scan through the dbus
-    bus.
+    bus. The children are found from the shared process tree index, so asking
+    about several parents doesn't cost a scan of /proc each.
 
     Calling reset_cache() at the end of each dbus scan will ensure that you get
     fresh values on the next call.
     """
 
     def __init__(self):
-        self._cached_result = None
+        self._cached_result = {}
 
     def __call__(self, pid):
-        if self._cached_result is None:
-            self._cached_result = [
-                p.pid for p in psutil.Process(pid).children(recursive=True)
-            ]
-        return self._cached_result
+        if pid not in self._cached_result:
+            self._cached_result[pid] = get_process_tree().get_descendant_pids(
+                pid
+            )
+        return self._cached_result[pid]
 
     def reset_cache(self):
-        self._cached_result = None
+        self._cached_result = {}
 
 
 _get_child_pids = _cached_get_child_pids()
 
 
+class _cached_get_connection_pids(object):
+    """Look up the pid of a connection on a dbus bus.
+
+    Every filter, and the de-duplication step, needs the pid of each
+    connection. Rather than asking the bus daemon once per connection per
+    step, the pids of every connection in a scan are fetched in one batch the
+    first time any of them is needed.
+
+    Calling reset_cache() at the start of each dbus scan, with the connection
+    names found in that scan, will ensure that you get fresh values.
+    """
+
+    def __init__(self):
+        self._bus = None
+        self._connection_names = ()
+        self._cached_result = None
+
+    def get_pid(self, bus, connection_name):
+        """Return the pid of *connection_name* on *bus*.
+
+        :raises DBusException: if the pid could not be found.
+
+        """
+        if (bus is not self._bus
+                or connection_name not in self._connection_names):
+            return _get_bus_connections_pid(bus, connection_name)
+        if self._cached_result is None:
+            self._cached_result = _get_bus_connections_pids(
+                bus,
+                self._connection_names
+            )
+        result = self._cached_result[connection_name]
+        if isinstance(result, dbus.DBusException):
+            raise result
+        return result
+
+    def reset_cache(self, bus=None, connection_names=()):
+        self._bus = bus
+        self._connection_names = frozenset(connection_names)
+        self._cached_result = None
+
+
+_connection_pids = _cached_get_connection_pids()
+
+
+def get_new_connection_watcher(dbus_bus='session'):
+    """Return an object that watches *dbus_bus* for new connections.
+
+    Create the watcher before starting an application, and pass it to
+    :func:`get_proxy_object_for_existing_process` as ``connection_watcher``
+    once the application is running. Call ``stop()`` on it when the search is
+    over.
+
+    :param dbus_bus: The DBus bus to watch, as accepted by
+        :func:`get_proxy_object_for_existing_process`.
+    :returns: A watcher object, or None if the bus could not be watched, in
+        which case the search falls back to listing all bus connections.
+
+    """
+    try:
+        return _NewConnectionWatcher(_get_dbus_bus_from_string(dbus_bus))
+    except dbus.DBusException as e:
+        logger.info("Unable to watch for new dbus connections: %r", e)
+        return None
+
+
+class _NewConnectionWatcher(object):
+
+    """Keep track of the connections that appear on a bus after construction.
+
+    The NameOwnerChanged signal tells us about new connections as soon as the
+    bus daemon knows about them, so there's no need to repeatedly list every
+    name on the bus while waiting for an application to start.
+
+    """
+
+    def __init__(self, bus):
+        self._names = []
+        self._loop = None
+        self._match = bus.add_signal_receiver(
+            self._on_name_owner_changed,
+            signal_name='NameOwnerChanged',
+            dbus_interface='org.freedesktop.DBus',
+            bus_name='org.freedesktop.DBus',
+        )
+
+    def _on_name_owner_changed(self, name, old_owner, new_owner):
+        if new_owner and not old_owner:
+            if name not in self._names:
+                self._names.append(name)
+            if self._loop is not None:
+                self._loop.quit()
+        elif old_owner and not new_owner and name in self._names:
+            self._names.remove(name)
+
+    def get_connection_names(self):
+        """Return the connection names that have appeared so far."""
+        _dispatch_pending_glib_events()
+        return list(self._names)
+
+    def wait_for_connection(self, timeout):
+        """Wait until a new connection appears, or *timeout* seconds pass."""
+        num_names = len(self._names)
+        _dispatch_pending_glib_events()
+        if len(self._names) != num_names:
+            return
+
+        state = dict(timed_out=False)
+        self._loop = GLib.MainLoop()
+
+        def on_timeout():
+            state['timed_out'] = True
+            self._loop.quit()
+            return False
+
+        timeout_id = GLib.timeout_add(int(timeout * 1000), on_timeout)
+        try:
+            self._loop.run()
+        finally:
+            self._loop = None
+            if not state['timed_out']:
+                GLib.source_remove(timeout_id)
+
+    def stop(self):
+        """Stop watching the bus."""
+        self._match.remove()
+
+
+def _dispatch_pending_glib_events():
+    context = GLib.MainContext.default()
+    while context.pending():
+        context.iteration(False)
+
+
 # Filters
 
 class ConnectionIsNotOrgFreedesktopDBus(object):
@@ -799,7 +1092,7 @@ class ConnectionIsNotOurConnection(object):
     def matches(cls, dbus_tuple, params):
         try:
             bus, connection_name = dbus_tuple
-            bus_pid = _get_bus_connections_pid(bus, connection_name)
+            bus_pid = _connection_pids.get_pid(bus, connection_name)
             return bus_pid != os.getpid()
         except dbus.DBusException:
             return False
@@ -849,15 +1142,14 @@ class ConnectionHasPid(object):
         bus, connection_name = dbus_tuple
 
         try:
-            bus_pid = _get_bus_connections_pid(bus, connection_name)
+            bus_pid = _connection_pids.get_pid(bus, connection_name)
         except dbus.DBusException as e:
             logger.info(
                 "dbus.DBusException while attempting to get PID for %s: %r" %
                 (connection_name, e))
             return False
 
-        eligible_pids = [pid] + _get_child_pids(pid)
-        return bus_pid in eligible_pids
+        return bus_pid == pid or bus_pid in _get_child_pids(pid)
 
 
 class ConnectionHasPathWithAPInterface(object):
@@ -47,6 +47,8 @@ from autopilot.introspection.constants import (
     QT_AUTOPILOT_IFACE,
 )
 from autopilot.utilities import Timer
+from autopilot._timing import DBUS_PHASE, phase_timer
+from autopilot._tracing import HAVE_TRACEPOINT, emit_proxy_event
 from autopilot.introspection.utilities import (
     _pid_is_running,
     _get_bus_connections_pid,
@@ -120,19 +122,26 @@ class DBusAddress(object):
                 "finished!"
             )
 
+        iface = self.unchecked_introspection_iface
+        if self._addr_tuple not in DBusAddress._checked_backends:
+            self._check_version(iface)
+        return iface
+
+    @property
+    def unchecked_introspection_iface(self):
+        """The autopilot introspection interface, without checking that the
+        application is still running or that its wire protocol version is
+        supported.
+
+        Callers must check the version themselves, by passing the reply of a
+        GetVersion call to :meth:`check_wire_protocol_version`.
+
+        """
         proxy_obj = self._addr_tuple.bus.get_object(
             self._addr_tuple.connection,
             self._addr_tuple.object_path
         )
-        iface = dbus.Interface(proxy_obj, AP_INTROSPECTION_IFACE)
-        if self._addr_tuple not in DBusAddress._checked_backends:
-            try:
-                self._check_version(iface)
-            except WireProtocolVersionMismatch:
-                raise
-            else:
-                DBusAddress._checked_backends.append(self._addr_tuple)
-        return iface
+        return dbus.Interface(proxy_obj, AP_INTROSPECTION_IFACE)
 
     def _check_version(self, iface):
         """Check the wire protocol version on 'iface', and raise an error if
@@ -143,6 +152,17 @@ class DBusAddress(object):
             version = iface.GetVersion()
         except dbus.DBusException:
             version = "1.2"
+        self.check_wire_protocol_version(version)
+
+    def check_wire_protocol_version(self, version):
+        """Check a wire protocol version reported by this backend.
+
+        Once a backend reports a supported version, it is not checked again.
+
+        :raises WireProtocolVersionMismatch: if *version* is not the version
+            we were expecting.
+
+        """
         if version != CURRENT_WIRE_PROTOCOL_VERSION:
             raise WireProtocolVersionMismatch(
                 "Wire protocol mismatch at %r: is %s, expecting %s" % (
@@ -150,6 +170,8 @@ class DBusAddress(object):
                     version,
                     CURRENT_WIRE_PROTOCOL_VERSION)
             )
+        if self._addr_tuple not in DBusAddress._checked_backends:
+            DBusAddress._checked_backends.append(self._addr_tuple)
 
     def _check_pid_running(self):
         try:
@@ -209,6 +231,29 @@ class DBusAddress(object):
             name, self._addr_tuple.connection, self._addr_tuple.object_path)
 
 
+def _get_payload_size(data):
+    """Return roughly how many bytes the DBus reply *data* took to send.
+
+    Strings count their encoded length, numbers and booleans their size on
+    the wire, and containers the sizes of their contents.
+
+    """
+    if isinstance(data, bytes):
+        return len(data)
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    if isinstance(data, dict):
+        return sum(
+            _get_payload_size(k) + _get_payload_size(v)
+            for k, v in data.items()
+        )
+    if isinstance(data, (list, tuple)):
+        return sum(_get_payload_size(item) for item in data)
+    if isinstance(data, bool):
+        return 4
+    return 8
+
+
 class Backend(object):
 
     """A Backend object that works with an ipc address interface.
@@ -220,7 +265,8 @@ class Backend(object):
 
     def execute_query_get_data(self, query):
         """Execute 'query', return the raw dbus reply."""
-        with Timer("GetState %r" % query):
+        with Timer("GetState %r" % query), \
+                phase_timer.time_phase(DBUS_PHASE, repr(query)) as operation:
             try:
                 data = self.ipc_address.introspection_iface.GetState(
                     query.server_query_bytes()
@@ -235,6 +281,8 @@ class Backend(object):
                         "application under test exited before the test "
                         "finished!"
                     )
+            if phase_timer.recording_operations or HAVE_TRACEPOINT:
+                operation.size = _get_payload_size(data)
             if len(data) > 15:
                 _logger.warning(
                     "Your query '%r' returned a lot of data (%d items). This "
@@ -304,6 +352,8 @@ def make_introspection_object(dbus_tuple, backend, object_id):
     path, state = dbus_tuple
     path = path.encode('utf-8')
     class_object = _get_proxy_object_class(object_id, path, state)
+    if HAVE_TRACEPOINT:
+        emit_proxy_event(class_object.__name__, path.decode('utf-8'))
     return class_object(state, path, backend)
 
 
@@ -365,7 +365,7 @@ class DBusIntrospectionObject(DBusIntrospectionObjectBase):
             try:
                 return self._select_single(type_name, **kwargs)
             except StateNotFoundError:
-                sleep(1)
+                sleep(1, 'query retry')
         raise StateNotFoundError(type_name, **kwargs)
 
     def _select_many(self, type_name, **kwargs):
@@ -501,7 +501,7 @@ class DBusIntrospectionObject(DBusIntrospectionObjectBase):
             instances = self._select_many(type_name, **kwargs)
             if len(instances) >= ap_result_count:
                 return sort_by_keys(instances, ap_result_sort_keys)
-            sleep(1)
+            sleep(1, 'query retry')
         raise ValueError(exception_message)
 
     def refresh_state(self):
@@ -594,7 +594,7 @@ class DBusIntrospectionObject(DBusIntrospectionObjectBase):
         for i in range(timeout):
             try:
                 self._get_new_state()
-                sleep(1)
+                sleep(1, 'wait_until_destroyed poll')
             except StateNotFoundError:
                 return
         else:
@@ -895,7 +895,7 @@ class _MockableDbusObject:
         :return: True, if the element is moving, otherwise False.
         """
         x1, y1, h1, w1 = self._get_default_dbus_object().globalRect
-        sleep(gap_interval)
+        sleep(gap_interval, 'is_moving gap')
         x2, y2, h2, w2 = self._get_secondary_dbus_object().globalRect
 
         return x1 != x2 or y1 != y2
@@ -169,10 +169,10 @@ class TypeBase(object):
                 return
 
             if time_left >= 1:
-                sleep(1)
+                sleep(1, 'wait_for poll')
                 time_left -= 1
             else:
-                sleep(time_left)
+                sleep(time_left, 'wait_for poll')
                 break
 
         raise AssertionError(
@@ -19,9 +19,13 @@
 
 import os
 from contextlib import contextmanager
+from functools import partial
 
-from dbus import Interface
+from dbus import DBusException, Interface
+from gi.repository import GLib
 
+from autopilot.globals import get_default_timeout_period
+from autopilot.process._tree import get_process_tree
 from autopilot.utilities import process_iter
 
 
@@ -39,9 +43,87 @@ def _get_bus_connections_pid(bus, connection_name):
     :raises: **DBusException** if connection_name is invalid etc.
 
     """
+    return _get_bus_iface(bus).GetConnectionUnixProcessID(connection_name)
+
+
+def _get_bus_connections_pids(bus, connection_names):
+    """Returns the pids for all of **connection_names** on **bus**.
+
+    A GetConnectionCredentials call is made for each name, and all the calls
+    are issued at once, so looking up many connections costs roughly one round
+    trip to the bus daemon.
+
+    :returns: A dictionary mapping each connection name to either its pid, or
+        the **DBusException** raised while looking it up.
+
+    """
+    connection_names = set(connection_names)
+    results = {}
+    if not connection_names:
+        return results
+
+    loop = GLib.MainLoop()
+    bus_iface = _get_bus_iface(bus)
+
+    def on_result(connection_name, result):
+        results[connection_name] = result
+        if len(results) == len(connection_names):
+            loop.quit()
+
+    def on_reply(connection_name, credentials):
+        try:
+            on_result(connection_name, int(credentials['ProcessID']))
+        except KeyError:
+            on_result(
+                connection_name,
+                DBusException("No ProcessID for %s" % connection_name)
+            )
+
+    def on_timeout():
+        loop.quit()
+        return False
+
+    for connection_name in connection_names:
+        bus_iface.GetConnectionCredentials(
+            connection_name,
+            reply_handler=partial(on_reply, connection_name),
+            error_handler=partial(on_result, connection_name),
+        )
+    if len(results) < len(connection_names):
+        timeout_id = GLib.timeout_add_seconds(
+            int(get_default_timeout_period()),
+            on_timeout
+        )
+        loop.run()
+        if len(results) == len(connection_names):
+            GLib.source_remove(timeout_id)
+
+    for connection_name in connection_names:
+        result = results.get(
+            connection_name,
+            DBusException("Timed out getting pid for %s" % connection_name)
+        )
+        if _is_unknown_method_error(result):
+            # Bus daemons older than 1.7 lack GetConnectionCredentials:
+            try:
+                result = _get_bus_connections_pid(bus, connection_name)
+            except DBusException as e:
+                result = e
+        results[connection_name] = result
+    return results
+
+
+def _is_unknown_method_error(result):
+    unknown_method = 'org.freedesktop.DBus.Error.UnknownMethod'
+    return (
+        isinstance(result, DBusException)
+        and result.get_dbus_name() == unknown_method
+    )
+
+
+def _get_bus_iface(bus):
     bus_obj = bus.get_object('org.freedesktop.DBus', '/org/freedesktop/DBus')
-    bus_iface = Interface(bus_obj, 'org.freedesktop.DBus')
-    return bus_iface.GetConnectionUnixProcessID(connection_name)
+    return Interface(bus_obj, 'org.freedesktop.DBus')
 
 
 def translate_state_keys(state_dict):
@@ -103,8 +185,16 @@ class ProcessUtil:
         if not isinstance(process_name, str):
             raise ValueError('Process name must be a string.')
 
-        pids = [process.pid for process in process_iter()
-                if process.name() == process_name]
+        if process_iter.is_mocked:
+            pids = [process.pid for process in process_iter()
+                    if process.name() == process_name]
+        else:
+            # A process started since the shared snapshot was taken won't be
+            # in it, so look again in a fresh one before giving up.
+            pids = (
+                get_process_tree().get_pids_by_name(process_name)
+                or get_process_tree(max_age=0).get_pids_by_name(process_name)
+            )
 
         if not pids:
             raise ValueError('Process \'{}\' not running'.format(process_name))
@@ -132,10 +132,10 @@ def _callable_wait_for(refresh_fn, matcher, timeout):
             return
 
         if time_left >= 1:
-            sleep(1)
+            sleep(1, 'Eventually poll')
             time_left -= 1
         else:
-            sleep(time_left)
+            sleep(time_left, 'Eventually poll')
             break
 
     # can't give a very descriptive message here, especially as refresh_fn
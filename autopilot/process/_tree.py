@@ -0,0 +1,226 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Private module for an index of the system process tree.
+
+Walking the process tree with psutil costs a full scan of /proc for every
+process we ask about. On a busy machine that adds up quickly, so instead we
+read every ``/proc/<pid>/stat`` file once, build a parent to children map
+from it, and share that snapshot for a short time between everyone that needs
+to ask questions about the process tree.
+
+"""
+
+from collections import defaultdict
+import logging
+import os
+import time
+
+
+_logger = logging.getLogger(__name__)
+
+# The kernel truncates the process name in /proc/<pid>/stat to this many
+# characters.
+_TASK_COMM_LEN = 15
+
+DEFAULT_MAX_AGE = 0.5
+
+
+class ProcessTree(object):
+
+    """A snapshot of the parent/child relationships of running processes."""
+
+    def __init__(self, processes, proc_path='/proc'):
+        """Construct a new ProcessTree.
+
+        :param processes: A dictionary mapping each pid to a tuple of
+            (parent pid, process name).
+        :param proc_path: The path to the proc filesystem the snapshot was
+            read from. Used to work out the full name of processes whose name
+            was truncated by the kernel.
+
+        """
+        self._processes = dict(processes)
+        self._proc_path = proc_path
+        self._children = defaultdict(list)
+        for pid, (ppid, _) in self._processes.items():
+            self._children[ppid].append(pid)
+
+    @classmethod
+    def from_proc(cls, proc_path='/proc'):
+        """Read the process tree from every stat file under *proc_path*.
+
+        Processes that exit while the scan is in progress are ignored.
+
+        """
+        processes = {}
+        try:
+            entries = os.listdir(proc_path)
+        except OSError as e:
+            _logger.warning("Unable to read %s: %s", proc_path, e)
+            entries = []
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            stat_path = os.path.join(proc_path, entry, 'stat')
+            try:
+                with open(stat_path, 'rb') as stat_file:
+                    stat = stat_file.read()
+            except OSError:
+                continue
+            parsed = _parse_stat(stat)
+            if parsed is not None:
+                processes[int(entry)] = parsed
+        return cls(processes, proc_path)
+
+    @property
+    def pids(self):
+        """A frozenset of every pid in the snapshot."""
+        return frozenset(self._processes)
+
+    def has_pid(self, pid):
+        """Return True if *pid* was running when the snapshot was taken."""
+        return pid in self._processes
+
+    def get_parent_pid(self, pid):
+        """Return the parent pid of *pid*, or None if it is not known."""
+        try:
+            return self._processes[pid][0]
+        except KeyError:
+            return None
+
+    def get_child_pids(self, pid):
+        """Return a list of the direct children of *pid*."""
+        return list(self._children.get(pid, ()))
+
+    def get_descendant_pids(self, pid):
+        """Return a set of the children of *pid*, their children, and so on.
+
+        *pid* itself is not included.
+
+        """
+        descendants = set()
+        pending = list(self._children.get(pid, ()))
+        while pending:
+            child = pending.pop()
+            if child in descendants:
+                continue
+            descendants.add(child)
+            pending.extend(self._children.get(child, ()))
+        return descendants
+
+    def get_name(self, pid):
+        """Return the name of *pid*, or None if it is not known.
+
+        Names are reported the same way psutil reports them, so names the
+        kernel truncated are completed from the process command line.
+
+        """
+        try:
+            name = self._processes[pid][1]
+        except KeyError:
+            return None
+        if len(name) >= _TASK_COMM_LEN:
+            name = self._get_untruncated_name(pid, name)
+        return name
+
+    def get_pids_by_name(self, name):
+        """Return a list of the pids of all processes called *name*."""
+        short_name = name[:_TASK_COMM_LEN]
+        return sorted(
+            pid for pid, (_, comm) in self._processes.items()
+            if comm == short_name and self.get_name(pid) == name
+        )
+
+    def _get_untruncated_name(self, pid, name):
+        cmdline_path = os.path.join(self._proc_path, str(pid), 'cmdline')
+        try:
+            with open(cmdline_path, 'rb') as cmdline_file:
+                cmdline = cmdline_file.read()
+        except OSError:
+            return name
+        argv0 = cmdline.split(b'\0', 1)[0].decode('utf-8', errors='replace')
+        extended_name = os.path.basename(argv0)
+        if extended_name.startswith(name):
+            return extended_name
+        return name
+
+    def __len__(self):
+        return len(self._processes)
+
+
+def _parse_stat(stat):
+    """Parse the contents of a /proc/<pid>/stat file.
+
+    :returns: A tuple of (parent pid, process name), or None if *stat* is not
+        in the expected format.
+
+    """
+    # The process name is wrapped in parentheses, and may itself contain
+    # spaces and parentheses, so the fields after it are found from the last
+    # closing parenthesis.
+    name_start = stat.find(b'(')
+    name_end = stat.rfind(b')')
+    if name_start == -1 or name_end < name_start:
+        return None
+    fields = stat[name_end + 2:].split()
+    try:
+        ppid = int(fields[1])
+    except (IndexError, ValueError):
+        return None
+    name = stat[name_start + 1:name_end].decode('utf-8', errors='replace')
+    return ppid, name
+
+
+class _CachedProcessTree(object):
+
+    """Share one ProcessTree snapshot until it is older than a maximum age.
+
+    Calling reset_cache() will ensure that the next caller gets a fresh
+    snapshot.
+    """
+
+    def __init__(self, proc_path='/proc', max_age=DEFAULT_MAX_AGE):
+        self._proc_path = proc_path
+        self._max_age = max_age
+        self._cached_tree = None
+        self._cached_time = None
+
+    def __call__(self, max_age=None):
+        """Return a ProcessTree no older than *max_age* seconds.
+
+        If *max_age* is None the default maximum age is used. Pass 0 to force
+        a fresh scan.
+
+        """
+        if max_age is None:
+            max_age = self._max_age
+        now = time.monotonic()
+        if (self._cached_tree is None
+                or now - self._cached_time >= max_age):
+            self._cached_tree = ProcessTree.from_proc(self._proc_path)
+            self._cached_time = now
+        return self._cached_tree
+
+    def reset_cache(self):
+        self._cached_tree = None
+        self._cached_time = None
+
+
+get_process_tree = _CachedProcessTree()
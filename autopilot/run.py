@@ -18,17 +18,25 @@
 #
 
 
-from argparse import ArgumentParser, Action, REMAINDER
+from argparse import (
+    Action,
+    ArgumentParser,
+    ArgumentTypeError,
+    REMAINDER,
+    SUPPRESS,
+)
 from codecs import open
 from collections import OrderedDict
 import cProfile
 from datetime import datetime
+from functools import partial
 from imp import find_module
 import logging
 import os
 import os.path
 from platform import node
 from random import shuffle
+import sqlite3
 import subprocess
 import sys
 from unittest import TestLoader, TestSuite
@@ -42,8 +50,31 @@ from autopilot._debug import (
     get_all_debug_profiles,
     get_default_debug_profile,
 )
+from autopilot import _discovery
+from autopilot._merge import get_results_format, merge_results
+from autopilot._ordering import get_test_orderings, order_tests
+from autopilot import _parallel
+from autopilot._profiling import (
+    ProfileSummary,
+    enable_profiling,
+    summarize_results,
+)
+from autopilot._sharding import parse_shard, select_shard
+from autopilot._tail import follow_results
+from autopilot._timing import (
+    TimingDatabase,
+    get_default_database_path,
+    get_recorded_durations,
+)
 from autopilot import _video
-from autopilot.testresult import get_default_format, get_output_formats
+from autopilot.dbus_handler import close_custom_buses
+from autopilot.testresult import (
+    ProfileSummaryResultDecorator,
+    RerunFailuresResultDecorator,
+    TimingResultDecorator,
+    get_default_format,
+    get_output_formats,
+)
 from autopilot.utilities import DebugLogFilter, LogFormatter
 from autopilot.application._launcher import (
     _get_app_env_from_string_hint,
@@ -103,9 +134,17 @@ def _get_parser():
     parser_run.add_argument("--record-options", required=False,
                             type=str, help="Comma separated list of options \
                             to pass to recordmydesktop")
-    parser_run.add_argument("-ro", "--random-order", action='store_true',
-                            required=False, default=False,
-                            help="Run the tests in random order")
+    order_arguments = parser_run.add_mutually_exclusive_group()
+    order_arguments.add_argument("-ro", "--random-order", action='store_true',
+                                 required=False, default=False,
+                                 help="Run the tests in random order")
+    order_arguments.add_argument(
+        "--order", choices=sorted(get_test_orderings()), default=None,
+        help="Run the tests in an order based on previous test runs: tests "
+        "that failed last time first, the slowest or fastest tests first, or "
+        "tests whose modules changed since they last ran first. Test "
+        "outcomes and durations are read from the timing database."
+    )
     parser_run.add_argument(
         '-v', '--verbose', default=False, required=False, action='count',
         help="If set, autopilot will output test log data to stderr during a "
@@ -139,6 +178,40 @@ def _get_parser():
         "which make it impossible to abort a test case. Tests aborted will "
         "raise a 'TimeoutException' error."
     )
+    parser_run.add_argument(
+        "-j", "--jobs", default=1, type=_positive_integer, help="Run tests "
+        "in <jobs> parallel worker processes. Each worker gets its own Xvfb "
+        "display and private DBus session bus, and tests are handed out to "
+        "workers as they become free. Requires Xvfb and dbus-daemon."
+    )
+    parser_run.add_argument(
+        "--rerun-failures", default=0, type=_positive_integer, metavar="N",
+        help="Run tests that fail again, up to <N> more times. Only the last "
+        "result of each test is reported, and tests that pass after failing "
+        "are reported as flaky. Every attempt is recorded in the timing "
+        "database."
+    )
+    parser_run.add_argument(
+        "--rerun-in-sandbox", action='store_true', default=False,
+        help="Run failed tests again in a new worker process, with its own "
+        "Xvfb display and private DBus session bus, rather than in this "
+        "process. Requires Xvfb and dbus-daemon."
+    )
+    parser_run.add_argument(
+        "--profile-tests", action='store_true', default=False,
+        help="Profile each test. The time the test spent in each phase, and "
+        "every query, proxy search, application launch, input event and "
+        "sleep it made, is attached to the test as the 'autopilot-profile' "
+        "detail. The costliest queries and waits of the run are printed at "
+        "the end."
+    )
+    parser_run.add_argument(
+        "--worker", action='store_true', default=False, help=SUPPRESS
+    )
+    parser_run.add_argument(
+        "--attempt", default=1, type=_positive_integer, help=SUPPRESS
+    )
+    _add_shard_arguments(parser_run)
     parser_run.add_argument("suite", nargs="+",
                             help="Specify test suite(s) to run.")
 
@@ -154,9 +227,55 @@ def _get_parser():
         "--suites", required=False, action='store_true',
         help="Lists only available suites, not tests contained within the "
         "suite.")
+    _add_shard_arguments(parser_list)
     parser_list.add_argument("suite", nargs="+",
                              help="Specify test suite(s) to run.")
 
+    parser_merge = subparsers.add_parser(
+        'merge-results', help="Merge the results of several test runs",
+        parents=[common_arguments]
+    )
+    parser_merge.add_argument(
+        '-o', "--output", required=False,
+        help="Write the merged test result report to file. Defaults to "
+        "stdout. If given a directory instead of a file will write to a file "
+        "in that directory named: <hostname>_<dd.mm.yyy_HHMMSS>.log")
+    parser_merge.add_argument(
+        '-f', "--format", choices=available_formats,
+        default=get_default_format(), required=False,
+        help='Specify desired output format. Default is "text".')
+    parser_merge.add_argument(
+        "results_files", nargs="+", metavar="results_file",
+        help="A subunit or JUnit XML results file written by 'autopilot "
+        "run'. A test in more than one results file, or run more than once, "
+        "is reported with the outcome of its last run, with later files "
+        "holding later runs.")
+
+    parser_tail = subparsers.add_parser(
+        'tail', help="Follow the results of a running test run",
+        parents=[common_arguments]
+    )
+    parser_tail.add_argument(
+        "--no-follow", dest="follow", action='store_false', default=True,
+        help="Stop at the end of the results file, rather than waiting for "
+        "more results to be written to it.")
+    parser_tail.add_argument(
+        "results_file",
+        help="A results file written by 'autopilot run -f subunit -o "
+        "<results_file>'. Tests are printed as they start and finish, and "
+        "test details as they are attached.")
+
+    parser_profile_report = subparsers.add_parser(
+        'profile-report', help="Summarize the test profiles of a test run",
+        parents=[common_arguments]
+    )
+    parser_profile_report.add_argument(
+        "results_files", nargs="+", metavar="results_file",
+        help="A results file written by 'autopilot run --profile-tests -f "
+        "subunit -o <results_file>'. The costliest queries, waits and sleeps "
+        "of the tests in all the results files are printed, along with how "
+        "much of the test time was spent sleeping.")
+
     if have_vis():
         parser_vis = subparsers.add_parser(
             'vis', help="Open the Autopilot visualiser tool",
@@ -193,6 +312,21 @@ def _get_parser():
     return parser
 
 
+def _add_shard_arguments(parser):
+    parser.add_argument(
+        "--shard", default=None, type=parse_shard, metavar="K/N",
+        help="Only use the K'th of N shards of the requested tests. Tests are "
+        "split between shards using the durations recorded in the timing "
+        "database, and by a hash of the test id for tests with no recorded "
+        "duration. Every shard must use the same timing database."
+    )
+    parser.add_argument(
+        "--timing-database", default=None, metavar="PATH",
+        help="The timing database test durations are recorded in and read "
+        "from. Defaults to '%s'." % get_default_database_path()
+    )
+
+
 def _parse_arguments(argv=None):
     """Parse command-line arguments, and return an argparse arguments
     object.
@@ -212,6 +346,18 @@ def _parse_arguments(argv=None):
     return args
 
 
+def _positive_integer(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ArgumentTypeError(
+            "%r is not a positive integer." % value
+        )
+    return number
+
+
 class _OneOrMoreArgumentStoreAction(Action):
 
     def __call__(self, parser, namespace, values, option_string=None):
@@ -267,6 +413,27 @@ def construct_test_result(args):
     )
 
 
+def _record_test_durations(result, timing_database_path, first_attempt=1):
+    """Decorate *result* so that it writes test durations to the timing
+    database at *timing_database_path*.
+
+    If the timing database cannot be opened *result* is returned as it is.
+
+    :param first_attempt: The attempt to record the first run of each test
+        as.
+
+    """
+    try:
+        timing_database = TimingDatabase(timing_database_path)
+    except (OSError, sqlite3.Error) as e:
+        get_root_logger().warning(
+            "Unable to open timing database, test durations will not be "
+            "recorded: %s", e
+        )
+        return result
+    return TimingResultDecorator(result, timing_database, first_attempt)
+
+
 def get_output_stream(format, path):
     """Get an output stream pointing to 'path' that's appropriate for format
     'format'.
@@ -333,6 +500,80 @@ def _get_default_log_filename(target_directory):
     return log_file
 
 
+def _get_worker_command(args, attempt=1):
+    """Return the command line that starts a parallel test run worker.
+
+    The worker runs the same suites as this process, with the same
+    configuration, but reports its results back to this process rather than
+    to the output stream.
+
+    :param attempt: The attempt at running tests the worker's test runs are
+        recorded as.
+
+    """
+    command = [
+        sys.executable, '-m', 'autopilot.run', 'run', '--worker',
+        '--debug-profile', args.debug_profile,
+        '--timeout-profile', args.timeout_profile,
+        '--test-timeout', str(args.test_timeout),
+    ]
+    if args.test_config:
+        command += ['--config', args.test_config]
+    if args.timing_database:
+        command += ['--timing-database', args.timing_database]
+    if attempt > 1:
+        command += ['--attempt', str(attempt)]
+    if args.profile_tests:
+        command.append('--profile-tests')
+    if args.verbose:
+        command.append('-' + 'v' * args.verbose)
+    if args.record:
+        command.append('--record')
+        if args.record_directory:
+            command += ['--record-directory', args.record_directory]
+        if args.record_options:
+            command += ['--record-options', args.record_options]
+    return command + args.suite
+
+
+def _rerun_failed_tests(result, rerun_result, args):
+    """Run the tests that failed in *rerun_result* again, until they pass or
+    have been run again as many times as *args* allows.
+
+    :param result: The test result to report to.
+    :param rerun_result: The RerunFailuresResultDecorator in *result* that
+        holds back failed tests. It is reported to directly when tests are run
+        again in sandboxes, since the workers record their own durations.
+
+    """
+    for attempt in range(2, args.rerun_failures + 2):
+        tests = rerun_result.take_tests_to_rerun()
+        if not tests or result.shouldStop:
+            break
+        print("Running %d failed tests again" % len(tests))
+        if args.jobs > 1 or args.rerun_in_sandbox:
+            _parallel.run_tests_in_sandboxes(
+                TestSuite(tests),
+                rerun_result,
+                min(args.jobs, len(tests)),
+                _get_worker_command(args, attempt),
+            )
+        else:
+            TestSuite(tests).run(result)
+
+
+def _print_flaky_tests(test_ids):
+    if test_ids:
+        print("Flaky tests, which passed after failing:")
+        for test_id in test_ids:
+            print("    " + test_id)
+
+
+def _print_profile_summary(summary):
+    print("Test profile summary:")
+    print(summary.format())
+
+
 def _print_default_log_path(default_log_filename):
     print("Using default log filename: %s" % default_log_filename)
 
@@ -369,14 +610,24 @@ def _reexecute_autopilot_using_module():
     return 0
 
 
-def _discover_test(test_name):
+def _discover_test(test_name, discovery_index=None):
     """Return tuple of (TestSuite of found test, top_level_dir of test).
 
+    :param discovery_index: If set, a DiscoveryIndex used to find tests
+        without importing their modules where possible.
     :raises ImportError: if test_name isn't a valid module or test name
 
     """
     loader = TestLoader()
     top_level_dir = get_package_location(test_name)
+    if discovery_index is not None:
+        test = _discovery.discover_tests(
+            test_name,
+            top_level_dir,
+            discovery_index
+        )
+        if test is not None:
+            return (test, top_level_dir)
     # no easy way to figure out if test_name is a module or a test, so we
     # try to do the discovery first=...
     try:
@@ -402,14 +653,16 @@ def _discover_requested_tests(test_names):
     all_tests = []
     test_package_locations = []
     error_occured = False
+    discovery_index = _discovery.DiscoveryIndex()
     for name in test_names:
         try:
-            test, top_level_dir = _discover_test(name)
+            test, top_level_dir = _discover_test(name, discovery_index)
             all_tests.append(test)
             test_package_locations.append(top_level_dir)
         except ImportError as e:
             _handle_discovery_error(name, e)
             error_occured = True
+    discovery_index.save()
 
     _show_test_locations(test_package_locations)
 
@@ -446,12 +699,50 @@ def _filter_tests(all_tests, test_names):
     return requested_tests
 
 
+def _select_shard(test_suite, args):
+    """Return a TestSuite of the tests in *test_suite* that belong to the
+    shard requested in *args*, or *test_suite* if no shard was requested.
+
+    """
+    if args.shard is None:
+        return test_suite
+    shard_index, shard_count = args.shard
+    durations = get_recorded_durations(args.timing_database)
+    return TestSuite(
+        select_shard(
+            iterate_tests(test_suite),
+            shard_index,
+            shard_count,
+            durations
+        )
+    )
+
+
+def _order_tests(test_suite, args):
+    """Return a TestSuite of the tests in *test_suite* in the order requested
+    in *args*, or *test_suite* if no order was requested.
+
+    """
+    if args.order is None:
+        return test_suite
+    return TestSuite(
+        order_tests(
+            iterate_tests(test_suite),
+            args.order,
+            args.timing_database
+        )
+    )
+
+
 def load_test_suite_from_name(test_names):
     """Return a test suite object given a dotted test names.
 
     Returns a tuple containing the TestSuite and a boolean indicating wherever
     any issues where encountered during the loading process.
 
+    Tests may not have had their modules imported yet. Pass the suite to
+    _discovery.load_indexed_tests before running it.
+
     """
     # The 'autopilot' program cannot be used to run the autopilot test suite,
     # since setuptools needs to import 'autopilot.run', and that grabs the
@@ -627,6 +918,12 @@ class TestProgram(object):
             action = self.run_vis
         elif self.args.mode == 'launch':
             action = self.launch_app
+        elif self.args.mode == 'tail':
+            action = self.tail_results
+        elif self.args.mode == 'merge-results':
+            action = self.merge_results
+        elif self.args.mode == 'profile-report':
+            action = self.profile_report
 
         if action is not None:
             if getattr(self.args, 'enable_profile', False):
@@ -667,6 +964,47 @@ class TestProgram(object):
         except RuntimeError as e:
             _print_message_and_exit_error("Error: " + str(e))
 
+    def merge_results(self):
+        """Merge the results of several test runs into a single report."""
+        formats = get_output_formats()
+        result = formats[self.args.format](
+            stream=get_output_stream(self.args.format, self.args.output),
+            failfast=False,
+        )
+        try:
+            merge_results(self.args.results_files, result)
+        except (OSError, ValueError) as e:
+            _print_message_and_exit_error("Error: " + str(e))
+
+        if not result.wasSuccessful():
+            exit(1)
+
+    def profile_report(self):
+        """Print a summary of the test profiles in subunit results files."""
+        summary = ProfileSummary()
+        try:
+            for path in self.args.results_files:
+                if get_results_format(path) != 'subunit':
+                    raise ValueError(
+                        "%s is not a subunit results file." % path)
+                summarize_results(path, summary)
+        except (OSError, ValueError) as e:
+            _print_message_and_exit_error("Error: " + str(e))
+        print(summary.format())
+
+    def tail_results(self):
+        """Print the progress of a test run from its subunit results file."""
+        try:
+            follow_results(
+                self.args.results_file,
+                sys.stdout,
+                follow=self.args.follow
+            )
+        except OSError as e:
+            _print_message_and_exit_error("Error: " + str(e))
+        except KeyboardInterrupt:
+            pass
+
     def run_tests(self):
         """Run tests, using input from `args`."""
 
@@ -689,17 +1027,79 @@ class TestProgram(object):
         if not test_suite.countTestCases():
             raise RuntimeError('Did not find any tests')
 
+        if self.args.profile_tests:
+            enable_profiling()
+
+        if self.args.worker:
+            try:
+                _parallel.run_worker(
+                    _discovery.load_indexed_tests(test_suite),
+                    decorate_result=partial(
+                        _record_test_durations,
+                        timing_database_path=self.args.timing_database,
+                        first_attempt=self.args.attempt
+                    )
+                )
+            finally:
+                close_custom_buses()
+            return
+
+        test_suite = _select_shard(test_suite, self.args)
+
         if self.args.random_order:
             shuffle(test_suite._tests)
             print("Running tests in random order")
+        elif self.args.order is not None:
+            test_suite = _order_tests(test_suite, self.args)
+            print("Running tests in %s order" % self.args.order)
+
+        if self.args.jobs > 1 or self.args.rerun_in_sandbox:
+            try:
+                _parallel.check_sandbox_requirements()
+            except RuntimeError as e:
+                print("Error: %s" % str(e))
+                exit(1)
+
+        if self.args.jobs == 1:
+            # Only the modules of the tests that are about to run are
+            # imported. Parallel workers import them for themselves.
+            test_suite = _discovery.load_indexed_tests(test_suite)
 
         result = construct_test_result(self.args)
+        profile_summary = None
+        if self.args.profile_tests:
+            profile_summary = ProfileSummary()
+            result = ProfileSummaryResultDecorator(result, profile_summary)
+        rerun_result = None
+        if self.args.rerun_failures:
+            result = rerun_result = RerunFailuresResultDecorator(
+                result,
+                self.args.rerun_failures
+            )
+        if self.args.jobs == 1:
+            # Parallel workers record their own test durations.
+            result = _record_test_durations(result, self.args.timing_database)
         result.startTestRun()
         try:
-            test_result = test_suite.run(result)
+            if self.args.jobs > 1:
+                test_result = _parallel.run_tests_in_sandboxes(
+                    test_suite,
+                    result,
+                    self.args.jobs,
+                    _get_worker_command(self.args),
+                )
+            else:
+                test_result = test_suite.run(result)
+            if rerun_result is not None:
+                _rerun_failed_tests(result, rerun_result, self.args)
         finally:
             result.stopTestRun()
+            close_custom_buses()
 
+        if rerun_result is not None:
+            _print_flaky_tests(rerun_result.flaky_test_ids)
+        if profile_summary is not None:
+            _print_profile_summary(profile_summary)
         if not test_result.wasSuccessful() or error_encountered:
             exit(1)
 
@@ -710,6 +1110,7 @@ class TestProgram(object):
         test_suite, error_encountered = load_test_suite_from_name(
             self.args.suite
         )
+        test_suite = _select_shard(test_suite, self.args)
 
         if self.args.run_order:
             test_list_fn = lambda: iterate_tests(test_suite)
@@ -719,8 +1120,9 @@ class TestProgram(object):
         # only show test suites, not test cases. TODO: Check if this is still
         # a requirement.
         if self.args.suites:
-            suite_names = ["%s.%s" % (t.__module__, t.__class__.__name__)
-                           for t in test_list_fn()]
+            # Tests may not have been imported, so work out their suite names
+            # from their ids.
+            suite_names = [t.id().rpartition('.')[0] for t in test_list_fn()]
             unique_suite_names = list(OrderedDict.fromkeys(suite_names).keys())
             num_tests = len(unique_suite_names)
             total_title = "suites"
@@ -46,7 +46,9 @@ root of the application introspection tree.
 
 """
 
+from contextlib import contextmanager
 import logging
+import os
 
 import fixtures
 from testscenarios import TestWithScenarios
@@ -61,6 +63,7 @@ from autopilot.application import (
     NormalApplicationLauncher,
     UpstartApplicationLauncher,
 )
+from autopilot.application._pool import get_application_pool
 from autopilot.display import Display, get_screenshot_data
 from autopilot.globals import get_debug_profile_fixture, get_test_timeout
 from autopilot.input import Keyboard, Mouse
@@ -70,14 +73,19 @@ from autopilot.platform import get_display_server
 from autopilot.process import ProcessManager
 from autopilot.utilities import deprecated, on_test_started
 from autopilot._fixtures import OSKAlwaysEnabled
+from autopilot._profiling import PROFILE_DETAIL_NAME, get_profile_content
 from autopilot._timeout import Timeout
+from autopilot._timing import (
+    CLEANUP_PHASE,
+    LAUNCH_PHASE,
+    SETUP_PHASE,
+    TEARDOWN_PHASE,
+    TEST_PHASE,
+    phase_timer,
+)
 from autopilot._logging import TestCaseLoggingFixture
 from autopilot._video import get_video_recording_fixture
-try:
-    from autopilot import tracepoint as tp
-    HAVE_TRACEPOINT = True
-except ImportError:
-    HAVE_TRACEPOINT = False
+from autopilot import _tracing
 
 _logger = logging.getLogger(__name__)
 
@@ -109,8 +117,8 @@ except ImportError:
 
 
 def _lttng_trace_test_started(test_id):
-    if HAVE_TRACEPOINT:
-        tp.emit_test_started(test_id)
+    if _tracing.HAVE_TRACEPOINT:
+        _tracing.emit_test_started(test_id)
     else:
         _logger.warning(
             "No tracing available - install the python-autopilot-trace "
@@ -118,8 +126,7 @@ def _lttng_trace_test_started(test_id):
 
 
 def _lttng_trace_test_ended(test_id):
-    if HAVE_TRACEPOINT:
-        tp.emit_test_ended(test_id)
+    _tracing.emit_test_ended(test_id)
 
 
 class _TimedRunTest(RunTest):
@@ -132,6 +139,42 @@ class _TimedRunTest(RunTest):
         else:
             return super().run(*args, **kwargs)
 
+    def _run_core(self):
+        phase_timer.reset()
+        return super()._run_core()
+
+    def _run_cleanups(self, result):
+        # Cleanups are the last user code a test runs, whether or not setUp
+        # succeeded, so the profile is complete once they have finished.
+        try:
+            with phase_timer.time_phase(CLEANUP_PHASE):
+                return super()._run_cleanups(result)
+        finally:
+            if phase_timer.recording_operations:
+                self.case.addDetail(
+                    PROFILE_DETAIL_NAME,
+                    get_profile_content()
+                )
+
+    def _run_user(self, fn, *args, **kwargs):
+        phase = self._get_phase_name(fn)
+        if phase is None:
+            return super()._run_user(fn, *args, **kwargs)
+        with phase_timer.time_phase(phase):
+            return super()._run_user(fn, *args, **kwargs)
+
+    def _get_phase_name(self, fn):
+        """Return the name of the test phase *fn* runs, or None if it doesn't
+        run a whole phase.
+
+        """
+        phases = {
+            self.case._run_setup: SETUP_PHASE,
+            self.case._run_test_method: TEST_PHASE,
+            self.case._run_teardown: TEARDOWN_PHASE,
+        }
+        return phases.get(fn)
+
 
 class AutopilotTestCase(TestWithScenarios, TestCase, KeybindingsHelper):
 
@@ -146,9 +189,30 @@ class AutopilotTestCase(TestWithScenarios, TestCase, KeybindingsHelper):
 
     run_tests_with = _TimedRunTest
 
+    application_pool_scope = None
+    """Set to 'class' or 'module' to keep applications launched with
+    :meth:`launch_test_application` running between tests.
+
+    An application launched by one test is then handed to the following
+    tests in the same class, or module, that launch the same application
+    with the same arguments, options and environment, instead of being
+    launched again. Before it's handed over, autopilot checks that the
+    application is still running and responding to introspection queries,
+    and relaunches it if it isn't. The application is stopped once a test
+    using it fails, or a test from outside the scope runs.
+
+    Only use this for tests that don't change the state of the application,
+    or that put it back the way they found it. Output of pooled applications
+    is not captured.
+
+    """
+
     def setUp(self):
         super(AutopilotTestCase, self).setUp()
         on_test_started(self)
+        get_application_pool().release_unless_in_scope(
+            _get_application_pool_scope(self)
+        )
         self.useFixture(
             TestCaseLoggingFixture(
                 self.shortDescription(),
@@ -161,6 +225,8 @@ class AutopilotTestCase(TestWithScenarios, TestCase, KeybindingsHelper):
         self.addCleanup(_lttng_trace_test_ended, self.id())
 
         self._process_manager = None
+        self._uses_pooled_application = False
+        self._discard_pooled_application = False
         self._mouse = None
         self._display = None
         self._kb = Keyboard.create()
@@ -271,11 +337,33 @@ class AutopilotTestCase(TestWithScenarios, TestCase, KeybindingsHelper):
         :keyword emulator_base: If set, specifies the base class to be used for
             all emulators for this loaded application.
 
+        :keyword prelaunch: If set to True, a spare copy of the application
+            is started in the background once it's launched, and used by the
+            next test that launches the same application in the same way.
+            See :class:`~autopilot.application.NormalApplicationLauncher`.
+
+        :keyword pooled: If set to False, and :attr:`application_pool_scope`
+            is set, a new copy of the application is launched for this test
+            and stopped after it, instead of using the pooled application.
+            Tests that change the state of the application should do this.
+
         :return: A proxy object that represents the application. Introspection
          data is retrievable via this object.
 
         """
         launch_args = _get_application_launch_args(kwargs)
+        pooled = kwargs.pop('pooled', True)
+
+        scope = _get_application_pool_scope(self)
+        on_session_bus = kwargs.get('dbus_bus', 'session') == 'session'
+        if scope is not None and on_session_bus:
+            if not pooled:
+                get_application_pool().release()
+            elif not self._uses_pooled_application:
+                # Only the first application a test launches is pooled, so
+                # that launching another one doesn't stop it.
+                return self._get_pooled_application(
+                    scope, application, arguments, launch_args, kwargs)
 
         launcher = self.useFixture(
             NormalApplicationLauncher(
@@ -283,7 +371,75 @@ class AutopilotTestCase(TestWithScenarios, TestCase, KeybindingsHelper):
                 **kwargs
             )
         )
-        return launcher.launch(application, arguments, **launch_args)
+        # A prelaunched spare copy of the application keeps running after
+        # this test.
+        with self._ignoring_launched_apps_in_snapshot(
+                kwargs.get('prelaunch', False)):
+            with phase_timer.time_phase(LAUNCH_PHASE, application):
+                return launcher.launch(application, arguments, **launch_args)
+
+    def _get_pooled_application(self, scope, application, arguments,
+                                launch_args, launcher_args):
+        # The pooled application outlives this test, so nothing would read
+        # its output until it's stopped, and a full pipe blocks it.
+        launch_args['capture_output'] = False
+        key = (
+            application,
+            tuple(arguments),
+            tuple(sorted(launch_args.items())),
+            tuple(sorted(launcher_args.items())),
+            tuple(sorted(os.environ.items())),
+        )
+
+        def launch(add_detail):
+            launcher = NormalApplicationLauncher(
+                case_addDetail=add_detail,
+                **launcher_args
+            )
+            launcher.setUp()
+            try:
+                proxy = launcher.launch(application, arguments, **launch_args)
+            except Exception:
+                launcher.cleanUp()
+                raise
+            return launcher, proxy
+
+        self._uses_pooled_application = True
+        self.addOnException(self._discard_pooled_application_on_failure)
+        self.addCleanup(self._end_pooled_application_use)
+        # The pooled application keeps running after this test.
+        with self._ignoring_launched_apps_in_snapshot():
+            with phase_timer.time_phase(LAUNCH_PHASE, application):
+                proxy, _ = get_application_pool().get_application(
+                    scope, key, launch, self.addDetailUniqueName)
+        return proxy
+
+    @contextmanager
+    def _ignoring_launched_apps_in_snapshot(self, ignore=True):
+        """Add applications started within the context to the application
+        snapshot if *ignore* is True, so they aren't reported as left running
+        by this test.
+
+        """
+        snapshot = getattr(self, '_app_snapshot', None) if ignore else None
+        if snapshot is None:
+            yield
+            return
+        snapshot_before_launch = _get_process_snapshot()
+        yield
+        snapshot.extend(
+            app for app in _get_process_snapshot()
+            if app not in snapshot_before_launch
+        )
+
+    def _discard_pooled_application_on_failure(self, ex_info):
+        if _considered_failing_test(ex_info[0]):
+            self._discard_pooled_application = True
+
+    def _end_pooled_application_use(self):
+        get_application_pool().end_test(
+            discard=self._discard_pooled_application
+        )
 
     def launch_click_package(self, package_id, app_name=None, app_uris=[],
                              **kwargs):
@@ -325,7 +481,8 @@ class AutopilotTestCase(TestWithScenarios, TestCase, KeybindingsHelper):
                 **kwargs
             )
         )
-        return launcher.launch(package_id, app_name, app_uris)
+        with phase_timer.time_phase(LAUNCH_PHASE, package_id):
+            return launcher.launch(package_id, app_name, app_uris)
 
     def launch_upstart_application(self, application_name, uris=[],
                                    launcher_class=UpstartApplicationLauncher,
@@ -355,7 +512,8 @@ class AutopilotTestCase(TestWithScenarios, TestCase, KeybindingsHelper):
                 **kwargs
             )
         )
-        return launcher.launch(application_name, uris)
+        with phase_timer.time_phase(LAUNCH_PHASE, application_name):
+            return launcher.launch(application_name, uris)
 
     def _compare_system_with_app_snapshot(self):
         """Compare the currently running application with the last snapshot.
@@ -488,6 +646,27 @@ class AutopilotTestCase(TestWithScenarios, TestCase, KeybindingsHelper):
     assertProperties = assertProperty
 
 
+def _get_application_pool_scope(test):
+    """Return the scope applications launched by *test* are pooled within,
+    or None if they aren't pooled.
+
+    :raises ValueError: if the test's application_pool_scope is not valid.
+
+    """
+    scope = test.application_pool_scope
+    if scope is None:
+        return None
+    test_class = type(test)
+    if scope == 'module':
+        return (test_class.__module__,)
+    if scope == 'class':
+        return (test_class.__module__, test_class.__qualname__)
+    raise ValueError(
+        "Unknown application_pool_scope '%s'. Must be one of 'class' or "
+        "'module'." % scope
+    )
+
+
 def _get_application_launch_args(kwargs):
     """Returns a dict containing relevant args and values for launching an
     application.
@@ -20,7 +20,11 @@
 
 """Autopilot test result classes"""
 
+from collections import defaultdict
+from datetime import datetime, timezone
 import logging
+import sqlite3
+import time
 
 from testtools import (
     ExtendedToOriginalDecorator,
@@ -29,8 +33,11 @@ from testtools import (
     TextTestResult,
     try_import,
 )
+from testtools.content import Content
 
 from autopilot.globals import get_log_verbose
+from autopilot._profiling import PROFILE_DETAIL_NAME
+from autopilot._timing import TOTAL_PHASE, phase_timer
 from autopilot.utilities import _raise_on_unknown_kwargs
 
 
@@ -93,6 +100,379 @@ class LoggedTestResultDecorator(TestResultDecorator):
         return super().addExpectedFailure(test, err, details)
 
 
+class TimingResultDecorator(TestResultDecorator):
+
+    """A decorator that records how long each test takes.
+
+    The total duration of each test, along with the time it spent in each of
+    the phases timed while it ran, is written to a timing database. A test
+    that is run more than once is recorded as a later attempt each time.
+
+    """
+
+    def __init__(self, decorated, timing_database, first_attempt=1):
+        """Construct a new TimingResultDecorator.
+
+        :param decorated: The test result to decorate.
+        :param timing_database: The
+            :class:`~autopilot._timing.TimingDatabase` to write durations to.
+        :param first_attempt: The attempt to record the first run of each
+            test as.
+
+        """
+        super().__init__(decorated)
+        self._timing_database = timing_database
+        self._first_attempt = first_attempt
+        self._runs = defaultdict(int)
+        self._start_time = None
+        self._outcome = None
+        self._attempt = None
+
+    def startTest(self, test):
+        phase_timer.reset()
+        self._start_time = time.monotonic()
+        self._outcome = None
+        self._attempt = self._first_attempt + self._runs[test.id()]
+        self._runs[test.id()] += 1
+        return super().startTest(test)
+
+    def stopTest(self, test):
+        durations = phase_timer.get_durations()
+        durations[TOTAL_PHASE] = time.monotonic() - self._start_time
+        try:
+            self._timing_database.record(
+                test.id(),
+                durations,
+                self._outcome,
+                attempt=self._attempt
+            )
+        except sqlite3.Error as e:
+            logging.getLogger(__name__).warning(
+                "Unable to record duration of %s: %s", test.id(), e
+            )
+        return super().stopTest(test)
+
+    def stopTestRun(self):
+        try:
+            return super().stopTestRun()
+        finally:
+            self._timing_database.close()
+
+    def addSuccess(self, test, details=None):
+        self._outcome = 'success'
+        return super().addSuccess(test, details)
+
+    def addError(self, test, err=None, details=None):
+        self._outcome = 'error'
+        return super().addError(test, err, details)
+
+    def addFailure(self, test, err=None, details=None):
+        self._outcome = 'fail'
+        return super().addFailure(test, err, details)
+
+    def addSkip(self, test, reason=None, details=None):
+        self._outcome = 'skip'
+        return super().addSkip(test, reason, details)
+
+    def addUnexpectedSuccess(self, test, details=None):
+        self._outcome = 'uxsuccess'
+        return super().addUnexpectedSuccess(test, details)
+
+    def addExpectedFailure(self, test, err=None, details=None):
+        self._outcome = 'xfail'
+        return super().addExpectedFailure(test, err, details)
+
+
+class RerunFailuresResultDecorator(TestResultDecorator):
+
+    """A decorator that holds back the results of failed tests, so that they
+    can be run again.
+
+    The result of each test is passed on to the decorated result once the
+    test has finished, unless the test failed and may be run again. Failed
+    tests are run again by passing the tests returned by
+    :meth:`take_tests_to_rerun` to this result. Only the last result of each
+    test is passed on. A test that passes after failing is tagged 'flaky'.
+
+    """
+
+    def __init__(self, decorated, max_reruns):
+        """Construct a new RerunFailuresResultDecorator.
+
+        :param decorated: The test result to decorate.
+        :param max_reruns: The most times a failed test may be run again.
+
+        """
+        super().__init__(decorated)
+        self._max_reruns = max_reruns
+        self._attempts = defaultdict(int)
+        self._failures = defaultdict(int)
+        self._held_calls = {}
+        self._tests_to_rerun = []
+        self._calls = None
+        self._failed = False
+        self._time = None
+        self.flaky_test_ids = []
+
+    def take_tests_to_rerun(self):
+        """Return the failed tests to run again, which haven't been returned
+        before.
+        """
+        tests, self._tests_to_rerun = self._tests_to_rerun, []
+        return tests
+
+    def _now(self):
+        return self._time or datetime.now(timezone.utc)
+
+    def _record(self, name, *args, **kwargs):
+        self._calls.append((name, args, kwargs))
+
+    def _replay(self, calls):
+        for name, args, kwargs in calls:
+            getattr(self.decorated, name)(*args, **kwargs)
+        self.decorated.time(self._time)
+
+    def time(self, a_datetime):
+        self._time = a_datetime
+        if self._calls is None:
+            return super().time(a_datetime)
+        self._record('time', a_datetime)
+
+    def tags(self, new_tags, gone_tags):
+        if self._calls is None:
+            return super().tags(new_tags, gone_tags)
+        self._record('tags', new_tags, gone_tags)
+
+    def startTest(self, test):
+        self._attempts[test.id()] += 1
+        self._failed = False
+        self._calls = []
+        self._record('time', self._now())
+        self._record('startTest', test)
+
+    def stopTest(self, test):
+        test_id = test.id()
+        self._record('stopTest', test)
+        calls, self._calls = self._calls, None
+        if self._failed:
+            self._failures[test_id] += 1
+            if self._attempts[test_id] <= self._max_reruns:
+                self._held_calls[test_id] = calls
+                self._tests_to_rerun.append(test)
+                return
+        elif self._failures[test_id]:
+            self.flaky_test_ids.append(test_id)
+            # Right after startTest.
+            calls.insert(2, ('tags', ({'flaky'}, set()), {}))
+        self._held_calls.pop(test_id, None)
+        self._replay(calls)
+
+    def stopTestRun(self):
+        for calls in self._held_calls.values():
+            self._replay(calls)
+        self._held_calls.clear()
+        return super().stopTestRun()
+
+    def _record_outcome(self, name, test, *args, details=None, failed=False):
+        self._failed = failed
+        if details is not None:
+            # The test's details are reset if it's run again.
+            details = dict(details)
+        self._record('time', self._now())
+        self._record(name, test, *args, details=details)
+
+    def addSuccess(self, test, details=None):
+        self._record_outcome('addSuccess', test, details=details)
+
+    def addError(self, test, err=None, details=None):
+        self._record_outcome(
+            'addError', test, err, details=details, failed=True)
+
+    def addFailure(self, test, err=None, details=None):
+        self._record_outcome(
+            'addFailure', test, err, details=details, failed=True)
+
+    def addSkip(self, test, reason=None, details=None):
+        self._record_outcome('addSkip', test, reason, details=details)
+
+    def addUnexpectedSuccess(self, test, details=None):
+        self._record_outcome(
+            'addUnexpectedSuccess', test, details=details, failed=True)
+
+    def addExpectedFailure(self, test, err=None, details=None):
+        self._record_outcome(
+            'addExpectedFailure', test, err, details=details)
+
+
+class ProfileSummaryResultDecorator(TestResultDecorator):
+
+    """A decorator that adds the profiles attached to tests to a summary of
+    the whole run.
+
+    """
+
+    def __init__(self, decorated, summary):
+        """Construct a new ProfileSummaryResultDecorator.
+
+        :param decorated: The test result to decorate.
+        :param summary: The :class:`~autopilot._profiling.ProfileSummary` to
+            add test profiles to.
+
+        """
+        super().__init__(decorated)
+        self._summary = summary
+
+    def _add_profile(self, test, details):
+        if details and PROFILE_DETAIL_NAME in details:
+            self._summary.add_content(test.id(), details[PROFILE_DETAIL_NAME])
+
+    def addSuccess(self, test, details=None):
+        self._add_profile(test, details)
+        return super().addSuccess(test, details)
+
+    def addError(self, test, err=None, details=None):
+        self._add_profile(test, details)
+        return super().addError(test, err, details)
+
+    def addFailure(self, test, err=None, details=None):
+        self._add_profile(test, details)
+        return super().addFailure(test, err, details)
+
+    def addSkip(self, test, reason=None, details=None):
+        self._add_profile(test, details)
+        return super().addSkip(test, reason, details)
+
+    def addUnexpectedSuccess(self, test, details=None):
+        self._add_profile(test, details)
+        return super().addUnexpectedSuccess(test, details)
+
+    def addExpectedFailure(self, test, err=None, details=None):
+        self._add_profile(test, details)
+        return super().addExpectedFailure(test, err, details)
+
+
+# The most bytes of a detail written in a single subunit packet.
+DETAIL_CHUNK_SIZE = 65536
+
+
+class StreamingDetailsResultDecorator(TestResultDecorator):
+
+    """A decorator that writes test details as soon as they're attached.
+
+    Details attached with the test's addDetail method while the test runs are
+    written to the decorated stream result straight away, in chunks, rather
+    than once the test has finished. Binary details are then dropped from the
+    test, so that screenshots and videos aren't held in memory until the test
+    finishes. Details attached in any other way are written along with the
+    test's outcome, as usual.
+
+    """
+
+    def __init__(self, decorated, output_stream=None,
+                 chunk_size=DETAIL_CHUNK_SIZE):
+        """Construct a new StreamingDetailsResultDecorator.
+
+        :param decorated: The test result to decorate. It must also be a
+            stream result, such as an ExtendedToStreamDecorator.
+        :param output_stream: If set, a stream that is flushed after each
+            detail is written, so that readers of it see the detail at once.
+        :param chunk_size: The most bytes of a detail written at once.
+
+        """
+        super().__init__(decorated)
+        self._output_stream = output_stream
+        self._chunk_size = chunk_size
+        self._streamed_details = {}
+
+    def startTest(self, test):
+        result = super().startTest(test)
+        self._streamed_details = {}
+        add_detail = getattr(test, 'addDetail', None)
+        if add_detail is not None:
+            test.addDetail = (
+                lambda name, content_object:
+                self._add_detail(test, add_detail, name, content_object)
+            )
+        return result
+
+    def stopTest(self, test):
+        vars(test).pop('addDetail', None)
+        return super().stopTest(test)
+
+    def _add_detail(self, test, add_detail, name, content_object):
+        add_detail(name, content_object)
+        try:
+            self._write_detail(test.id(), name, content_object)
+        except Exception as e:
+            # The detail is written with the test outcome instead.
+            logging.getLogger(__name__).warning(
+                "Unable to write detail %r of %s: %s", name, test.id(), e
+            )
+            return
+        if content_object.content_type.type != 'text':
+            content_object = Content(content_object.content_type, lambda: [])
+            test.getDetails()[name] = content_object
+        self._streamed_details[name] = content_object
+
+    def _write_detail(self, test_id, name, content_object):
+        mime_type = repr(content_object.content_type)
+        timestamp = datetime.now(timezone.utc)
+        pending = b''
+        for data in content_object.iter_bytes():
+            pending += data
+            while len(pending) > self._chunk_size:
+                self.decorated.status(
+                    test_id=test_id,
+                    file_name=name,
+                    file_bytes=pending[:self._chunk_size],
+                    mime_type=mime_type,
+                    timestamp=timestamp,
+                )
+                pending = pending[self._chunk_size:]
+        self.decorated.status(
+            test_id=test_id,
+            file_name=name,
+            file_bytes=pending,
+            mime_type=mime_type,
+            eof=True,
+            timestamp=timestamp,
+        )
+        if self._output_stream is not None:
+            self._output_stream.flush()
+
+    def _get_unwritten_details(self, details):
+        if details is None:
+            return None
+        return {
+            name: content_object for name, content_object in details.items()
+            if self._streamed_details.get(name) is not content_object
+        }
+
+    def addSuccess(self, test, details=None):
+        return super().addSuccess(
+            test, details=self._get_unwritten_details(details))
+
+    def addError(self, test, err=None, details=None):
+        return super().addError(
+            test, err, details=self._get_unwritten_details(details))
+
+    def addFailure(self, test, err=None, details=None):
+        return super().addFailure(
+            test, err, details=self._get_unwritten_details(details))
+
+    def addSkip(self, test, reason=None, details=None):
+        return super().addSkip(
+            test, reason, details=self._get_unwritten_details(details))
+
+    def addUnexpectedSuccess(self, test, details=None):
+        return super().addUnexpectedSuccess(
+            test, details=self._get_unwritten_details(details))
+
+    def addExpectedFailure(self, test, err=None, details=None):
+        return super().addExpectedFailure(
+            test, err, details=self._get_unwritten_details(details))
+
+
 def get_output_formats():
     """Get information regarding the different output formats supported.
 
@@ -141,8 +521,11 @@ def _construct_subunit(**kwargs):
     failfast = kwargs.pop('failfast')
     _raise_on_unknown_kwargs(kwargs)
     result_object = LoggedTestResultDecorator(
-        ExtendedToStreamDecorator(
-            StreamResultToBytes(stream)
+        StreamingDetailsResultDecorator(
+            ExtendedToStreamDecorator(
+                StreamResultToBytes(stream)
+            ),
+            output_stream=stream,
         )
     )
     result_object.failfast = failfast
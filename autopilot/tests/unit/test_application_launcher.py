@@ -45,6 +45,7 @@ from autopilot.application._environment import (
     QtApplicationEnvironment,
 )
 import autopilot.application._launcher as _l
+from autopilot.exceptions import ProcessSearchError
 from autopilot.application._launcher import (
     ApplicationLauncher,
     get_application_launcher_wrapper,
@@ -56,8 +57,10 @@ from autopilot.application._launcher import (
     _get_click_app_id,
     _get_click_manifest,
     _is_process_running,
+    _kill_escaped_descendants,
     _kill_process,
 )
+from autopilot.process._tree import ProcessTree
 from autopilot.utilities import sleep
 
 
@@ -188,10 +191,11 @@ class NormalApplicationLauncherTests(TestCase):
                     [token_b, token_c],
                 )
 
+    @patch('autopilot.application._launcher.get_new_connection_watcher')
     @patch('autopilot.application._launcher.'
            'get_proxy_object_for_existing_process')
     @patch('autopilot.application._launcher._get_application_path')
-    def test_launch_gets_correct_proxy_object(self, _, gpofep):
+    def test_launch_gets_correct_proxy_object(self, _, gpofep, gncw):
         """Test that NormalApplicationLauncher.launch calls
         get_proxy_object_for_existing_process with the correct return values of
         other functions."""
@@ -200,10 +204,46 @@ class NormalApplicationLauncherTests(TestCase):
             with patch.object(launcher, '_setup_environment') as se:
                 se.return_value = ('', [])
                 launcher.launch('')
-                gpofep.assert_called_once_with(process=lap.return_value,
-                                               pid=lap.return_value.pid,
-                                               emulator_base=None,
-                                               dbus_bus='session')
+                gpofep.assert_called_once_with(
+                    process=lap.return_value,
+                    pid=lap.return_value.pid,
+                    emulator_base=None,
+                    dbus_bus='session',
+                    connection_watcher=gncw.return_value,
+                )
+
+    @patch('autopilot.application._launcher.get_new_connection_watcher')
+    @patch('autopilot.application._launcher.'
+           'get_proxy_object_for_existing_process')
+    @patch('autopilot.application._launcher._get_application_path')
+    def test_launch_watches_bus_before_launching_process(self, _, __, gncw):
+        launcher = NormalApplicationLauncher()
+        calls = []
+        gncw.side_effect = lambda bus: calls.append('watch')
+
+        def launch_application_process(*args):
+            calls.append('launch')
+            return Mock()
+
+        with patch.object(launcher, '_launch_application_process') as lap:
+            lap.side_effect = launch_application_process
+            with patch.object(launcher, '_setup_environment') as se:
+                se.return_value = ('', [])
+                launcher.launch('')
+        self.assertThat(calls, Equals(['watch', 'launch']))
+
+    @patch('autopilot.application._launcher.get_new_connection_watcher')
+    @patch('autopilot.application._launcher.'
+           'get_proxy_object_for_existing_process')
+    @patch('autopilot.application._launcher._get_application_path')
+    def test_launch_stops_connection_watcher(self, _, gpofep, gncw):
+        launcher = NormalApplicationLauncher()
+        gpofep.side_effect = ProcessSearchError()
+        with patch.object(launcher, '_launch_application_process'):
+            with patch.object(launcher, '_setup_environment') as se:
+                se.return_value = ('', [])
+                self.assertRaises(ProcessSearchError, launcher.launch, '')
+        gncw.return_value.stop.assert_called_once_with()
 
     @patch('autopilot.application._launcher.'
            'get_proxy_object_for_existing_process')
@@ -261,6 +301,153 @@ class NormalApplicationLauncherTests(TestCase):
             )
 
 
+class PrelaunchTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name, value in (
+            ('_spare_application', None),
+            ('get_new_connection_watcher', Mock()),
+            ('get_proxy_object_for_existing_process', Mock()),
+            ('_get_application_path', Mock(return_value='/foo/bar')),
+        ):
+            patcher = patch.object(_l, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def launch(self, launcher):
+        with patch.object(launcher, '_setup_environment') as se:
+            se.return_value = ('/foo/bar', ['-testability'])
+            with patch.object(_l, 'launch_process') as launch_process:
+                launcher.launch('bar', capture_output=False)
+        return launch_process
+
+    def make_spare(self, key=None, returncode=None):
+        process = Mock()
+        process.poll.return_value = returncode
+        return _l._SpareApplication(key, process, Mock())
+
+    def test_launch_starts_spare_application(self):
+        launcher = self.useFixture(NormalApplicationLauncher(prelaunch=True))
+
+        launch_process = self.launch(launcher)
+
+        launch_process.assert_called_once_with(
+            '/foo/bar', ['-testability'], False, cwd=None
+        )
+        self.assertThat(
+            _l._spare_application.process,
+            Equals(launch_process.return_value)
+        )
+
+    def test_launch_without_prelaunch_starts_no_spare_application(self):
+        launcher = NormalApplicationLauncher()
+
+        with patch.object(launcher, '_launch_application_process'):
+            self.launch(launcher)
+
+        self.assertThat(_l._spare_application, Equals(None))
+
+    def test_launch_uses_spare_application(self):
+        spare = self.make_spare(
+            key=_l._get_spare_application_key(
+                '/foo/bar', ['-testability'], None, False, 'session'
+            )
+        )
+        _l._spare_application = spare
+        launcher = self.useFixture(NormalApplicationLauncher(prelaunch=True))
+
+        with patch.object(launcher, '_launch_application_process') as lap:
+            self.launch(launcher)
+
+        self.assertFalse(lap.called)
+        _l.get_proxy_object_for_existing_process.assert_called_once_with(
+            process=spare.process,
+            pid=spare.process.pid,
+            emulator_base=None,
+            dbus_bus='session',
+            connection_watcher=spare.connection_watcher,
+        )
+
+    def test_spare_application_is_paused_after_test(self):
+        launcher = NormalApplicationLauncher(prelaunch=True)
+        launcher.setUp()
+        self.launch(launcher)
+
+        with patch.object(_l, '_attempt_kill_pid') as attempt_kill_pid:
+            with patch.object(launcher, '_kill_process_and_attach_logs'):
+                launcher.cleanUp()
+
+        attempt_kill_pid.assert_called_once_with(
+            _l._spare_application.process.pid, signal.SIGSTOP
+        )
+
+    def test_take_spare_application_with_same_key(self):
+        spare = self.make_spare(key='key')
+        _l._spare_application = spare
+
+        self.assertThat(_l._take_spare_application('key'), Equals(spare))
+        self.assertThat(_l._spare_application, Equals(None))
+
+    def test_take_spare_application_resumes_it(self):
+        spare = self.make_spare(key='key')
+        spare._paused = True
+        _l._spare_application = spare
+
+        with patch.object(_l, '_attempt_kill_pid') as attempt_kill_pid:
+            _l._take_spare_application('key')
+
+        attempt_kill_pid.assert_called_once_with(
+            spare.process.pid, signal.SIGCONT
+        )
+
+    def test_take_spare_application_kills_it_for_other_key(self):
+        spare = self.make_spare(key='key')
+        _l._spare_application = spare
+
+        with patch.object(_l, '_kill_process') as kill_process:
+            self.assertThat(
+                _l._take_spare_application('other'), Equals(None)
+            )
+
+        kill_process.assert_called_once_with(spare.process)
+        spare.connection_watcher.stop.assert_called_once_with()
+
+    def test_take_spare_application_that_exited(self):
+        _l._spare_application = self.make_spare(key='key', returncode=1)
+
+        with patch.object(_l, '_kill_process'):
+            self.assertThat(_l._take_spare_application('key'), Equals(None))
+
+    def test_killing_paused_spare_application_resumes_it_first(self):
+        spare = self.make_spare()
+        spare.pause()
+        calls = []
+
+        with patch.object(
+            _l, '_attempt_kill_pid',
+            side_effect=lambda pid, sig: calls.append(sig)
+        ):
+            with patch.object(
+                _l, '_kill_process',
+                side_effect=lambda process: calls.append('kill')
+            ):
+                spare.kill()
+
+        self.assertThat(calls, Equals([signal.SIGCONT, 'kill']))
+
+    def test_spare_application_key_depends_on_environment(self):
+        key = _l._get_spare_application_key('/foo', [], None, True, 'session')
+
+        with patch.dict(_l.os.environ, {'AUTOPILOT_TEST_VARIABLE': '1'}):
+            self.assertThat(
+                _l._get_spare_application_key(
+                    '/foo', [], None, True, 'session'
+                ),
+                Not(Equals(key))
+            )
+
+
 class ClickApplicationLauncherTests(TestCase):
 
     def test_raises_exception_on_unknown_kwargs(self):
@@ -984,8 +1171,9 @@ class ApplicationLauncherInternalTests(TestCase):
         ):
             self.assertThat(_kill_process(mock_process), Equals(("", "", 0)))
 
+    @patch.object(_l, '_kill_escaped_descendants')
     @patch.object(_l, '_attempt_kill_pid')
-    def test_kill_process_tries_again(self, patched_kill_pid):
+    def test_kill_process_tries_again(self, patched_kill_pid, patched_escaped):
         with sleep.mocked():
             mock_process = Mock()
             mock_process.pid = 123
@@ -999,6 +1187,33 @@ class ApplicationLauncherInternalTests(TestCase):
                 self.assertThat(proc_running.call_count, GreaterThan(1))
                 self.assertThat(patched_kill_pid.call_count, Equals(2))
                 patched_kill_pid.assert_called_with(123, signal.SIGKILL)
+                patched_escaped.assert_called_once_with(123)
+
+    @patch.object(_l.os, 'kill')
+    @patch.object(_l.os, 'getpgid')
+    def test_kill_escaped_descendants_kills_children_outside_group(
+            self, getpgid, kill):
+        tree = ProcessTree({
+            123: (1, 'app'),
+            124: (123, 'in-group'),
+            125: (123, 'escaped'),
+        })
+        getpgid.side_effect = {124: 123, 125: 125}.get
+        with patch.object(_l, 'get_process_tree', return_value=tree) as gpt:
+            _kill_escaped_descendants(123)
+
+        gpt.assert_called_once_with(max_age=0)
+        kill.assert_called_once_with(125, signal.SIGKILL)
+
+    @patch.object(_l.os, 'kill')
+    @patch.object(_l.os, 'getpgid', side_effect=OSError())
+    def test_kill_escaped_descendants_ignores_exited_children(
+            self, getpgid, kill):
+        tree = ProcessTree({123: (1, 'app'), 125: (123, 'escaped')})
+        with patch.object(_l, 'get_process_tree', return_value=tree):
+            _kill_escaped_descendants(123)
+
+        self.assertFalse(kill.called)
 
     @patch.object(_l.subprocess, 'Popen')
     def test_launch_process_uses_arguments(self, popen):
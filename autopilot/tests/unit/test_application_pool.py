@@ -0,0 +1,175 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from unittest.mock import Mock
+
+from fixtures import FakeLogger
+from testtools import TestCase
+from testtools.matchers import Equals, Is
+
+from autopilot.application._pool import ApplicationPool
+
+
+class _FakeLauncher(object):
+
+    def __init__(self):
+        self.application = Mock()
+        self.application.process.poll.return_value = None
+        self.add_detail = None
+        self.cleaned_up = False
+
+    def launch(self, add_detail):
+        self.add_detail = add_detail
+        return self, self.application
+
+    def cleanUp(self):
+        self.cleaned_up = True
+        self.add_detail('process-return-code', 0)
+
+
+class ApplicationPoolTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.useFixture(FakeLogger())
+        self.pool = ApplicationPool()
+        self.addCleanup(self.pool.release)
+
+    def get_application(self, launcher, scope='scope', key='key',
+                        add_detail=None):
+        return self.pool.get_application(
+            scope, key, launcher.launch, add_detail or Mock())
+
+    def test_launches_application_when_pool_is_empty(self):
+        launcher = _FakeLauncher()
+
+        application, launched = self.get_application(launcher)
+
+        self.assertThat(application, Is(launcher.application))
+        self.assertTrue(launched)
+
+    def test_reuses_application_for_same_scope_and_key(self):
+        first = _FakeLauncher()
+        self.get_application(first)
+        self.pool.end_test()
+
+        application, launched = self.get_application(_FakeLauncher())
+
+        self.assertThat(application, Is(first.application))
+        self.assertFalse(launched)
+        self.assertFalse(first.cleaned_up)
+
+    def test_relaunches_application_for_different_key(self):
+        first = _FakeLauncher()
+        self.get_application(first)
+        self.pool.end_test()
+        second = _FakeLauncher()
+
+        application, launched = self.get_application(second, key='other')
+
+        self.assertThat(application, Is(second.application))
+        self.assertTrue(launched)
+        self.assertTrue(first.cleaned_up)
+
+    def test_relaunches_application_for_different_scope(self):
+        first = _FakeLauncher()
+        self.get_application(first)
+        self.pool.end_test()
+        second = _FakeLauncher()
+
+        application, _ = self.get_application(second, scope='other')
+
+        self.assertThat(application, Is(second.application))
+        self.assertTrue(first.cleaned_up)
+
+    def test_relaunches_application_that_exited(self):
+        first = _FakeLauncher()
+        self.get_application(first)
+        self.pool.end_test()
+        first.application.process.poll.return_value = 1
+        first.application.process.returncode = 1
+        second = _FakeLauncher()
+
+        application, launched = self.get_application(second)
+
+        self.assertThat(application, Is(second.application))
+        self.assertTrue(launched)
+        self.assertTrue(first.cleaned_up)
+
+    def test_relaunches_application_that_stopped_responding(self):
+        first = _FakeLauncher()
+        self.get_application(first)
+        self.pool.end_test()
+        first.application.refresh_state.side_effect = RuntimeError('gone')
+        second = _FakeLauncher()
+
+        application, launched = self.get_application(second)
+
+        self.assertThat(application, Is(second.application))
+        self.assertTrue(launched)
+
+    def test_discarding_stops_application(self):
+        launcher = _FakeLauncher()
+        self.get_application(launcher)
+
+        self.pool.end_test(discard=True)
+
+        self.assertTrue(launcher.cleaned_up)
+
+    def test_details_are_attached_to_test_using_application(self):
+        launcher = _FakeLauncher()
+        add_detail = Mock()
+        self.get_application(launcher, add_detail=add_detail)
+
+        self.pool.end_test(discard=True)
+
+        add_detail.assert_called_once_with('process-return-code', 0)
+
+    def test_details_are_dropped_between_tests(self):
+        launcher = _FakeLauncher()
+        add_detail = Mock()
+        self.get_application(launcher, add_detail=add_detail)
+        self.pool.end_test()
+
+        self.pool.release()
+
+        self.assertFalse(add_detail.called)
+
+    def test_release_unless_in_scope_keeps_application_in_scope(self):
+        launcher = _FakeLauncher()
+        self.get_application(launcher, scope='scope')
+        self.pool.end_test()
+
+        self.pool.release_unless_in_scope('scope')
+
+        self.assertFalse(launcher.cleaned_up)
+
+    def test_release_unless_in_scope_stops_application_out_of_scope(self):
+        launcher = _FakeLauncher()
+        self.get_application(launcher, scope='scope')
+        self.pool.end_test()
+
+        self.pool.release_unless_in_scope(None)
+
+        self.assertTrue(launcher.cleaned_up)
+
+    def test_release_of_empty_pool_does_nothing(self):
+        self.pool.release()
+
+        self.assertThat(self.pool._launcher, Equals(None))
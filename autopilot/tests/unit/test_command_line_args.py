@@ -383,6 +383,123 @@ class CommandLineArgsTests(TestCase):
         args = parse_args('run --test-timeout 42 foo')
         self.assertThat(args.test_timeout, Equals(42))
 
+    def test_default_jobs(self):
+        args = parse_args('run foo')
+        self.assertThat(args.jobs, Equals(1))
+
+    def test_can_set_jobs_short(self):
+        args = parse_args('run -j 4 foo')
+        self.assertThat(args.jobs, Equals(4))
+
+    def test_can_set_jobs_long(self):
+        args = parse_args('run --jobs 4 foo')
+        self.assertThat(args.jobs, Equals(4))
+
+    @patch('sys.stderr', new=StringIO())
+    def test_cannot_set_zero_jobs(self):
+        self.assertRaises(InvalidArguments, parse_args, 'run -j 0 foo')
+
+    @patch('sys.stderr', new=StringIO())
+    def test_cannot_set_non_numeric_jobs(self):
+        self.assertRaises(InvalidArguments, parse_args, 'run -j many foo')
+
+    def test_profile_tests_default(self):
+        args = parse_args('run foo')
+        self.assertThat(args.profile_tests, Equals(False))
+
+    def test_can_set_profile_tests(self):
+        args = parse_args('run --profile-tests foo')
+        self.assertThat(args.profile_tests, Equals(True))
+
+    def test_worker_flag_default(self):
+        args = parse_args('run foo')
+        self.assertThat(args.worker, Equals(False))
+
+    def test_worker_flag(self):
+        args = parse_args('run --worker foo')
+        self.assertThat(args.worker, Equals(True))
+
+    def test_default_order(self):
+        args = parse_args('run foo')
+        self.assertThat(args.order, Equals(None))
+
+    def test_run_can_select_order(self):
+        args = parse_args('run --order failed-first foo')
+        self.assertThat(args.order, Equals('failed-first'))
+
+    def test_cannot_select_unknown_order(self):
+        self.assertRaises(
+            InvalidArguments, parse_args, 'run --order sideways foo'
+        )
+
+    def test_cannot_select_order_and_random_order(self):
+        self.assertRaises(
+            InvalidArguments, parse_args, 'run --order failed-first -ro foo'
+        )
+
+    def test_default_shard(self):
+        args = parse_args('run foo')
+        self.assertThat(args.shard, Equals(None))
+
+    def test_run_can_select_shard(self):
+        args = parse_args('run --shard 2/3 foo')
+        self.assertThat(args.shard, Equals((2, 3)))
+
+    def test_list_can_select_shard(self):
+        args = parse_args('list --shard 1/3 foo')
+        self.assertThat(args.shard, Equals((1, 3)))
+
+    @patch('sys.stderr', new=StringIO())
+    def test_cannot_select_shard_out_of_range(self):
+        self.assertRaises(InvalidArguments, parse_args, 'run --shard 4/3 foo')
+
+    def test_can_set_timing_database(self):
+        args = parse_args('run --timing-database /tmp/t.sqlite foo')
+        self.assertThat(args.timing_database, Equals('/tmp/t.sqlite'))
+
+    def test_merge_results_command_stores_results_files(self):
+        args = parse_args('merge-results a.subunit b.xml')
+        self.assertThat(args.results_files, Equals(['a.subunit', 'b.xml']))
+
+    def test_merge_results_command_has_default_format(self):
+        args = parse_args('merge-results a.subunit')
+        self.assertThat(args.format, Equals('text'))
+
+    def test_merge_results_command_can_specify_output(self):
+        args = parse_args('merge-results -o merged.log a.subunit')
+        self.assertThat(args.output, Equals('merged.log'))
+
+    @patch('sys.stderr', new=StringIO())
+    def test_merge_results_command_must_specify_results_file(self):
+        self.assertRaises(InvalidArguments, parse_args, 'merge-results')
+
+    def test_tail_command_stores_results_file(self):
+        args = parse_args('tail results.subunit')
+        self.assertThat(args.results_file, Equals('results.subunit'))
+
+    def test_tail_command_follows_by_default(self):
+        args = parse_args('tail results.subunit')
+        self.assertThat(args.follow, Equals(True))
+
+    def test_tail_command_can_stop_at_end_of_file(self):
+        args = parse_args('tail --no-follow results.subunit')
+        self.assertThat(args.follow, Equals(False))
+
+    @patch('sys.stderr', new=StringIO())
+    def test_tail_command_must_specify_results_file(self):
+        self.assertRaises(InvalidArguments, parse_args, 'tail')
+
+    def test_profile_report_command_stores_results_files(self):
+        args = parse_args('profile-report a.subunit b.subunit')
+        self.assertThat(
+            args.results_files,
+            Equals(['a.subunit', 'b.subunit'])
+        )
+
+    @patch('sys.stderr', new=StringIO())
+    def test_profile_report_command_must_specify_results_file(self):
+        self.assertRaises(InvalidArguments, parse_args, 'profile-report')
+
 
 class GlobalProfileOptionTests(WithScenarios, TestCase):
 
@@ -390,6 +507,9 @@ class GlobalProfileOptionTests(WithScenarios, TestCase):
         ('run', dict(command='run', args='foo')),
         ('list', dict(command='list', args='foo')),
         ('launch', dict(command='launch', args='foo')),
+        ('merge-results', dict(command='merge-results', args='foo')),
+        ('tail', dict(command='tail', args='foo')),
+        ('profile-report', dict(command='profile-report', args='foo')),
         ('vis', dict(command='vis', args='')),
     ]
 
@@ -0,0 +1,102 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from dbus import DBusException
+from testtools import TestCase
+from testtools.matchers import Equals
+from unittest.mock import Mock, patch
+
+from autopilot import dbus_handler
+
+
+class BusConnectionPoolTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pool = dbus_handler._BusConnectionPool()
+        patcher = patch.object(dbus_handler, 'BusConnection')
+        self.bus_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bus_connection.side_effect = lambda address: Mock()
+
+    def test_reuses_connection_for_same_address(self):
+        first = self.pool.get_connection('unix:abstract=foo')
+        second = self.pool.get_connection('unix:abstract=foo')
+
+        self.assertIs(first, second)
+        self.assertThat(self.bus_connection.call_count, Equals(1))
+
+    def test_different_addresses_get_different_connections(self):
+        first = self.pool.get_connection('unix:abstract=foo')
+        second = self.pool.get_connection('unix:abstract=bar')
+
+        self.assertIsNot(first, second)
+
+    def test_reconnects_when_connection_is_closed(self):
+        first = self.pool.get_connection('unix:abstract=foo')
+        first.get_is_connected.return_value = False
+
+        second = self.pool.get_connection('unix:abstract=foo')
+
+        self.assertIsNot(first, second)
+        self.bus_connection.assert_called_with('unix:abstract=foo')
+
+    def test_reconnects_when_liveness_check_raises(self):
+        first = self.pool.get_connection('unix:abstract=foo')
+        first.get_is_connected.side_effect = DBusException()
+
+        self.assertIsNot(first, self.pool.get_connection('unix:abstract=foo'))
+
+    def test_close_all_closes_every_connection(self):
+        first = self.pool.get_connection('unix:abstract=foo')
+        second = self.pool.get_connection('unix:abstract=bar')
+
+        self.pool.close_all()
+
+        first.close.assert_called_once_with()
+        second.close.assert_called_once_with()
+
+    def test_close_all_empties_the_pool(self):
+        first = self.pool.get_connection('unix:abstract=foo')
+        self.pool.close_all()
+
+        self.assertIsNot(first, self.pool.get_connection('unix:abstract=foo'))
+
+    def test_close_all_ignores_errors(self):
+        connection = self.pool.get_connection('unix:abstract=foo')
+        connection.close.side_effect = DBusException()
+
+        self.pool.close_all()
+
+
+class GetCustomBusTests(TestCase):
+
+    def test_uses_the_module_pool(self):
+        with patch.object(dbus_handler, '_ensure_glib_loop_set'):
+            with patch.object(dbus_handler, '_custom_bus_pool') as pool:
+                bus = dbus_handler.get_custom_bus('unix:abstract=foo')
+
+        pool.get_connection.assert_called_once_with('unix:abstract=foo')
+        self.assertIs(bus, pool.get_connection.return_value)
+
+    def test_close_custom_buses_closes_the_module_pool(self):
+        with patch.object(dbus_handler, '_custom_bus_pool') as pool:
+            dbus_handler.close_custom_buses()
+
+        pool.close_all.assert_called_once_with()
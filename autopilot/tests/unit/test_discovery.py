@@ -0,0 +1,596 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+import sys
+from textwrap import dedent
+from unittest import TestLoader, TestSuite
+from unittest.mock import patch
+
+from fixtures import TempDir
+from testtools import TestCase, TestResult
+from testtools.matchers import Contains, Equals, Not
+
+from autopilot import _discovery
+from autopilot._discovery import DiscoveryIndex, IndexedTest
+
+
+def _parse(source):
+    return _discovery.parse_module(dedent(source).encode())
+
+
+class ParseModuleTests(TestCase):
+
+    def test_finds_test_methods_of_classes(self):
+        details = _parse("""\
+            class SomeTests(TestCase):
+                def test_b(self):
+                    pass
+                def test_a(self):
+                    pass
+                def helper(self):
+                    pass
+            """)
+
+        self.assertThat(details['dynamic'], Equals(False))
+        self.assertThat(
+            details['classes']['SomeTests'],
+            Equals(dict(
+                bases=['TestCase'],
+                tests=['test_a', 'test_b'],
+                dynamic=False,
+            ))
+        )
+
+    def test_records_dotted_base_names(self):
+        details = _parse("""\
+            class SomeTests(testtools.TestCase, object):
+                pass
+            """)
+
+        self.assertThat(
+            details['classes']['SomeTests']['bases'],
+            Equals(['testtools.TestCase', 'object'])
+        )
+
+    def test_records_imports(self):
+        details = _parse("""\
+            import os.path
+            import testtools as tt
+            from autopilot.testcase import AutopilotTestCase as Base
+            from . import helpers
+            """)
+
+        self.assertThat(details['imports'], Equals({
+            'os': [0, 'os'],
+            'tt': [0, 'testtools'],
+            'Base': [0, 'autopilot.testcase.AutopilotTestCase'],
+            'helpers': [1, 'helpers'],
+        }))
+        self.assertThat(
+            details['required'],
+            Equals(['os', 'testtools', 'autopilot'])
+        )
+
+    def test_finds_scenario_names(self):
+        details = _parse("""\
+            class SomeTests(TestCase):
+                scenarios = [
+                    ('one', {'value': 1}),
+                    ('two', dict(value=2)),
+                ]
+            """)
+
+        self.assertThat(
+            details['classes']['SomeTests']['scenarios'],
+            Equals(['one', 'two'])
+        )
+
+    def test_scenarios_that_are_not_a_list_are_ignored(self):
+        details = _parse("""\
+            class SomeTests(TestCase):
+                scenarios = None
+            """)
+
+        self.assertThat(
+            details['classes']['SomeTests']['scenarios'],
+            Equals(None)
+        )
+
+    def test_computed_scenarios_are_unknown(self):
+        details = _parse("""\
+            class SomeTests(TestCase):
+                scenarios = multiply_scenarios(a, b)
+            """)
+
+        self.assertThat(
+            details['classes']['SomeTests']['scenarios'],
+            Equals('unknown')
+        )
+
+    def test_module_with_load_tests_is_dynamic(self):
+        details = _parse("""\
+            def load_tests(loader, tests, pattern):
+                return tests
+            """)
+
+        self.assertTrue(details['load_tests'])
+        self.assertTrue(details['dynamic'])
+
+    def test_module_importing_load_tests_is_dynamic(self):
+        details = _parse("""\
+            from testscenarios import load_tests_apply_scenarios as load_tests
+            """)
+
+        self.assertTrue(details['load_tests'])
+        self.assertTrue(details['dynamic'])
+
+    def test_module_with_syntax_error_is_dynamic(self):
+        self.assertTrue(_parse("class ..:\n")['dynamic'])
+
+    def test_conditionally_defined_classes_make_module_dynamic(self):
+        details = _parse("""\
+            if True:
+                class SomeTests(TestCase):
+                    pass
+            """)
+
+        self.assertTrue(details['dynamic'])
+
+    def test_assigning_to_class_attributes_makes_module_dynamic(self):
+        details = _parse("""\
+            class SomeTests(TestCase):
+                pass
+            SomeTests.scenarios = []
+            """)
+
+        self.assertTrue(details['dynamic'])
+
+    def test_test_attributes_that_are_not_methods_make_class_dynamic(self):
+        details = _parse("""\
+            class SomeTests(TestCase):
+                test_something = make_test()
+            """)
+
+        self.assertTrue(details['classes']['SomeTests']['dynamic'])
+
+    def test_rebinding_a_class_name_forgets_the_class(self):
+        details = _parse("""\
+            class SomeTests(TestCase):
+                pass
+            SomeTests = decorate(SomeTests)
+            """)
+
+        self.assertThat(details['classes'], Equals({}))
+
+
+class DiscoveryIndexTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = self.useFixture(TempDir()).path
+        self.index_path = os.path.join(self.directory, 'cache', 'index.json')
+        self.module_path = os.path.join(self.directory, 'test_module.py')
+        self.write_module("class Tests(TestCase):\n    pass\n")
+
+    def write_module(self, source, mtime=None):
+        with open(self.module_path, 'w') as f:
+            f.write(source)
+        if mtime is not None:
+            os.utime(self.module_path, (mtime, mtime))
+
+    def test_parses_module(self):
+        details = DiscoveryIndex(self.index_path).get_module_details(
+            self.module_path
+        )
+
+        self.assertThat(details['classes'], Contains('Tests'))
+
+    def test_saved_details_are_used_by_next_index(self):
+        index = DiscoveryIndex(self.index_path)
+        index.get_module_details(self.module_path)
+        index.save()
+
+        with patch.object(_discovery, 'parse_module') as parse_module:
+            details = DiscoveryIndex(self.index_path).get_module_details(
+                self.module_path
+            )
+
+        self.assertFalse(parse_module.called)
+        self.assertThat(details['classes'], Contains('Tests'))
+
+    def test_changed_module_is_parsed_again(self):
+        index = DiscoveryIndex(self.index_path)
+        index.get_module_details(self.module_path)
+        self.write_module(
+            "class OtherTests(TestCase):\n    pass\n",
+            mtime=os.stat(self.module_path).st_mtime + 10
+        )
+
+        details = index.get_module_details(self.module_path)
+
+        self.assertThat(details['classes'], Not(Contains('Tests')))
+        self.assertThat(details['classes'], Contains('OtherTests'))
+
+    def test_touched_but_unchanged_module_is_not_parsed_again(self):
+        index = DiscoveryIndex(self.index_path)
+        index.get_module_details(self.module_path)
+        os.utime(self.module_path, (1, 1))
+
+        with patch.object(_discovery, 'parse_module') as parse_module:
+            index.get_module_details(self.module_path)
+
+        self.assertFalse(parse_module.called)
+
+    def test_index_from_other_version_is_ignored(self):
+        os.makedirs(os.path.dirname(self.index_path))
+        with open(self.index_path, 'w') as f:
+            json.dump(dict(version=-1, files={'a': 'b'}), f)
+
+        self.assertThat(DiscoveryIndex(self.index_path)._entries, Equals({}))
+
+    def test_corrupt_index_is_ignored(self):
+        os.makedirs(os.path.dirname(self.index_path))
+        with open(self.index_path, 'w') as f:
+            f.write('{')
+
+        self.assertThat(DiscoveryIndex(self.index_path)._entries, Equals({}))
+
+    def test_unwritable_index_is_not_an_error(self):
+        index = DiscoveryIndex('/proc/autopilot/index.json')
+        index.get_module_details(self.module_path)
+
+        index.save()
+
+    def test_default_path_is_in_cache_directory(self):
+        with patch.dict(os.environ, {'XDG_CACHE_HOME': '/some/cache'}):
+            self.assertThat(
+                _discovery.get_default_index_path(),
+                Equals('/some/cache/autopilot/discovery-index.json')
+            )
+
+
+class _TemporaryPackageTestCase(TestCase):
+
+    """Find tests in a package written to a temporary directory.
+
+    Every test uses a package name of its own, so that modules imported by
+    one test don't affect another.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.top_level_dir = self.useFixture(TempDir()).path
+        self.package = 'discovery_%s' % self.getUniqueInteger()
+        self.index = DiscoveryIndex(
+            os.path.join(self.top_level_dir, 'index.json')
+        )
+        self.addCleanup(self.forget_package)
+        self.write_file('__init__.py', '')
+
+    def forget_package(self):
+        for name in list(sys.modules):
+            if name.split('.')[0] == self.package:
+                del sys.modules[name]
+        if self.top_level_dir in sys.path:
+            sys.path.remove(self.top_level_dir)
+
+    def write_file(self, name, source):
+        path = os.path.join(self.top_level_dir, self.package, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(dedent(source).replace('PACKAGE', self.package))
+
+    def discover(self, name=None):
+        return _discovery.discover_tests(
+            name or self.package,
+            self.top_level_dir,
+            self.index
+        )
+
+    def get_ids(self, suite):
+        return [t.id() for t in suite]
+
+
+class DiscoverTestsTests(_TemporaryPackageTestCase):
+
+    def get_unittest_ids(self):
+        suite = TestLoader().discover(
+            start_dir=self.package,
+            top_level_dir=self.top_level_dir
+        )
+        self.forget_package()
+        return [t.id() for t in _discovery.iterate_tests(suite)]
+
+    def test_finds_tests_in_unittest_discovery_order(self):
+        self.write_file('__init__.py', """\
+            import unittest
+
+            class PackageTests(unittest.TestCase):
+                def test_in_package(self):
+                    pass
+            """)
+        self.write_file('test_b.py', """\
+            from unittest import TestCase
+            from PACKAGE import PackageTests
+
+            class ZTests(PackageTests):
+                def test_z(self):
+                    pass
+
+            class ATests(TestCase):
+                def test_2(self):
+                    pass
+                def test_1(self):
+                    pass
+            """)
+        self.write_file('test_a.py', """\
+            from .test_b import ATests
+
+            class NotATest(object):
+                def test_nothing(self):
+                    pass
+            """)
+        self.write_file('helpers.py', """\
+            import unittest
+
+            class NotDiscovered(unittest.TestCase):
+                def test_hidden(self):
+                    pass
+            """)
+        self.write_file('sub/__init__.py', '')
+        self.write_file('sub/test_sub.py', """\
+            from ..test_b import ATests
+
+            class SubTests(ATests):
+                def test_3(self):
+                    pass
+            """)
+
+        ids = self.get_ids(self.discover())
+
+        self.assertThat(ids, Equals(self.get_unittest_ids()))
+
+    def test_does_not_import_test_modules(self):
+        self.write_file('test_module.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                def test_one(self):
+                    pass
+            """)
+
+        suite = self.discover()
+
+        self.assertThat(
+            self.get_ids(suite),
+            Equals(['%s.test_module.Tests.test_one' % self.package])
+        )
+        self.assertThat(
+            sys.modules,
+            Not(Contains('%s.test_module' % self.package))
+        )
+
+    def test_imports_module_with_missing_dependency(self):
+        self.write_file('test_module.py', """\
+            import unittest
+            import autopilot_no_such_module
+
+            class Tests(unittest.TestCase):
+                def test_one(self):
+                    pass
+            """)
+
+        ids = self.get_ids(self.discover())
+
+        self.assertThat(
+            ids,
+            Equals(['unittest.loader._FailedTest.%s.test_module'
+                    % self.package])
+        )
+
+    def test_imports_module_with_load_tests(self):
+        self.write_file('test_module.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                def test_one(self):
+                    pass
+
+            def load_tests(loader, tests, pattern):
+                return unittest.TestSuite()
+            """)
+
+        self.assertThat(self.get_ids(self.discover()), Equals([]))
+
+    def test_package_with_load_tests_cannot_be_indexed(self):
+        self.write_file('__init__.py', """\
+            def load_tests(loader, tests, pattern):
+                return tests
+            """)
+
+        self.assertThat(self.discover(), Equals(None))
+
+    def test_base_class_from_outside_the_tree_must_be_known(self):
+        self.write_file('test_module.py', """\
+            from some_library import SomeTestCase
+
+            class Tests(SomeTestCase):
+                def test_one(self):
+                    pass
+            """)
+
+        finder = _discovery._TestFinder(self.top_level_dir, self.index)
+        details = self.index.get_module_details(
+            os.path.join(self.top_level_dir, self.package, 'test_module.py')
+        )
+
+        with patch.object(_discovery, '_is_importable', return_value=True):
+            self.assertRaises(
+                _discovery._NeedsImport,
+                finder._get_indexed_module_tests,
+                self.package + '.test_module',
+                details
+            )
+
+    def test_module_name_discovers_containing_package(self):
+        self.write_file('test_one.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                def test_one(self):
+                    pass
+            """)
+        self.write_file('test_two.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                def test_two(self):
+                    pass
+            """)
+
+        ids = self.get_ids(self.discover(self.package + '.test_one'))
+
+        self.assertThat(ids, Equals([
+            '%s.test_one.Tests.test_one' % self.package,
+            '%s.test_two.Tests.test_two' % self.package,
+        ]))
+
+    def test_class_name_finds_tests_in_class(self):
+        self.write_file('test_module.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                def test_one(self):
+                    pass
+
+            class TestsTwo(unittest.TestCase):
+                def test_two(self):
+                    pass
+            """)
+
+        ids = self.get_ids(self.discover(self.package + '.test_module.Tests'))
+
+        self.assertThat(
+            ids,
+            Equals(['%s.test_module.Tests.test_one' % self.package])
+        )
+
+    def test_unknown_test_name_cannot_be_indexed(self):
+        self.write_file('test_module.py', '')
+
+        self.assertThat(
+            self.discover(self.package + '.test_module.NoSuchTests'),
+            Equals(None)
+        )
+
+    def test_name_outside_tree_cannot_be_indexed(self):
+        self.assertThat(self.discover('not_in_tree'), Equals(None))
+
+    def test_tests_have_scenarios(self):
+        self.write_file('test_module.py', """\
+            import unittest
+
+            class BaseTests(unittest.TestCase):
+                scenarios = [('one', {}), ('two', {})]
+
+            class Tests(BaseTests):
+                def test_one(self):
+                    pass
+            """)
+
+        test, = self.discover()
+
+        self.assertThat(test.scenarios, Equals(['one', 'two']))
+
+    def test_unknown_scenarios_are_loaded_from_module(self):
+        self.write_file('test_module.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                scenarios = [('s%d' % i, {}) for i in range(3)]
+                def test_one(self):
+                    pass
+            """)
+
+        test, = self.discover()
+
+        self.assertThat(test.scenarios, Equals([('s0', {}), ('s1', {}),
+                                                ('s2', {})]))
+
+    def test_tests_without_scenarios_have_none(self):
+        self.write_file('test_module.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                def test_one(self):
+                    pass
+            """)
+
+        test, = self.discover()
+
+        self.assertThat(test.scenarios, Equals(None))
+
+
+class LoadIndexedTestsTests(_TemporaryPackageTestCase):
+
+    def test_indexed_tests_are_replaced_by_real_tests(self):
+        self.write_file('test_module.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                def test_one(self):
+                    pass
+            """)
+        suite = self.discover()
+
+        loaded, = _discovery.load_indexed_tests(suite)
+
+        self.assertNotIsInstance(loaded, IndexedTest)
+        self.assertThat(
+            loaded.id(),
+            Equals('%s.test_module.Tests.test_one' % self.package)
+        )
+
+    def test_module_import_errors_are_reported_once(self):
+        self.write_file('test_module.py', """\
+            import unittest
+
+            class Tests(unittest.TestCase):
+                def test_one(self):
+                    pass
+                def test_two(self):
+                    pass
+            """)
+        suite = self.discover()
+        self.write_file('test_module.py', "raise ImportError()")
+
+        result = TestResult()
+        _discovery.load_indexed_tests(suite).run(result)
+
+        self.assertThat(result.testsRun, Equals(1))
+        self.assertThat(len(result.errors), Equals(1))
+
+    def test_tests_from_imported_modules_are_kept(self):
+        test = DiscoveryIndexTests('test_parses_module')
+
+        loaded, = _discovery.load_indexed_tests(TestSuite([test]))
+
+        self.assertIs(loaded, test)
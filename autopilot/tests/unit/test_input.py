@@ -724,7 +724,7 @@ class UInputTouchTestCase(UInputTouchBaseTestCase):
     def test_tap_must_put_finger_down_then_sleep_and_then_put_finger_up(self):
         expected_calls = [
             call.finger_down(0, 0),
-            call.sleep(ANY),
+            call.sleep(ANY, 'input delay'),
             call.finger_up()
         ]
 
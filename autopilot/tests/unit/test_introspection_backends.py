@@ -27,6 +27,7 @@ from autopilot.introspection import (
     backends,
     dbus,
 )
+from autopilot._timing import phase_timer
 
 
 class DBusAddressTests(TestCase):
@@ -293,6 +294,40 @@ class BackendTests(TestCase):
 
         self.assertRaises(Exception, backend.execute_query_get_data, query)
 
+    def test_records_query_and_payload_size_when_recording_operations(self):
+        self.addCleanup(setattr, phase_timer, 'recording_operations', False)
+        self.addCleanup(phase_timer.reset)
+        phase_timer.reset()
+        phase_timer.recording_operations = True
+        query = xpathselect.Query.root('foo')
+        fake_dbus_address = Mock()
+        fake_dbus_address.introspection_iface.GetState.return_value = [
+            (b'/root/path', {'id': 1})
+        ]
+        backend = backends.Backend(fake_dbus_address)
+        backend.execute_query_get_data(query)
+
+        [operation] = phase_timer.get_operations()
+        self.assertThat(
+            (operation.phase, operation.description, operation.size),
+            Equals(('dbus', repr(query), 20))
+        )
+
+
+class PayloadSizeTests(TestCase):
+
+    def test_size_of_strings_is_their_encoded_length(self):
+        self.assertThat(backends._get_payload_size('caf\xe9'), Equals(5))
+
+    def test_size_of_bytes_is_their_length(self):
+        self.assertThat(backends._get_payload_size(b'/root'), Equals(5))
+
+    def test_size_of_containers_adds_up_contents(self):
+        self.assertThat(
+            backends._get_payload_size([(b'/a', {'id': [1, True]})]),
+            Equals(2 + 2 + 8 + 4)
+        )
+
 
 class MakeIntrospectionObjectTests(TestCase):
 
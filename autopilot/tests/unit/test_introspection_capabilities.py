@@ -0,0 +1,114 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from testtools import TestCase
+from testtools.matchers import Equals, Is
+
+from autopilot.introspection import _capabilities
+from autopilot.introspection.constants import (
+    AP_INTROSPECTION_IFACE,
+    QT_AUTOPILOT_IFACE,
+)
+
+
+fake_xml = """
+    <!DOCTYPE node PUBLIC
+        "-//freedesktop//DTD D-BUS Object Introspection 1.0//EN"
+        "http://www.freedesktop.org/standards/dbus/1.0/introspect.dtd">
+    <node>
+        <interface name="com.canonical.Autopilot.Introspection">
+            <method name='GetState'>
+                <arg type='s' name='piece' direction='in' />
+                <arg type='a(sv)' name='state' direction='out' />
+            </method>
+            <method name='GetVersion'>
+                <arg type='s' name='version' direction='out' />
+            </method>
+        </interface>
+        <interface name="com.canonical.Autopilot.Qt">
+            <method name='ListSignals'>
+                <arg type='i' name='object_id' direction='in' />
+                <arg type='as' name='signals' direction='out' />
+            </method>
+        </interface>
+    </node>
+"""
+
+
+class BackendCapabilitiesTests(TestCase):
+
+    def test_parses_interfaces(self):
+        capabilities = _capabilities.BackendCapabilities.\
+            from_introspection_xml(fake_xml)
+        self.assertThat(
+            capabilities.interfaces,
+            Equals({AP_INTROSPECTION_IFACE, QT_AUTOPILOT_IFACE})
+        )
+
+    def test_parses_methods(self):
+        capabilities = _capabilities.BackendCapabilities.\
+            from_introspection_xml(fake_xml)
+        self.assertTrue(
+            capabilities.has_method(AP_INTROSPECTION_IFACE, 'GetVersion')
+        )
+        self.assertFalse(
+            capabilities.has_method(AP_INTROSPECTION_IFACE, 'ListSignals')
+        )
+
+    def test_extensions_contains_qt_interface(self):
+        capabilities = _capabilities.BackendCapabilities.\
+            from_introspection_xml(fake_xml)
+        self.assertThat(capabilities.extensions, Equals({QT_AUTOPILOT_IFACE}))
+
+    def test_invalid_xml_has_no_interfaces(self):
+        capabilities = _capabilities.BackendCapabilities.\
+            from_introspection_xml("")
+        self.assertFalse(capabilities.has_autopilot_interface())
+        self.assertThat(capabilities.interfaces, Equals(frozenset()))
+
+
+class CapabilitiesCacheTests(TestCase):
+
+    def test_get_returns_None_for_unknown_address(self):
+        cache = _capabilities._CapabilitiesCache()
+        self.assertThat(cache.get('address', '1.4'), Is(None))
+
+    def test_get_is_keyed_on_version(self):
+        cache = _capabilities._CapabilitiesCache()
+        capabilities = _capabilities.BackendCapabilities({})
+        cache.add('address', '1.4', capabilities)
+
+        self.assertThat(cache.get('address', '1.4'), Is(capabilities))
+        self.assertThat(cache.get('address', '1.3'), Is(None))
+
+    def test_get_latest_returns_most_recent_version(self):
+        cache = _capabilities._CapabilitiesCache()
+        old = _capabilities.BackendCapabilities({})
+        new = _capabilities.BackendCapabilities({AP_INTROSPECTION_IFACE: []})
+        cache.add('address', '1.3', old)
+        cache.add('address', '1.4', new)
+
+        self.assertThat(cache.get_latest('address'), Is(new))
+
+    def test_reset_cache_forgets_addresses(self):
+        cache = _capabilities._CapabilitiesCache()
+        cache.add('address', '1.4', _capabilities.BackendCapabilities({}))
+        cache.reset_cache()
+
+        self.assertFalse(cache.has_address('address'))
@@ -36,7 +36,12 @@ from autopilot.utilities import sleep
 from autopilot.introspection import _search as _s
 
 from autopilot.introspection import CustomEmulatorBase
+from autopilot.introspection._capabilities import (
+    BackendCapabilities,
+    capabilities_cache,
+)
 from autopilot.introspection.constants import AUTOPILOT_PATH
+from autopilot.process._tree import ProcessTree
 
 
 def ListContainsOnly(value_list):
@@ -406,6 +411,47 @@ class ConnectionHasPidTests(TestCase):
                 _s.ConnectionHasPid.matches(dbus_tuple, params)
             )
 
+    def test_returns_True_when_bus_pid_is_a_child_pid(self):
+        self.addCleanup(_s._get_child_pids.reset_cache)
+        tree = ProcessTree({123: (1, 'parent'), 456: (123, 'child')})
+        dbus_tuple = ("bus", "org.freedesktop.DBus")
+        with patch.object(_s, 'get_process_tree', return_value=tree):
+            with patch.object(
+                _s,
+                '_get_bus_connections_pid',
+                return_value=456
+            ):
+                self.assertTrue(
+                    _s.ConnectionHasPid.matches(dbus_tuple, dict(pid=123))
+                )
+
+
+class GetChildPidsTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(_s._get_child_pids.reset_cache)
+        _s._get_child_pids.reset_cache()
+
+    def test_results_are_cached_per_parent_pid(self):
+        tree = ProcessTree({
+            10: (1, 'a'), 11: (10, 'b'), 20: (1, 'c'), 21: (20, 'd'),
+        })
+        with patch.object(_s, 'get_process_tree', return_value=tree) as gpt:
+            self.assertEqual(_s._get_child_pids(10), {11})
+            self.assertEqual(_s._get_child_pids(20), {21})
+            self.assertEqual(_s._get_child_pids(10), {11})
+        self.assertEqual(gpt.call_count, 2)
+
+    def test_reset_cache_gets_fresh_values(self):
+        old_tree = ProcessTree({10: (1, 'a')})
+        new_tree = ProcessTree({10: (1, 'a'), 11: (10, 'b')})
+        with patch.object(_s, 'get_process_tree', return_value=old_tree):
+            self.assertEqual(_s._get_child_pids(10), set())
+        _s._get_child_pids.reset_cache()
+        with patch.object(_s, 'get_process_tree', return_value=new_tree):
+            self.assertEqual(_s._get_child_pids(10), {11})
+
 
 class ConnectionIsNotOrgFreedesktopDBusTests(TestCase):
 
@@ -809,6 +855,229 @@ class ProxyObjectTests(TestCase):
 
                 dedupe.assert_called_once_with(["conn1"], bus)
 
+    def test_find_matching_connections_uses_connection_watcher_names(self):
+        bus = ProxyObjectTests.FMCTest()
+        watcher = Mock()
+        watcher.get_connection_names.return_value = ["conn2"]
+        connection_matcher = Mock(return_value=True)
+
+        with patch.object(_s, '_dedupe_connections_on_pid') as dedupe:
+            _s._find_matching_connections(
+                bus,
+                connection_matcher,
+                connection_watcher=watcher
+            )
+
+            connection_matcher.assert_called_once_with((bus, "conn2"))
+            dedupe.assert_called_once_with(["conn2"], bus)
+
+    def test_find_matching_connections_waits_on_connection_watcher(self):
+        bus = ProxyObjectTests.FMCTest()
+        watcher = Mock()
+        watcher.get_connection_names.side_effect = [[], ["conn2"]]
+
+        with patch.object(_s, '_dedupe_connections_on_pid'):
+            _s._find_matching_connections(
+                bus,
+                lambda *args: True,
+                connection_watcher=watcher
+            )
+
+        self.assertThat(watcher.wait_for_connection.call_count, Equals(1))
+
+
+class ConnectionPidsTests(TestCase):
+
+    def test_get_pid_fetches_all_scanned_connections_in_one_batch(self):
+        pid_index = _s._cached_get_connection_pids()
+        bus = Mock()
+        pid_index.reset_cache(bus, ['conn1', 'conn2'])
+        with patch.object(
+            _s,
+            '_get_bus_connections_pids',
+            return_value={'conn1': 123, 'conn2': 456}
+        ) as get_pids:
+            self.assertThat(pid_index.get_pid(bus, 'conn1'), Equals(123))
+            self.assertThat(pid_index.get_pid(bus, 'conn2'), Equals(456))
+            get_pids.assert_called_once_with(
+                bus,
+                frozenset(['conn1', 'conn2'])
+            )
+
+    def test_get_pid_raises_recorded_exception(self):
+        pid_index = _s._cached_get_connection_pids()
+        bus = Mock()
+        pid_index.reset_cache(bus, ['conn1'])
+        with patch.object(
+            _s,
+            '_get_bus_connections_pids',
+            return_value={'conn1': DBusException()}
+        ):
+            self.assertThat(
+                lambda: pid_index.get_pid(bus, 'conn1'),
+                raises(DBusException)
+            )
+
+    def test_get_pid_looks_up_unscanned_connections_directly(self):
+        pid_index = _s._cached_get_connection_pids()
+        bus = Mock()
+        pid_index.reset_cache(bus, ['conn1'])
+        with patch.object(
+            _s, '_get_bus_connections_pid', return_value=789
+        ) as get_pid:
+            self.assertThat(pid_index.get_pid(bus, 'conn2'), Equals(789))
+            get_pid.assert_called_once_with(bus, 'conn2')
+
+    def test_dedupe_connections_on_pid_keeps_first_connection(self):
+        bus = Mock()
+        pids = {'conn1': 123, 'conn2': 123, 'conn3': 456}
+        with patch.object(_s, '_connection_pids') as pid_index:
+            pid_index.get_pid.side_effect = lambda b, c: pids[c]
+            self.assertThat(
+                _s._dedupe_connections_on_pid(
+                    ['conn1', 'conn2', 'conn3'],
+                    bus
+                ),
+                Equals(['conn1', 'conn3'])
+            )
+
+
+class NewConnectionWatcherTests(TestCase):
+
+    def test_get_new_connection_watcher_returns_None_on_dbus_error(self):
+        with patch.object(
+            _s, '_get_dbus_bus_from_string', side_effect=DBusException()
+        ):
+            self.assertThat(_s.get_new_connection_watcher(), Equals(None))
+
+    def test_subscribes_to_name_owner_changed(self):
+        bus = Mock()
+        watcher = _s._NewConnectionWatcher(bus)
+        bus.add_signal_receiver.assert_called_once_with(
+            watcher._on_name_owner_changed,
+            signal_name='NameOwnerChanged',
+            dbus_interface='org.freedesktop.DBus',
+            bus_name='org.freedesktop.DBus',
+        )
+
+    def test_records_new_connections(self):
+        watcher = _s._NewConnectionWatcher(Mock())
+        watcher._on_name_owner_changed(':1.42', '', ':1.42')
+        watcher._on_name_owner_changed('com.example.App', '', ':1.42')
+
+        with patch.object(_s, '_dispatch_pending_glib_events'):
+            self.assertThat(
+                watcher.get_connection_names(),
+                Equals([':1.42', 'com.example.App'])
+            )
+
+    def test_forgets_connections_that_go_away(self):
+        watcher = _s._NewConnectionWatcher(Mock())
+        watcher._on_name_owner_changed(':1.42', '', ':1.42')
+        watcher._on_name_owner_changed(':1.42', ':1.42', '')
+
+        with patch.object(_s, '_dispatch_pending_glib_events'):
+            self.assertThat(watcher.get_connection_names(), Equals([]))
+
+    def test_stop_removes_signal_receiver(self):
+        bus = Mock()
+        watcher = _s._NewConnectionWatcher(bus)
+        watcher.stop()
+        bus.add_signal_receiver.return_value.remove.assert_called_once_with()
+
+
+class RootIntrospectionDetailsTests(TestCase):
+
+    fake_xml = (
+        '<node><interface name="com.canonical.Autopilot.Introspection">'
+        '<method name="GetState"/></interface></node>'
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(capabilities_cache.reset_cache)
+
+    def get_fake_address(self, xml=fake_xml, version='1.4', state=('/a', {})):
+        address = Mock()
+        address.dbus_introspection_iface.Introspect.side_effect = \
+            lambda reply_handler, error_handler: reply_handler(xml)
+        iface = address.unchecked_introspection_iface
+        if version is None:
+            iface.GetVersion.side_effect = \
+                lambda reply_handler, error_handler: error_handler(
+                    DBusException())
+        else:
+            iface.GetVersion.side_effect = \
+                lambda reply_handler, error_handler: reply_handler(version)
+        iface.GetState.side_effect = \
+            lambda query, reply_handler, error_handler: reply_handler([state])
+        return address
+
+    def test_returns_capabilities_version_and_root_state(self):
+        address = self.get_fake_address()
+        self.assertThat(
+            _s._get_root_introspection_details(address),
+            Equals((
+                BackendCapabilities.from_introspection_xml(self.fake_xml),
+                '1.4',
+                ('/a', {}),
+            ))
+        )
+
+    def test_caches_capabilities_per_address_and_version(self):
+        address = self.get_fake_address()
+        capabilities, _, _ = _s._get_root_introspection_details(address)
+        self.assertThat(
+            capabilities_cache.get(address, '1.4'),
+            Equals(capabilities)
+        )
+
+    def test_skips_introspect_call_for_known_address(self):
+        address = self.get_fake_address()
+        _s._get_root_introspection_details(address)
+        _s._get_root_introspection_details(address)
+        self.assertThat(
+            address.dbus_introspection_iface.Introspect.call_count,
+            Equals(1)
+        )
+
+    def test_introspects_again_when_version_changes(self):
+        address = self.get_fake_address()
+        _s._get_root_introspection_details(address)
+        address.unchecked_introspection_iface.GetVersion.side_effect = \
+            lambda reply_handler, error_handler: reply_handler('1.5')
+        address.dbus_introspection_iface.Introspect.side_effect = None
+        address.dbus_introspection_iface.Introspect.return_value = \
+            self.fake_xml
+
+        _s._get_root_introspection_details(address)
+
+        self.assertThat(
+            capabilities_cache.get(address, '1.5'),
+            Equals(BackendCapabilities.from_introspection_xml(self.fake_xml))
+        )
+
+    def test_issues_state_query_for_root(self):
+        address = self.get_fake_address()
+        _s._get_root_introspection_details(address)
+        iface = address.unchecked_introspection_iface
+        self.assertThat(iface.GetState.call_args[0], Equals(('/',)))
+
+    def test_defaults_to_old_version_when_GetVersion_fails(self):
+        address = self.get_fake_address(version=None)
+        xml, version, state = _s._get_root_introspection_details(address)
+        self.assertThat(version, Equals('1.2'))
+
+    def test_raises_when_GetState_fails(self):
+        address = self.get_fake_address()
+        error = DBusException()
+        address.unchecked_introspection_iface.GetState.side_effect = \
+            lambda query, reply_handler, error_handler: error_handler(error)
+        self.assertThat(
+            lambda: _s._get_root_introspection_details(address),
+            raises(DBusException)
+        )
+
 
 class ActualBaseClassTests(TestCase):
 
@@ -17,10 +17,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+from dbus import DBusException
 from testtools import TestCase
+from testtools.matchers import Equals, IsInstance
+from unittest.mock import Mock, patch
 
+from autopilot.introspection import utilities
 from autopilot.introspection.dbus import raises
 from autopilot.introspection.utilities import process_util, sort_by_keys
+from autopilot.process._tree import ProcessTree
 from autopilot.tests.unit.introspection_base import (
     get_mock_object,
     get_global_rect,
@@ -85,6 +90,32 @@ class ProcessUtilitiesTestCase(TestCase):
                 PROCESS_NAME
             )
 
+    def test_uses_process_tree_when_not_mocked(self):
+        tree = ProcessTree({1: (0, 'init'), 42: (1, PROCESS_NAME)})
+        with patch.object(
+            utilities,
+            'get_process_tree',
+            return_value=tree
+        ):
+            self.assertThat(
+                process_util.get_pid_for_process(PROCESS_NAME),
+                Equals(42)
+            )
+
+    def test_rescans_process_tree_before_giving_up(self):
+        stale_tree = ProcessTree({1: (0, 'init')})
+        fresh_tree = ProcessTree({1: (0, 'init'), 42: (1, PROCESS_NAME)})
+        with patch.object(
+            utilities,
+            'get_process_tree',
+            side_effect=[stale_tree, fresh_tree]
+        ) as get_process_tree:
+            self.assertThat(
+                process_util.get_pid_for_process(PROCESS_NAME),
+                Equals(42)
+            )
+        get_process_tree.assert_called_with(max_age=0)
+
 
 class SortByKeysTests(TestCase):
     def _get_root_property_from_object_list(self, objects, prop):
@@ -180,3 +211,77 @@ class SortByKeysTests(TestCase):
         obj = [get_mock_object()]
         output = sort_by_keys(obj, ['x'])
         self.assertEqual(output, obj)
+
+
+class GetBusConnectionsPidsTestCase(TestCase):
+
+    def get_fake_bus(self, credentials):
+        def get_credentials(name, reply_handler, error_handler):
+            result = credentials[name]
+            if isinstance(result, Exception):
+                error_handler(result)
+            else:
+                reply_handler(result)
+
+        bus = Mock()
+        bus_iface = Mock()
+        bus_iface.GetConnectionCredentials.side_effect = get_credentials
+        return bus, bus_iface
+
+    def test_returns_empty_dict_for_no_names(self):
+        self.assertThat(
+            utilities._get_bus_connections_pids(Mock(), []),
+            Equals({})
+        )
+
+    def test_returns_pid_for_each_name(self):
+        bus, bus_iface = self.get_fake_bus({
+            ':1.1': {'ProcessID': 123},
+            ':1.2': {'ProcessID': 456},
+        })
+        with patch.object(
+            utilities, '_get_bus_iface', return_value=bus_iface
+        ):
+            self.assertThat(
+                utilities._get_bus_connections_pids(bus, [':1.1', ':1.2']),
+                Equals({':1.1': 123, ':1.2': 456})
+            )
+
+    def test_makes_one_call_per_name(self):
+        bus, bus_iface = self.get_fake_bus({':1.1': {'ProcessID': 123}})
+        with patch.object(
+            utilities, '_get_bus_iface', return_value=bus_iface
+        ):
+            utilities._get_bus_connections_pids(bus, [':1.1', ':1.1'])
+        self.assertThat(
+            bus_iface.GetConnectionCredentials.call_count,
+            Equals(1)
+        )
+
+    def test_returns_exception_for_failed_lookup(self):
+        bus, bus_iface = self.get_fake_bus({':1.1': DBusException()})
+        with patch.object(
+            utilities, '_get_bus_iface', return_value=bus_iface
+        ):
+            result = utilities._get_bus_connections_pids(bus, [':1.1'])
+        self.assertThat(result[':1.1'], IsInstance(DBusException))
+
+    def test_returns_exception_when_credentials_lack_pid(self):
+        bus, bus_iface = self.get_fake_bus({':1.1': {}})
+        with patch.object(
+            utilities, '_get_bus_iface', return_value=bus_iface
+        ):
+            result = utilities._get_bus_connections_pids(bus, [':1.1'])
+        self.assertThat(result[':1.1'], IsInstance(DBusException))
+
+    def test_falls_back_to_unix_process_id_on_old_daemons(self):
+        error = DBusException(
+            name='org.freedesktop.DBus.Error.UnknownMethod'
+        )
+        bus, bus_iface = self.get_fake_bus({':1.1': error})
+        bus_iface.GetConnectionUnixProcessID.return_value = 123
+        with patch.object(
+            utilities, '_get_bus_iface', return_value=bus_iface
+        ):
+            result = utilities._get_bus_connections_pids(bus, [':1.1'])
+        self.assertThat(result, Equals({':1.1': 123}))
@@ -0,0 +1,161 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from datetime import datetime, timedelta, timezone
+import os
+import tempfile
+from textwrap import dedent
+
+from subunit import StreamResultToBytes
+from testtools import TestCase, TestResult
+from testtools.matchers import Equals, raises
+
+from autopilot import _merge
+
+
+START = datetime(2017, 1, 1, tzinfo=timezone.utc)
+
+
+class MergeResultsTests(TestCase):
+
+    def write_file(self, data):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as results_file:
+            results_file.write(data)
+        return path
+
+    def write_subunit(self, *runs):
+        """Write a subunit file of (test id, status, duration) runs."""
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        time = START
+        with os.fdopen(fd, 'wb') as results_file:
+            stream = StreamResultToBytes(results_file)
+            for test_id, test_status, duration in runs:
+                stream.status(
+                    test_id=test_id, test_status='inprogress', timestamp=time)
+                time += timedelta(seconds=duration)
+                stream.status(
+                    test_id=test_id, test_status=test_status, timestamp=time)
+        return path
+
+    def merge(self, *paths):
+        result = TestResult()
+        _merge.merge_results(paths, result)
+        return result
+
+    def test_reports_tests_from_all_files(self):
+        result = self.merge(
+            self.write_subunit(('foo.test_a', 'success', 1)),
+            self.write_subunit(('foo.test_b', 'fail', 1)),
+        )
+
+        self.assertThat(result.testsRun, Equals(2))
+        self.assertThat(len(result.failures), Equals(1))
+
+    def test_reports_last_run_of_rerun_test(self):
+        result = self.merge(
+            self.write_subunit(('foo.test_a', 'fail', 1)),
+            self.write_subunit(('foo.test_a', 'success', 1)),
+        )
+
+        self.assertThat(result.testsRun, Equals(1))
+        self.assertTrue(result.wasSuccessful())
+
+    def test_reports_last_run_of_test_rerun_in_same_file(self):
+        result = self.merge(
+            self.write_subunit(
+                ('foo.test_a', 'success', 1),
+                ('foo.test_a', 'fail', 1),
+            )
+        )
+
+        self.assertThat(result.testsRun, Equals(1))
+        self.assertFalse(result.wasSuccessful())
+
+    def test_keeps_test_durations(self):
+        durations = []
+
+        class DurationResult(TestResult):
+            def startTest(self, test):
+                super().startTest(test)
+                self.started = self._now()
+
+            def stopTest(self, test):
+                durations.append(self._now() - self.started)
+                super().stopTest(test)
+
+        _merge.merge_results(
+            [self.write_subunit(('foo.test_a', 'success', 3))],
+            DurationResult()
+        )
+
+        self.assertThat(durations, Equals([timedelta(seconds=3)]))
+
+    def test_reads_junit_xml(self):
+        path = self.write_file(dedent('''\
+            <testsuite errors="0" failures="1" name="" tests="3" time="3.0">
+            <testcase classname="foo.Tests" name="test_a" time="1.0"/>
+            <testcase classname="foo.Tests" name="test_b" time="1.0">
+            <failure type="AssertionError">Traceback</failure>
+            </testcase>
+            <testcase classname="foo.Tests" name="test_c" time="1.0">
+            <skip>Not today</skip>
+            </testcase>
+            </testsuite>
+            ''').encode())
+
+        result = self.merge(path)
+
+        self.assertThat(result.testsRun, Equals(3))
+        self.assertThat(
+            [t.id() for t, _ in result.failures],
+            Equals(['foo.Tests.test_b'])
+        )
+        self.assertThat(list(result.skip_reasons), Equals(['Not today']))
+
+    def test_raises_on_unknown_format(self):
+        path = self.write_file(b'Ran 1 test in 0.1s\n')
+
+        self.assertThat(
+            lambda: self.merge(path),
+            raises(ValueError(
+                "%s is not a subunit or JUnit XML results file." % path
+            ))
+        )
+
+
+class GetResultsFormatTests(TestCase):
+
+    def get_format(self, data):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as results_file:
+            results_file.write(data)
+        return _merge.get_results_format(path)
+
+    def test_subunit(self):
+        self.assertThat(self.get_format(b'\xb3\x29\x01'), Equals('subunit'))
+
+    def test_xml(self):
+        self.assertThat(
+            self.get_format(b'<?xml version="1.0"?>\n<testsuite/>'),
+            Equals('xml')
+        )
@@ -0,0 +1,210 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+from unittest.mock import Mock
+
+from fixtures import TempDir
+from testtools import TestCase
+from testtools.matchers import Equals
+
+from autopilot import _ordering
+from autopilot._timing import LastRun, TimingDatabase
+
+
+class _FakeHistory(object):
+
+    def __init__(self, durations=None, last_runs=None, mtimes=None):
+        self._durations = durations or {}
+        self._last_runs = last_runs or {}
+        self._mtimes = mtimes or {}
+
+    def get_duration(self, test):
+        return self._durations.get(test.id())
+
+    def get_last_run(self, test):
+        return self._last_runs.get(test.id())
+
+    def get_module_mtime(self, test):
+        return self._mtimes.get(test.id())
+
+
+def _make_tests(*test_ids):
+    tests = []
+    for test_id in test_ids:
+        test = Mock()
+        test.id.return_value = test_id
+        tests.append(test)
+    return tests
+
+
+def _get_ids(tests):
+    return [t.id() for t in tests]
+
+
+class OrderingTests(TestCase):
+
+    def order(self, ordering, history, *test_ids):
+        order = _ordering.get_test_orderings()[ordering]
+        return _get_ids(order(_make_tests(*test_ids), history))
+
+    def test_failed_first_runs_failures_first_quickest_first(self):
+        history = _FakeHistory(
+            durations={'slow_fail': 9.0, 'quick_fail': 1.0},
+            last_runs={
+                'pass': LastRun(False, 1),
+                'slow_fail': LastRun(True, 1),
+                'quick_fail': LastRun(True, 1),
+            }
+        )
+
+        self.assertThat(
+            self.order(
+                'failed-first', history,
+                'new', 'pass', 'slow_fail', 'quick_fail'
+            ),
+            Equals(['quick_fail', 'slow_fail', 'new', 'pass'])
+        )
+
+    def test_slowest_first_runs_tests_without_durations_first(self):
+        history = _FakeHistory(durations={'a': 1.0, 'b': 3.0, 'c': 2.0})
+
+        self.assertThat(
+            self.order('slowest-first', history, 'a', 'b', 'new', 'c'),
+            Equals(['new', 'b', 'c', 'a'])
+        )
+
+    def test_fastest_first_runs_tests_without_durations_last(self):
+        history = _FakeHistory(durations={'a': 1.0, 'b': 3.0, 'c': 2.0})
+
+        self.assertThat(
+            self.order('fastest-first', history, 'new', 'b', 'a', 'c'),
+            Equals(['a', 'c', 'b', 'new'])
+        )
+
+    def test_changed_first_runs_most_recently_changed_first(self):
+        history = _FakeHistory(
+            last_runs={
+                'unchanged': LastRun(False, 100),
+                'changed': LastRun(False, 100),
+                'changed_later': LastRun(False, 100),
+            },
+            mtimes={
+                'unchanged': 50,
+                'changed': 150,
+                'changed_later': 200,
+            }
+        )
+
+        self.assertThat(
+            self.order(
+                'changed-first', history,
+                'unchanged', 'changed', 'changed_later'
+            ),
+            Equals(['changed_later', 'changed', 'unchanged'])
+        )
+
+    def test_changed_first_counts_tests_that_never_ran_as_changed(self):
+        history = _FakeHistory(
+            last_runs={'old': LastRun(False, 100)},
+            mtimes={'old': 50, 'new': 50}
+        )
+
+        self.assertThat(
+            self.order('changed-first', history, 'old', 'new'),
+            Equals(['new', 'old'])
+        )
+
+    def test_orderings_keep_discovery_order_of_equal_tests(self):
+        for ordering in _ordering.get_test_orderings():
+            self.assertThat(
+                self.order(ordering, _FakeHistory(), 'c', 'a', 'b'),
+                Equals(['c', 'a', 'b'])
+            )
+
+
+class TestHistoryTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = self.useFixture(TempDir()).path
+        self.database_path = os.path.join(self.directory, 'timings.sqlite')
+
+    def test_reads_durations_and_outcomes_from_timing_database(self):
+        with TimingDatabase(self.database_path) as database:
+            database.record('foo.test_a(one)', {'total': 2.0}, 'fail', 5)
+        test, = _make_tests('foo.test_a')
+
+        history = _ordering.TestHistory(self.database_path)
+
+        self.assertThat(history.get_duration(test), Equals(2.0))
+        self.assertThat(history.get_last_run(test), Equals(LastRun(True, 5)))
+
+    def test_unrecorded_test_has_no_history(self):
+        test, = _make_tests('foo.test_a')
+
+        history = _ordering.TestHistory(self.database_path)
+
+        self.assertThat(history.get_duration(test), Equals(None))
+        self.assertThat(history.get_last_run(test), Equals(None))
+
+    def test_module_mtime_of_imported_test(self):
+        history = _ordering.TestHistory(self.database_path)
+
+        self.assertThat(
+            history.get_module_mtime(self),
+            Equals(os.stat(__file__).st_mtime)
+        )
+
+    def test_module_mtime_of_test_that_knows_its_module_path(self):
+        test, = _make_tests('foo.test_a')
+        test.module_path = self.database_path
+        with open(self.database_path, 'w'):
+            pass
+        os.utime(self.database_path, (42, 42))
+
+        history = _ordering.TestHistory(self.database_path)
+
+        self.assertThat(history.get_module_mtime(test), Equals(42))
+
+    def test_module_mtime_of_missing_module(self):
+        test, = _make_tests('foo.test_a')
+        test.module_path = os.path.join(self.directory, 'missing.py')
+
+        history = _ordering.TestHistory(self.database_path)
+
+        self.assertThat(history.get_module_mtime(test), Equals(None))
+
+
+class OrderTestsTests(TestCase):
+
+    def test_orders_tests_using_timing_database(self):
+        directory = self.useFixture(TempDir()).path
+        path = os.path.join(directory, 'timings.sqlite')
+        with TimingDatabase(path) as database:
+            database.record('test_a', {'total': 1.0})
+            database.record('test_b', {'total': 2.0})
+
+        ordered = _ordering.order_tests(
+            _make_tests('test_a', 'test_b'),
+            'slowest-first',
+            path
+        )
+
+        self.assertThat(_get_ids(ordered), Equals(['test_b', 'test_a']))
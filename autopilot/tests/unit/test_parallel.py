@@ -0,0 +1,397 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from io import BytesIO
+import os
+import sys
+from textwrap import dedent
+import unittest
+from unittest.mock import Mock, patch
+
+from fixtures import FakeLogger
+from subunit import ByteStreamToStreamResult
+from testscenarios import WithScenarios
+from testtools import StreamResult, TestCase, TestResult
+from testtools.matchers import Equals, raises
+
+from autopilot import _parallel
+
+
+class _RecordingStreamResult(StreamResult):
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def status(self, **kwargs):
+        self.events.append(kwargs)
+
+
+def _parse_worker_output(output):
+    recorded = _RecordingStreamResult()
+    ByteStreamToStreamResult(BytesIO(output)).run(recorded)
+    return recorded.events
+
+
+def _example_tests():
+    """Return a passing and a failing test, keyed by name.
+
+    The test case class is created here, rather than at module level, so
+    that the test loader doesn't pick up its deliberately failing test.
+
+    """
+    class ExampleTests(unittest.TestCase):
+
+        def test_passes(self):
+            pass
+
+        def test_fails(self):
+            self.fail("failed")
+
+    return {
+        'passes': ExampleTests('test_passes'),
+        'fails': ExampleTests('test_fails'),
+    }
+
+
+# A worker that runs example tests without needing a sandbox, or
+# any of the autopilot test loading machinery.
+_WORKER_SCRIPT = dedent("""\
+    import unittest
+    from autopilot._parallel import run_worker
+
+    class Tests(unittest.TestCase):
+        def test_one(self):
+            pass
+        def test_two(self):
+            pass
+        def test_three(self):
+            self.fail("failed")
+
+    run_worker(unittest.defaultTestLoader.loadTestsFromTestCase(Tests))
+""")
+
+
+class _FakeSandbox(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def get_environment(self):
+        return dict(os.environ)
+
+
+class RunWorkerTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tests = _example_tests()
+
+    def run_worker(self, test_ids):
+        input_stream = BytesIO(
+            b''.join(test_id.encode() + b'\n' for test_id in test_ids)
+        )
+        output_stream = BytesIO()
+        _parallel.run_worker(
+            unittest.TestSuite(self.tests.values()),
+            input_stream,
+            output_stream
+        )
+        return _parse_worker_output(output_stream.getvalue())
+
+    def get_final_statuses(self, events):
+        return [
+            (e['test_id'], e['test_status']) for e in events
+            if e.get('test_status') not in (None, 'inprogress', 'exists')
+        ]
+
+    def test_runs_only_requested_tests(self):
+        passes_id = self.tests['passes'].id()
+        events = self.run_worker([passes_id])
+        self.assertThat(
+            self.get_final_statuses(events),
+            Equals([(passes_id, 'success')])
+        )
+
+    def test_reports_failures(self):
+        fails_id = self.tests['fails'].id()
+        events = self.run_worker([fails_id])
+        self.assertThat(
+            self.get_final_statuses(events),
+            Equals([(fails_id, 'fail')])
+        )
+
+    def test_sends_ready_marker_after_each_test(self):
+        test_ids = [
+            self.tests['passes'].id(),
+            self.tests['fails'].id(),
+        ]
+        events = self.run_worker(test_ids)
+        ready_markers = [
+            bytes(e['file_bytes']).decode() for e in events
+            if e.get('file_name') == _parallel.WORKER_READY_FILE_NAME
+        ]
+        self.assertThat(ready_markers, Equals(test_ids))
+
+    def test_ready_marker_follows_test_result(self):
+        passes_id = self.tests['passes'].id()
+        events = self.run_worker([passes_id])
+        self.assertThat(
+            events[-1]['file_name'],
+            Equals(_parallel.WORKER_READY_FILE_NAME)
+        )
+
+    def test_reports_unknown_test_as_failure(self):
+        events = self.run_worker(['no.such.test'])
+        self.assertThat(
+            self.get_final_statuses(events),
+            Equals([('no.such.test', 'fail')])
+        )
+
+    def test_runs_requested_scenario(self):
+        class ScenarioTests(WithScenarios, unittest.TestCase):
+            scenarios = [('one', {}), ('two', {})]
+
+            def test_scenario(self):
+                pass
+
+        self.tests['scenarios'] = ScenarioTests('test_scenario')
+        scenario_id = self.tests['scenarios'].id() + '(two)'
+
+        events = self.run_worker([scenario_id])
+
+        self.assertThat(
+            self.get_final_statuses(events),
+            Equals([(scenario_id, 'success')])
+        )
+
+    def test_stops_at_blank_line(self):
+        events = self.run_worker(['', self.tests['passes'].id()])
+        self.assertThat(self.get_final_statuses(events), Equals([]))
+
+    def test_reports_to_decorated_result(self):
+        decorated = TestResult()
+        passes_id = self.tests['passes'].id()
+
+        _parallel.run_worker(
+            unittest.TestSuite(self.tests.values()),
+            BytesIO(passes_id.encode() + b'\n'),
+            BytesIO(),
+            decorate_result=lambda result: decorated
+        )
+
+        self.assertThat(decorated.testsRun, Equals(1))
+
+
+class WorkerStreamResultTests(TestCase):
+
+    def test_forwards_test_status(self):
+        target = _RecordingStreamResult()
+        on_ready = Mock()
+        result = _parallel._WorkerStreamResult(target, on_ready)
+
+        result.status(test_id='foo', test_status='success')
+
+        self.assertThat(
+            target.events,
+            Equals([dict(test_id='foo', test_status='success')])
+        )
+        self.assertFalse(on_ready.called)
+
+    def test_ready_marker_is_not_forwarded(self):
+        target = _RecordingStreamResult()
+        on_ready = Mock()
+        result = _parallel._WorkerStreamResult(target, on_ready)
+
+        result.status(
+            file_name=_parallel.WORKER_READY_FILE_NAME,
+            file_bytes=b'foo',
+        )
+
+        self.assertThat(target.events, Equals([]))
+        on_ready.assert_called_once_with()
+
+
+class RunTestsInSandboxesTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name, value in (
+            ('check_sandbox_requirements', Mock()),
+            ('Sandbox', _FakeSandbox),
+        ):
+            patcher = patch.object(_parallel, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def make_suite(self, *test_names):
+        suite = unittest.TestSuite()
+        for name in test_names:
+            test = Mock()
+            test.id.return_value = '__main__.Tests.' + name
+            suite.addTest(test)
+        return suite
+
+    def run_suite(self, suite, jobs):
+        result = TestResult()
+        result.startTestRun()
+        _parallel.run_tests_in_sandboxes(
+            suite,
+            result,
+            jobs,
+            [sys.executable, '-c', _WORKER_SCRIPT],
+        )
+        result.stopTestRun()
+        return result
+
+    def test_merges_results_from_all_workers(self):
+        result = self.run_suite(
+            self.make_suite('test_one', 'test_two', 'test_three'),
+            jobs=2
+        )
+        self.assertThat(result.testsRun, Equals(3))
+        self.assertThat(len(result.failures), Equals(1))
+        self.assertThat(
+            result.failures[0][0].id(),
+            Equals('__main__.Tests.test_three')
+        )
+
+    def test_runs_each_test_once_with_more_workers_than_tests(self):
+        result = self.run_suite(self.make_suite('test_one'), jobs=3)
+        self.assertThat(result.testsRun, Equals(1))
+        self.assertTrue(result.wasSuccessful())
+
+    def test_stops_handing_out_tests_when_result_should_stop(self):
+        suite = self.make_suite('test_one', 'test_two')
+        result = TestResult()
+        result.startTestRun()
+        result.stop()
+        _parallel.run_tests_in_sandboxes(
+            suite, result, 1, [sys.executable, '-c', _WORKER_SCRIPT]
+        )
+        self.assertThat(result.testsRun, Equals(0))
+
+
+class SandboxWorkerTests(TestCase):
+
+    def test_reports_test_lost_when_worker_dies(self):
+        self.useFixture(FakeLogger())
+        test_ids = _parallel.queue.Queue()
+        test_ids.put('some.test')
+        worker = _parallel._SandboxWorker(
+            [sys.executable, '-c', 'import sys; sys.stdin.readline()'],
+            test_ids,
+            lambda: False,
+            sandbox=_FakeSandbox(),
+        )
+        recorded = _RecordingStreamResult()
+
+        worker.run(recorded)
+
+        self.assertThat(recorded.events, Equals([dict(
+            test_id='some.test',
+            test_status='fail',
+            file_name='traceback',
+            file_bytes=(
+                b"The autopilot worker running this test exited with code 0 "
+                b"before the test finished."
+            ),
+            mime_type='text/plain;charset=utf8',
+            eof=True,
+        )]))
+
+
+class SandboxTests(TestCase):
+
+    def test_environment_points_at_sandbox(self):
+        sandbox = _parallel.Sandbox()
+        sandbox.display = ':42'
+        sandbox.dbus_address = 'unix:abstract=/tmp/dbus-test'
+
+        environment = sandbox.get_environment({'HOME': '/home/test'})
+
+        self.assertThat(environment, Equals({
+            'HOME': '/home/test',
+            'DISPLAY': ':42',
+            'DBUS_SESSION_BUS_ADDRESS': 'unix:abstract=/tmp/dbus-test',
+            'XAUTHORITY': '/dev/null',
+        }))
+
+    def test_check_sandbox_requirements_needs_xvfb(self):
+        with patch.object(
+            _parallel.shutil, 'which',
+            side_effect=lambda name: None if name == 'Xvfb' else '/bin/x'
+        ):
+            self.assertThat(
+                _parallel.check_sandbox_requirements,
+                raises(RuntimeError(
+                    "Xvfb executable not found. Please install xvfb"
+                ))
+            )
+
+    def test_check_sandbox_requirements_needs_dbus_daemon(self):
+        with patch.object(
+            _parallel.shutil, 'which',
+            side_effect=lambda name: None if name == 'dbus-daemon' else '/x'
+        ):
+            self.assertThat(
+                _parallel.check_sandbox_requirements,
+                raises(RuntimeError(
+                    "dbus-daemon executable not found. Please install dbus"
+                ))
+            )
+
+    def test_start_failure_message_names_program(self):
+        stream = BytesIO(b'')
+        with patch.object(
+            _parallel.select, 'select', return_value=([], [], [])
+        ):
+            self.assertThat(
+                lambda: _parallel._read_line(stream, 'Xvfb'),
+                raises(RuntimeError(
+                    "Xvfb did not start within %d seconds."
+                    % _parallel.SANDBOX_START_TIMEOUT
+                ))
+            )
+
+    def test_stop_terminates_running_processes(self):
+        sandbox = _parallel.Sandbox()
+        xvfb = Mock()
+        xvfb.poll.return_value = None
+        dbus_daemon = Mock()
+        dbus_daemon.poll.return_value = 0
+        sandbox._xvfb = xvfb
+        sandbox._dbus_daemon = dbus_daemon
+
+        sandbox.stop()
+
+        xvfb.terminate.assert_called_once_with()
+        self.assertFalse(dbus_daemon.terminate.called)
+
+    def test_reads_display_from_xvfb(self):
+        with patch.object(
+            _parallel.select, 'select', return_value=([True], [], [])
+        ):
+            self.assertThat(
+                _parallel._read_line(BytesIO(b'7\n'), 'Xvfb'),
+                Equals('7')
+            )
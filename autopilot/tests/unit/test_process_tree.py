@@ -0,0 +1,180 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+from unittest.mock import patch
+
+from fixtures import TempDir
+from testtools import TestCase
+from testtools.matchers import Contains, Equals
+
+from autopilot.process import _tree
+from autopilot.process._tree import ProcessTree
+
+
+def _make_proc_entry(proc_path, pid, ppid, name, cmdline=None):
+    pid_path = os.path.join(proc_path, str(pid))
+    os.mkdir(pid_path)
+    with open(os.path.join(pid_path, 'stat'), 'w') as f:
+        f.write('%d (%s) S %d %d %d 0 -1\n' % (pid, name, ppid, pid, pid))
+    if cmdline is not None:
+        with open(os.path.join(pid_path, 'cmdline'), 'wb') as f:
+            f.write(b'\0'.join(a.encode() for a in cmdline) + b'\0')
+
+
+class ParseStatTests(TestCase):
+
+    def test_parses_parent_pid_and_name(self):
+        self.assertThat(
+            _tree._parse_stat(b'42 (bash) S 7 42 42 34816 42'),
+            Equals((7, 'bash'))
+        )
+
+    def test_name_may_contain_spaces_and_parentheses(self):
+        self.assertThat(
+            _tree._parse_stat(b'42 (a b) (c)) R 9 42 42 0 -1'),
+            Equals((9, 'a b) (c)'))
+        )
+
+    def test_returns_None_for_malformed_stat(self):
+        self.assertThat(_tree._parse_stat(b'garbage'), Equals(None))
+        self.assertThat(_tree._parse_stat(b'42 (bash) S'), Equals(None))
+
+
+class ProcessTreeTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tree = ProcessTree({
+            1: (0, 'init'),
+            10: (1, 'shell'),
+            11: (10, 'app'),
+            12: (11, 'helper'),
+            20: (1, 'other'),
+        })
+
+    def test_get_child_pids_returns_direct_children_only(self):
+        self.assertThat(self.tree.get_child_pids(10), Equals([11]))
+
+    def test_get_descendant_pids_walks_whole_subtree(self):
+        self.assertThat(self.tree.get_descendant_pids(10), Equals({11, 12}))
+
+    def test_get_descendant_pids_of_unknown_pid_is_empty(self):
+        self.assertThat(self.tree.get_descendant_pids(99), Equals(set()))
+
+    def test_get_parent_pid(self):
+        self.assertThat(self.tree.get_parent_pid(12), Equals(11))
+        self.assertThat(self.tree.get_parent_pid(99), Equals(None))
+
+    def test_has_pid(self):
+        self.assertTrue(self.tree.has_pid(20))
+        self.assertFalse(self.tree.has_pid(99))
+
+    def test_get_pids_by_name(self):
+        self.assertThat(self.tree.get_pids_by_name('app'), Equals([11]))
+        self.assertThat(self.tree.get_pids_by_name('nope'), Equals([]))
+
+
+class ProcessTreeFromProcTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.proc_path = self.useFixture(TempDir()).path
+
+    def test_reads_every_process(self):
+        _make_proc_entry(self.proc_path, 1, 0, 'init')
+        _make_proc_entry(self.proc_path, 5, 1, 'app')
+        os.mkdir(os.path.join(self.proc_path, 'self'))
+
+        tree = ProcessTree.from_proc(self.proc_path)
+
+        self.assertThat(tree.pids, Equals(frozenset([1, 5])))
+        self.assertThat(tree.get_child_pids(1), Equals([5]))
+
+    def test_ignores_processes_that_exited_during_scan(self):
+        _make_proc_entry(self.proc_path, 1, 0, 'init')
+        os.mkdir(os.path.join(self.proc_path, '7'))
+
+        tree = ProcessTree.from_proc(self.proc_path)
+
+        self.assertThat(tree.pids, Equals(frozenset([1])))
+
+    def test_truncated_names_are_completed_from_cmdline(self):
+        _make_proc_entry(
+            self.proc_path, 5, 1, 'a-very-long-pro',
+            cmdline=['/usr/bin/a-very-long-process-name', '--flag']
+        )
+
+        tree = ProcessTree.from_proc(self.proc_path)
+
+        self.assertThat(tree.get_name(5), Equals('a-very-long-process-name'))
+        self.assertThat(
+            tree.get_pids_by_name('a-very-long-process-name'),
+            Equals([5])
+        )
+
+    def test_reads_the_real_proc_filesystem(self):
+        tree = ProcessTree.from_proc()
+
+        self.assertThat(tree.pids, Contains(os.getpid()))
+        self.assertThat(
+            tree.get_parent_pid(os.getpid()),
+            Equals(os.getppid())
+        )
+
+
+class CachedProcessTreeTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.proc_path = self.useFixture(TempDir()).path
+        _make_proc_entry(self.proc_path, 1, 0, 'init')
+        self.get_process_tree = _tree._CachedProcessTree(
+            self.proc_path,
+            max_age=5.0
+        )
+
+    def test_snapshot_is_shared_within_max_age(self):
+        first = self.get_process_tree()
+        _make_proc_entry(self.proc_path, 2, 1, 'new')
+
+        self.assertIs(first, self.get_process_tree())
+
+    def test_snapshot_is_refreshed_after_max_age(self):
+        with patch.object(_tree.time, 'monotonic', return_value=100.0):
+            first = self.get_process_tree()
+        _make_proc_entry(self.proc_path, 2, 1, 'new')
+        with patch.object(_tree.time, 'monotonic', return_value=106.0):
+            second = self.get_process_tree()
+
+        self.assertIsNot(first, second)
+        self.assertTrue(second.has_pid(2))
+
+    def test_max_age_zero_forces_a_fresh_scan(self):
+        self.get_process_tree()
+        _make_proc_entry(self.proc_path, 2, 1, 'new')
+
+        self.assertTrue(self.get_process_tree(max_age=0).has_pid(2))
+
+    def test_reset_cache_forces_a_fresh_scan(self):
+        self.get_process_tree()
+        _make_proc_entry(self.proc_path, 2, 1, 'new')
+        self.get_process_tree.reset_cache()
+
+        self.assertTrue(self.get_process_tree().has_pid(2))
@@ -0,0 +1,227 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+
+from fixtures import FakeLogger, TempDir
+from subunit import StreamResultToBytes
+from testtools import TestCase
+from testtools.content import text_content
+from testtools.matchers import Contains, Equals, Not
+
+from autopilot import _profiling
+from autopilot._timing import phase_timer
+
+
+def make_profile(phases=None, operations=()):
+    return {
+        'phases': phases or {},
+        'operations': [
+            {
+                'phase': phase,
+                'description': description,
+                'duration': duration,
+                'size': size,
+            }
+            for phase, description, duration, size in operations
+        ],
+    }
+
+
+class ProfileContentTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(setattr, phase_timer, 'recording_operations', False)
+        self.addCleanup(phase_timer.reset)
+        phase_timer.reset()
+        _profiling.enable_profiling()
+
+    def test_enable_profiling_records_operations(self):
+        self.assertTrue(phase_timer.recording_operations)
+
+    def test_content_lists_phases_and_operations(self):
+        with phase_timer.time_phase('dbus', "Query('/')") as operation:
+            operation.size = 42
+
+        profile = json.loads(
+            b''.join(_profiling.get_profile_content().iter_bytes()).decode()
+        )
+
+        self.assertThat(list(profile['phases']), Equals(['dbus']))
+        [operation] = profile['operations']
+        self.assertThat(operation['description'], Equals("Query('/')"))
+        self.assertThat(operation['size'], Equals(42))
+
+
+class ProfileSummaryTests(TestCase):
+
+    def test_no_profiles(self):
+        summary = _profiling.ProfileSummary()
+        self.assertThat(summary.format(), Equals("No tests were profiled."))
+
+    def test_adds_up_phases(self):
+        summary = _profiling.ProfileSummary()
+        summary.add_profile('test_one', make_profile({'launch': 1.5}))
+        summary.add_profile('test_two', make_profile({'launch': 2.0}))
+
+        self.assertThat(summary.format(), Contains("3.500s  launch"))
+
+    def test_ranks_queries_by_total_time(self):
+        summary = _profiling.ProfileSummary()
+        summary.add_profile('test_one', make_profile(operations=[
+            ('dbus', 'cheap', 0.1, 10),
+            ('dbus', 'costly', 0.5, 2000),
+        ]))
+        summary.add_profile('test_two', make_profile(operations=[
+            ('dbus', 'costly', 0.25, 3000),
+        ]))
+
+        lines = summary.format().splitlines()
+        query_lines = [
+            line for line in lines if line.endswith(("cheap", "costly"))
+        ]
+        self.assertThat(
+            query_lines,
+            Equals([
+                "         0.750s       2      0.500s       3000B  costly",
+                "         0.100s       1      0.100s         10B  cheap",
+            ])
+        )
+
+    def test_ranks_waits_by_test(self):
+        summary = _profiling.ProfileSummary()
+        summary.add_profile('test_one', make_profile(operations=[
+            ('sleep', None, 1.0, None),
+            ('sleep', None, 2.0, None),
+        ]))
+
+        self.assertThat(
+            summary.format(),
+            Contains("         3.000s       2      2.000s  test_one")
+        )
+
+    def test_ranks_sleeps_by_call_site(self):
+        summary = _profiling.ProfileSummary()
+        summary.add_profile('test_one', make_profile(operations=[
+            ('sleep', 'input delay at autopilot.input._X11:206', 0.1, None),
+            ('sleep', 'input delay at autopilot.input._X11:206', 0.1, None),
+            ('sleep', 'Timeout loop at autopilot._timeout:100', 1.0, None),
+        ]))
+
+        lines = summary.format().splitlines()
+        call_site_lines = lines[lines.index(
+            "Costliest sleeps by call site:") + 2:][:2]
+        self.assertThat(
+            call_site_lines,
+            Equals([
+                "         1.000s       1      1.000s  "
+                "Timeout loop at autopilot._timeout:100",
+                "         0.200s       2      0.100s  "
+                "input delay at autopilot.input._X11:206",
+            ])
+        )
+
+    def test_shows_time_sleeping_and_working(self):
+        summary = _profiling.ProfileSummary()
+        summary.add_profile('test_one', make_profile(
+            {'setUp': 1.0, 'test': 2.5, 'cleanups': 0.5, 'sleep': 1.0}
+        ))
+
+        self.assertThat(
+            summary.format(),
+            Contains(
+                "Slept for 1.000s of 4.000s in tests (25.0%), and worked for "
+                "3.000s."
+            )
+        )
+
+    def test_limits_ranked_queries(self):
+        summary = _profiling.ProfileSummary(limit=1)
+        summary.add_profile('test_one', make_profile(operations=[
+            ('dbus', 'cheap', 0.1, 10),
+            ('dbus', 'costly', 0.5, 2000),
+        ]))
+
+        self.assertThat(summary.format(), Not(Contains('cheap')))
+
+    def test_add_content_reads_json(self):
+        summary = _profiling.ProfileSummary()
+        content = text_content(json.dumps(make_profile({'test': 1.0})))
+        summary.add_content('test_one', content)
+
+        self.assertThat(summary.format(), Contains("Profiled 1 tests."))
+
+    def test_add_content_logs_unreadable_profile(self):
+        logger = self.useFixture(FakeLogger())
+        summary = _profiling.ProfileSummary()
+        summary.add_content('test_one', text_content('not json'))
+
+        self.assertThat(
+            logger.output,
+            Contains("Unable to read profile of test_one")
+        )
+        self.assertThat(summary.format(), Equals("No tests were profiled."))
+
+
+class SummarizeResultsTests(TestCase):
+
+    def write_results(self, *profiles):
+        path = os.path.join(self.useFixture(TempDir()).path, 'r.subunit')
+        with open(path, 'wb') as results_file:
+            stream = StreamResultToBytes(results_file)
+            for test_id, profile in profiles:
+                profile_bytes = json.dumps(profile).encode()
+                stream.status(test_id=test_id, test_status='inprogress')
+                stream.status(
+                    test_id=test_id,
+                    file_name=_profiling.PROFILE_DETAIL_NAME,
+                    file_bytes=profile_bytes[:5],
+                    mime_type='application/json',
+                )
+                stream.status(
+                    test_id=test_id,
+                    file_name=_profiling.PROFILE_DETAIL_NAME,
+                    file_bytes=profile_bytes[5:],
+                    mime_type='application/json',
+                    eof=True,
+                )
+                stream.status(test_id=test_id, test_status='success')
+        return path
+
+    def test_reads_profiles_from_results_file(self):
+        path = self.write_results(
+            ('test_one', make_profile({'launch': 1.0})),
+            ('test_two', make_profile({'launch': 2.0})),
+        )
+
+        summary = _profiling.summarize_results(path)
+
+        self.assertThat(summary.format(), Contains("Profiled 2 tests."))
+        self.assertThat(summary.format(), Contains("3.000s  launch"))
+
+    def test_adds_to_given_summary(self):
+        summary = _profiling.ProfileSummary()
+        summary.add_profile('test_one', make_profile())
+        path = self.write_results(('test_two', make_profile()))
+
+        _profiling.summarize_results(path, summary)
+
+        self.assertThat(summary.format(), Contains("Profiled 2 tests."))
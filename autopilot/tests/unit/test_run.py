@@ -18,11 +18,14 @@
 #
 
 from argparse import Namespace
-from unittest.mock import Mock, patch
+from unittest import TestSuite
+from unittest.mock import ANY, Mock, patch
 import logging
 import os.path
+from fixtures import TempDir
 from shutil import rmtree
 import subprocess
+import sys
 import tempfile
 from testtools import TestCase, skipUnless
 from testtools.matchers import (
@@ -30,6 +33,7 @@ from testtools.matchers import (
     DirExists,
     Equals,
     FileExists,
+    Is,
     IsInstance,
     Not,
     raises,
@@ -976,6 +980,12 @@ class TestProgramTests(TestCase):
             config_test_timeout = stack.enter_context(
                 patch.object(run, '_configure_test_timeout')
             )
+            stack.enter_context(
+                patch.object(
+                    run, '_record_test_durations',
+                    side_effect=lambda result, path: result
+                )
+            )
 
             load_tests.return_value = (mock_test_suite, False)
             fake_construct.return_value = mock_construct_test_result
@@ -987,6 +997,122 @@ class TestProgramTests(TestCase):
             fake_construct.assert_called_once_with(fake_args)
             load_tests.assert_called_once_with(fake_args.suite)
 
+    def test_run_tests_closes_custom_buses_after_run(self):
+        fake_args = create_default_run_args()
+        program = run.TestProgram(fake_args)
+        mock_test_suite = Mock()
+        mock_test_suite.run.return_value.wasSuccessful.return_value = True
+        with ExitStack() as stack:
+            load_tests = stack.enter_context(
+                patch.object(run, 'load_test_suite_from_name')
+            )
+            stack.enter_context(patch.object(run, 'construct_test_result'))
+            stack.enter_context(patch.object(run, '_configure_debug_profile'))
+            stack.enter_context(
+                patch.object(run, '_configure_timeout_profile')
+            )
+            stack.enter_context(patch.object(run, '_configure_test_timeout'))
+            stack.enter_context(
+                patch.object(
+                    run, '_record_test_durations',
+                    side_effect=lambda result, path: result
+                )
+            )
+            close_buses = stack.enter_context(
+                patch.object(run, 'close_custom_buses')
+            )
+
+            load_tests.return_value = (mock_test_suite, False)
+            program.run()
+
+            close_buses.assert_called_once_with()
+
+    def _run_tests_with_mocks(self, stack, **kwargs):
+        fake_args = create_default_run_args(**kwargs)
+        program = run.TestProgram(fake_args)
+        mock_test_suite = Mock()
+        mock_test_suite.run.return_value.wasSuccessful.return_value = True
+        load_tests = stack.enter_context(
+            patch.object(run, 'load_test_suite_from_name')
+        )
+        load_tests.return_value = (mock_test_suite, False)
+        fake_construct = stack.enter_context(
+            patch.object(run, 'construct_test_result')
+        )
+        fake_construct.return_value.wasSuccessful.return_value = True
+        stack.enter_context(patch.object(run, '_configure_debug_profile'))
+        stack.enter_context(patch.object(run, '_configure_timeout_profile'))
+        stack.enter_context(patch.object(run, '_configure_test_timeout'))
+        stack.enter_context(patch.object(run, 'close_custom_buses'))
+        record_durations = stack.enter_context(
+            patch.object(run, '_record_test_durations')
+        )
+        record_durations.side_effect = lambda result, path: result
+        stack.enter_context(
+            patch.object(
+                run._discovery, 'load_indexed_tests',
+                side_effect=lambda suite: suite
+            )
+        )
+        parallel = stack.enter_context(patch.object(run, '_parallel'))
+        parallel.run_tests_in_sandboxes.side_effect = (
+            lambda suite, result, jobs, command: result
+        )
+        program.run()
+        return mock_test_suite, fake_construct.return_value, parallel
+
+    def test_run_tests_runs_suite_serially_by_default(self):
+        with ExitStack() as stack:
+            suite, result, parallel = self._run_tests_with_mocks(stack)
+
+        suite.run.assert_called_once_with(result)
+        self.assertFalse(parallel.run_tests_in_sandboxes.called)
+
+    def test_run_tests_runs_suite_in_sandboxes_with_jobs(self):
+        with ExitStack() as stack:
+            suite, result, parallel = self._run_tests_with_mocks(
+                stack, jobs=3, suite=['foo']
+            )
+
+        self.assertFalse(suite.run.called)
+        parallel.run_tests_in_sandboxes.assert_called_once_with(
+            suite,
+            result,
+            3,
+            run._get_worker_command(
+                create_default_run_args(jobs=3, suite=['foo'])
+            ),
+        )
+
+    def test_run_tests_in_worker_mode_runs_worker(self):
+        with ExitStack() as stack:
+            suite, result, parallel = self._run_tests_with_mocks(
+                stack, worker=True
+            )
+
+        parallel.run_worker.assert_called_once_with(
+            suite,
+            decorate_result=ANY
+        )
+        self.assertFalse(suite.run.called)
+        self.assertFalse(result.startTestRun.called)
+
+    def test_run_tests_reruns_failed_tests(self):
+        with ExitStack() as stack:
+            rerun = stack.enter_context(
+                patch.object(run, '_rerun_failed_tests')
+            )
+            suite, result, parallel = self._run_tests_with_mocks(
+                stack, rerun_failures=2
+            )
+
+        rerun_result = rerun.call_args[0][1]
+        self.assertThat(
+            rerun_result,
+            IsInstance(run.RerunFailuresResultDecorator)
+        )
+        suite.run.assert_called_once_with(rerun_result)
+
     def test_dont_run_when_zero_tests_loaded(self):
         fake_args = create_default_run_args()
         program = run.TestProgram(fake_args)
@@ -996,6 +1122,287 @@ class TestProgramTests(TestCase):
                                     program.run)
 
 
+class DiscoverTestTests(TestCase):
+
+    def test_uses_discovery_index_when_given(self):
+        discovery_index = Mock()
+        with ExitStack() as stack:
+            stack.enter_context(
+                patch.object(run, 'get_package_location', return_value='/top')
+            )
+            discover_tests = stack.enter_context(
+                patch.object(run._discovery, 'discover_tests')
+            )
+            loader = stack.enter_context(patch.object(run, 'TestLoader'))
+
+            test, top_level_dir = run._discover_test(
+                'pkg.tests',
+                discovery_index
+            )
+
+        discover_tests.assert_called_once_with(
+            'pkg.tests', '/top', discovery_index
+        )
+        self.assertThat(test, Equals(discover_tests.return_value))
+        self.assertThat(top_level_dir, Equals('/top'))
+        self.assertFalse(loader.return_value.discover.called)
+
+    def test_imports_tests_when_index_cannot_find_them(self):
+        with ExitStack() as stack:
+            stack.enter_context(
+                patch.object(run, 'get_package_location', return_value='/top')
+            )
+            stack.enter_context(
+                patch.object(
+                    run._discovery, 'discover_tests', return_value=None
+                )
+            )
+            loader = stack.enter_context(patch.object(run, 'TestLoader'))
+
+            test, top_level_dir = run._discover_test('pkg.tests', Mock())
+
+        loader.return_value.discover.assert_called_once_with(
+            start_dir='pkg.tests',
+            top_level_dir='/top'
+        )
+        self.assertThat(
+            test,
+            Equals(loader.return_value.discover.return_value)
+        )
+
+
+class SelectShardTests(TestCase):
+
+    def make_suite(self, count):
+        tests = []
+        for i in range(count):
+            test = Mock()
+            test.id.return_value = 'test_%d' % i
+            tests.append(test)
+        return TestSuite(tests)
+
+    def test_returns_suite_when_no_shard_requested(self):
+        suite = self.make_suite(3)
+        self.assertThat(
+            run._select_shard(suite, create_default_run_args()),
+            Is(suite)
+        )
+
+    def test_selects_shard_using_recorded_durations(self):
+        suite = self.make_suite(3)
+        args = create_default_run_args(
+            shard=(1, 2),
+            timing_database='/tmp/timings.sqlite'
+        )
+        durations = {'test_0': 10.0, 'test_1': 1.0, 'test_2': 2.0}
+        with patch.object(
+            run, 'get_recorded_durations', return_value=durations
+        ) as get_durations:
+            shard = run._select_shard(suite, args)
+
+        get_durations.assert_called_once_with('/tmp/timings.sqlite')
+        self.assertThat(
+            [t.id() for t in shard],
+            Equals(['test_0'])
+        )
+
+
+class OrderTestsTests(TestCase):
+
+    def make_suite(self, *test_ids):
+        tests = []
+        for test_id in test_ids:
+            test = Mock()
+            test.id.return_value = test_id
+            tests.append(test)
+        return TestSuite(tests)
+
+    def test_returns_suite_when_no_order_requested(self):
+        suite = self.make_suite('test_a')
+        self.assertThat(
+            run._order_tests(suite, create_default_run_args()),
+            Is(suite)
+        )
+
+    def test_orders_tests_with_requested_ordering(self):
+        suite = self.make_suite('test_a', 'test_b')
+        durations = {'test_a': 1.0, 'test_b': 2.0}
+        with patch(
+            'autopilot._ordering.get_recorded_durations',
+            return_value=durations
+        ):
+            ordered = run._order_tests(
+                suite,
+                create_default_run_args(order='slowest-first')
+            )
+
+        self.assertThat(
+            [t.id() for t in ordered],
+            Equals(['test_b', 'test_a'])
+        )
+
+
+class RecordTestDurationsTests(TestCase):
+
+    def test_decorates_result_with_timing_decorator(self):
+        directory = self.useFixture(TempDir()).path
+        path = os.path.join(directory, 'timings.sqlite')
+        result = Mock()
+
+        decorated = run._record_test_durations(result, path)
+        self.addCleanup(decorated.stopTestRun)
+
+        self.assertThat(decorated, IsInstance(run.TimingResultDecorator))
+        self.assertThat(decorated.decorated, Is(result))
+
+    def test_returns_result_when_database_cannot_be_opened(self):
+        result = Mock()
+        with patch.object(run, 'TimingDatabase', side_effect=OSError()):
+            with patch.object(run, 'get_root_logger'):
+                self.assertThat(
+                    run._record_test_durations(result, '/nonexistent'),
+                    Is(result)
+                )
+
+
+class RerunFailedTestsTests(TestCase):
+
+    def rerun_failed_tests(self, rounds, result=None, **kwargs):
+        """Call _rerun_failed_tests with a rerun result that has the tests in
+        *rounds* to run again.
+
+        :returns: The fake rerun result, and the mock TestSuite class.
+
+        """
+        rerun_result = Mock()
+        rerun_result.take_tests_to_rerun.side_effect = list(rounds) + [[]]
+        with ExitStack() as stack:
+            stack.enter_context(patch('sys.stdout', new=StringIO()))
+            test_suite = stack.enter_context(patch.object(run, 'TestSuite'))
+            run._rerun_failed_tests(
+                result or Mock(shouldStop=False),
+                rerun_result,
+                create_default_run_args(**kwargs)
+            )
+        return rerun_result, test_suite
+
+    def test_reruns_failed_tests_until_none_fail(self):
+        result = Mock(shouldStop=False)
+        test = Mock()
+
+        _, test_suite = self.rerun_failed_tests(
+            [[test], [test]], result, rerun_failures=3
+        )
+
+        test_suite.assert_called_with([test])
+        self.assertThat(test_suite.return_value.run.call_count, Equals(2))
+        test_suite.return_value.run.assert_called_with(result)
+
+    def test_reruns_at_most_rerun_failures_times(self):
+        test = Mock()
+
+        _, test_suite = self.rerun_failed_tests(
+            [[test], [test], [test]], rerun_failures=2
+        )
+
+        self.assertThat(test_suite.return_value.run.call_count, Equals(2))
+
+    def test_stops_rerunning_when_result_should_stop(self):
+        _, test_suite = self.rerun_failed_tests(
+            [[Mock()]], Mock(shouldStop=True), rerun_failures=1
+        )
+
+        self.assertFalse(test_suite.return_value.run.called)
+
+    def test_reruns_in_sandbox(self):
+        args = dict(rerun_failures=1, rerun_in_sandbox=True, suite=['foo'])
+        with patch.object(run, '_parallel') as parallel:
+            rerun_result, test_suite = self.rerun_failed_tests(
+                [[Mock()]], **args
+            )
+
+        parallel.run_tests_in_sandboxes.assert_called_once_with(
+            test_suite.return_value,
+            rerun_result,
+            1,
+            run._get_worker_command(create_default_run_args(**args), 2)
+        )
+        self.assertFalse(test_suite.return_value.run.called)
+
+
+class WorkerCommandTests(TestCase):
+
+    def test_runs_autopilot_run_in_worker_mode(self):
+        command = run._get_worker_command(
+            create_default_run_args(suite=['foo'])
+        )
+        self.assertThat(
+            command[:5],
+            Equals([sys.executable, '-m', 'autopilot.run', 'run', '--worker'])
+        )
+
+    def test_passes_later_attempt(self):
+        command = run._get_worker_command(
+            create_default_run_args(suite=['foo']),
+            attempt=2
+        )
+        self.assertThat(command[-3:], Equals(['--attempt', '2', 'foo']))
+
+    def test_passes_profile_tests(self):
+        command = run._get_worker_command(
+            create_default_run_args(suite=['foo'], profile_tests=True)
+        )
+        self.assertThat(command[-2:], Equals(['--profile-tests', 'foo']))
+
+    def test_passes_suites_last(self):
+        command = run._get_worker_command(
+            create_default_run_args(suite=['foo', 'bar'])
+        )
+        self.assertThat(command[-2:], Equals(['foo', 'bar']))
+
+    def test_passes_configuration(self):
+        command = run._get_worker_command(
+            create_default_run_args(
+                debug_profile='verbose',
+                timeout_profile='long',
+                test_config='foo=bar',
+                test_timeout=20,
+                verbose=2,
+                suite=['foo'],
+            )
+        )
+        self.assertThat(
+            command[5:],
+            Equals([
+                '--debug-profile', 'verbose',
+                '--timeout-profile', 'long',
+                '--test-timeout', '20',
+                '--config', 'foo=bar',
+                '-vv',
+                'foo',
+            ])
+        )
+
+    def test_passes_recording_options(self):
+        command = run._get_worker_command(
+            create_default_run_args(
+                record=True,
+                record_directory='/tmp/videos',
+                record_options='--fps=6',
+                suite=['foo'],
+            )
+        )
+        self.assertThat(
+            command[-6:],
+            Equals([
+                '--record',
+                '--record-directory', '/tmp/videos',
+                '--record-options', '--fps=6',
+                'foo',
+            ])
+        )
+
+
 def create_default_run_args(**kwargs):
     """Create a an argparse.Namespace object containing arguments required
     to make autopilot.run.TestProgram run a suite of tests.
@@ -1015,6 +1422,15 @@ def create_default_run_args(**kwargs):
         suite='foo',
         test_config='',
         test_timeout=0,
+        jobs=1,
+        worker=False,
+        shard=None,
+        timing_database=None,
+        order=None,
+        rerun_failures=0,
+        rerun_in_sandbox=False,
+        attempt=1,
+        profile_tests=False,
     )
     defaults.update(kwargs)
     return Namespace(**defaults)
@@ -0,0 +1,154 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from argparse import ArgumentTypeError
+from unittest.mock import Mock
+
+from testtools import TestCase
+from testtools.matchers import Equals, raises
+
+from autopilot._sharding import (
+    parse_shard,
+    partition_test_ids,
+    select_shard,
+)
+
+
+def _make_test(test_id):
+    test = Mock()
+    test.id.return_value = test_id
+    return test
+
+
+class ParseShardTests(TestCase):
+
+    def test_parses_index_and_count(self):
+        self.assertThat(parse_shard('2/5'), Equals((2, 5)))
+
+    def test_last_shard_is_valid(self):
+        self.assertThat(parse_shard('5/5'), Equals((5, 5)))
+
+    def test_rejects_zero_index(self):
+        self.assertThat(
+            lambda: parse_shard('0/5'),
+            raises(ArgumentTypeError(
+                "Shard index must be between 1 and 5, not 0."
+            ))
+        )
+
+    def test_rejects_index_larger_than_count(self):
+        self.assertThat(
+            lambda: parse_shard('6/5'),
+            raises(ArgumentTypeError(
+                "Shard index must be between 1 and 5, not 6."
+            ))
+        )
+
+    def test_rejects_malformed_specification(self):
+        for value in ('2', '2/', 'a/b', '1/2/3'):
+            self.assertThat(
+                lambda: parse_shard(value),
+                raises(ArgumentTypeError(
+                    "%r is not a shard specification of the form K/N." % value
+                ))
+            )
+
+
+class PartitionTestIdsTests(TestCase):
+
+    def test_every_test_is_in_exactly_one_shard(self):
+        test_ids = ['test_%d' % i for i in range(50)]
+        durations = {'test_%d' % i: float(i) for i in range(0, 50, 2)}
+
+        shards = partition_test_ids(test_ids, 4, durations)
+
+        self.assertThat(
+            sorted(t for shard in shards for t in shard),
+            Equals(sorted(test_ids))
+        )
+
+    def test_uses_longest_processing_time_first(self):
+        durations = {'a': 10.0, 'b': 6.0, 'c': 5.0, 'd': 4.0, 'e': 1.0}
+
+        shards = partition_test_ids(durations.keys(), 2, durations)
+
+        # a -> 0; b -> 1; c -> 1 (6 < 10); d -> 0 (10 < 11); e -> 1.
+        self.assertThat(shards, Equals([{'a', 'd'}, {'b', 'c', 'e'}]))
+
+    def test_balances_recorded_durations(self):
+        durations = {'test_%d' % i: float(i % 7 + 1) for i in range(70)}
+
+        shards = partition_test_ids(durations.keys(), 3, durations)
+
+        loads = [sum(durations[t] for t in shard) for shard in shards]
+        self.assertTrue(max(loads) - min(loads) <= max(durations.values()))
+
+    def test_is_deterministic_regardless_of_input_order(self):
+        test_ids = ['test_%d' % i for i in range(30)]
+        durations = {t: 1.0 for t in test_ids[:10]}
+
+        self.assertThat(
+            partition_test_ids(test_ids, 3, durations),
+            Equals(partition_test_ids(reversed(test_ids), 3, durations))
+        )
+
+    def test_hashes_tests_without_history(self):
+        test_ids = ['test_%d' % i for i in range(100)]
+
+        shards = partition_test_ids(test_ids, 2)
+
+        self.assertThat(
+            shards,
+            Equals(partition_test_ids(list(reversed(test_ids)), 2))
+        )
+        self.assertTrue(all(shards))
+
+    def test_single_shard_gets_every_test(self):
+        self.assertThat(
+            partition_test_ids(['a', 'b'], 1, {'a': 1.0}),
+            Equals([{'a', 'b'}])
+        )
+
+
+class SelectShardTests(TestCase):
+
+    def test_selected_tests_keep_their_order(self):
+        tests = [_make_test('test_%d' % i) for i in range(20)]
+        durations = {'test_%d' % i: float(i) for i in range(20)}
+
+        selected = select_shard(tests, 1, 2, durations)
+
+        self.assertThat(
+            selected,
+            Equals([t for t in tests if t in selected])
+        )
+
+    def test_shards_cover_all_tests(self):
+        tests = [_make_test('test_%d' % i) for i in range(20)]
+
+        selected = (
+            select_shard(tests, 1, 3)
+            + select_shard(tests, 2, 3)
+            + select_shard(tests, 3, 3)
+        )
+
+        self.assertThat(
+            sorted(t.id() for t in selected),
+            Equals(sorted(t.id() for t in tests))
+        )
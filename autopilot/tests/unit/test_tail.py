@@ -0,0 +1,107 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from io import BytesIO, StringIO
+import os
+import tempfile
+from unittest.mock import Mock, patch
+
+from subunit import StreamResultToBytes
+from testtools import TestCase
+from testtools.matchers import Contains, Equals
+
+from autopilot import _tail
+
+
+class FollowedFileTests(TestCase):
+
+    def test_read_returns_available_data(self):
+        followed = _tail._FollowedFile(BytesIO(b'abc'), lambda: False)
+
+        self.assertThat(followed.read(2), Equals(b'ab'))
+
+    def test_read_waits_for_more_data(self):
+        file_obj = Mock()
+        file_obj.read.side_effect = [b'a', b'', b'b']
+        followed = _tail._FollowedFile(file_obj, lambda: False)
+
+        with patch.object(_tail.time, 'sleep') as sleep:
+            self.assertThat(followed.read(2), Equals(b'ab'))
+
+        sleep.assert_called_once_with(0.5)
+
+    def test_read_returns_less_data_once_stopped(self):
+        followed = _tail._FollowedFile(BytesIO(b'a'), lambda: True)
+
+        self.assertThat(followed.read(2), Equals(b'a'))
+
+
+class FollowResultsTests(TestCase):
+
+    def write_results(self, *events):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as results_file:
+            stream = StreamResultToBytes(results_file)
+            for event in events:
+                stream.status(**event)
+        return path
+
+    def follow_results(self, *events):
+        output = StringIO()
+        _tail.follow_results(
+            self.write_results(*events), output, follow=False)
+        return output.getvalue()
+
+    def test_prints_running_test(self):
+        output = self.follow_results(
+            dict(test_id='foo.test', test_status='inprogress')
+        )
+
+        self.assertThat(output, Equals("RUNNING: foo.test\n"))
+
+    def test_prints_test_outcome(self):
+        output = self.follow_results(
+            dict(test_id='foo.test', test_status='fail')
+        )
+
+        self.assertThat(output, Equals("FAIL: foo.test\n"))
+
+    def test_prints_text_attachment_once_complete(self):
+        output = self.follow_results(
+            dict(test_id='foo.test', file_name='test-log', file_bytes=b'hel',
+                 mime_type='text/plain;charset=utf8'),
+            dict(test_id='foo.test', file_name='test-log', file_bytes=b'lo',
+                 mime_type='text/plain;charset=utf8', eof=True),
+        )
+
+        self.assertThat(output, Equals("    test-log: {{{\nhello}}}\n"))
+
+    def test_prints_size_of_binary_attachment(self):
+        output = self.follow_results(
+            dict(test_id='foo.test', file_name='screenshot',
+                 file_bytes=b'abc', mime_type='image/png'),
+            dict(test_id='foo.test', file_name='screenshot',
+                 file_bytes=b'de', mime_type='image/png', eof=True),
+        )
+
+        self.assertThat(
+            output,
+            Contains('"screenshot" (image/png, 5 bytes)')
+        )
@@ -17,15 +17,20 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import json
 from unittest.mock import Mock
-from testtools import TestCase
-from testtools.matchers import raises
+from testtools import TestCase, TestResult
+from testtools.matchers import Contains, Equals, Not, raises
 
 from autopilot.testcase import (
     _compare_system_with_process_snapshot,
     _considered_failing_test,
     _get_application_launch_args,
+    _get_application_pool_scope,
+    _TimedRunTest,
 )
+from autopilot._profiling import PROFILE_DETAIL_NAME
+from autopilot._timing import phase_timer
 from autopilot.utilities import sleep
 
 
@@ -137,3 +142,87 @@ class AutopilotGetApplicationLaunchArgsTests(TestCase):
         kwargs = dict(app_type=app_type_value)
         _get_application_launch_args(kwargs)
         self.assertEqual(kwargs, dict())
+
+
+class ApplicationPoolScopeTests(TestCase):
+
+    def get_scope(self, application_pool_scope):
+        test = Mock()
+        test.application_pool_scope = application_pool_scope
+        return _get_application_pool_scope(test)
+
+    def test_no_scope_when_not_pooling(self):
+        self.assertThat(self.get_scope(None), Equals(None))
+
+    def test_module_scope(self):
+        self.assertThat(
+            self.get_scope('module'),
+            Equals((Mock.__module__,))
+        )
+
+    def test_class_scope(self):
+        self.assertThat(
+            self.get_scope('class'),
+            Equals((Mock.__module__, Mock.__qualname__))
+        )
+
+    def test_raises_on_unknown_scope(self):
+        self.assertThat(
+            lambda: self.get_scope('session'),
+            raises(ValueError(
+                "Unknown application_pool_scope 'session'. Must be one of "
+                "'class' or 'module'."
+            ))
+        )
+
+
+class TimedRunTestPhaseTests(TestCase):
+
+    def run_example_test(self, fail_in_setup=False):
+        class ExampleTest(TestCase):
+            run_tests_with = _TimedRunTest
+
+            def setUp(self):
+                super().setUp()
+                self.addCleanup(lambda: None)
+                if fail_in_setup:
+                    raise RuntimeError()
+
+            def test_example(self):
+                pass
+
+        self.addCleanup(phase_timer.reset)
+        test = ExampleTest('test_example')
+        test.run(TestResult())
+        self.test = test
+        return phase_timer.get_durations()
+
+    def test_times_each_test_phase(self):
+        durations = self.run_example_test()
+        self.assertThat(
+            sorted(durations),
+            Equals(['cleanups', 'setUp', 'tearDown', 'test'])
+        )
+
+    def test_times_cleanups_when_setup_fails(self):
+        durations = self.run_example_test(fail_in_setup=True)
+        self.assertThat(sorted(durations), Equals(['cleanups', 'setUp']))
+
+    def test_does_not_attach_profile_by_default(self):
+        self.run_example_test()
+        self.assertThat(
+            self.test.getDetails(),
+            Not(Contains(PROFILE_DETAIL_NAME))
+        )
+
+    def test_attaches_profile_when_recording_operations(self):
+        self.addCleanup(setattr, phase_timer, 'recording_operations', False)
+        phase_timer.recording_operations = True
+        self.run_example_test(fail_in_setup=True)
+
+        content = self.test.getDetails()[PROFILE_DETAIL_NAME]
+        profile = json.loads(b''.join(content.iter_bytes()).decode())
+        self.assertThat(
+            sorted(profile['phases']),
+            Equals(['cleanups', 'setUp'])
+        )
@@ -18,20 +18,34 @@
 #
 
 import codecs
-from unittest.mock import Mock, patch
+from unittest.mock import ANY, Mock, patch
 import os
+import sqlite3
 import tempfile
 
 from fixtures import FakeLogger
-from testtools import TestCase, PlaceHolder
+from testtools import (
+    ExtendedToStreamDecorator,
+    PlaceHolder,
+    StreamResult,
+    TestCase,
+)
 from testtools.content import Content, ContentType, text_content
-from testtools.matchers import Contains, raises, NotEquals
+from testtools.matchers import (
+    Contains,
+    Equals,
+    Not,
+    NotEquals,
+    raises,
+)
 from testscenarios import WithScenarios
+import testtools
 import unittest
 
 from autopilot import testresult
 from autopilot import run
 from autopilot.testcase import multiply_scenarios
+from autopilot._timing import phase_timer
 from autopilot.tests.unit.fixtures import AutopilotVerboseLogging
 
 
@@ -162,6 +176,330 @@ class TestResultLogMessageTests(WithScenarios, TestCase):
             self.assertThat(log.output, Contains(self.log % test_id))
 
 
+class TimingResultDecoratorTests(TestCase):
+
+    def run_test(self, test_method):
+        class ExampleTest(testtools.TestCase):
+            def test_example(self):
+                test_method(self)
+
+        database = Mock()
+        result = testresult.TimingResultDecorator(
+            testtools.TestResult(),
+            database
+        )
+        result.startTestRun()
+        test = ExampleTest('test_example')
+        test.run(result)
+        result.stopTestRun()
+        return test, database
+
+    def test_records_total_duration_and_outcome(self):
+        test, database = self.run_test(lambda test: None)
+
+        database.record.assert_called_once_with(
+            test.id(),
+            {'total': ANY},
+            'success',
+            attempt=1
+        )
+
+    def test_records_failure_outcome(self):
+        test, database = self.run_test(lambda test: test.fail('failed'))
+
+        self.assertThat(database.record.call_args[0][2], Equals('fail'))
+
+    def test_records_timed_phases(self):
+        def test_method(test):
+            with phase_timer.time_phase('dbus'):
+                pass
+        test, database = self.run_test(test_method)
+
+        durations = database.record.call_args[0][1]
+        self.assertThat(sorted(durations), Equals(['dbus', 'total']))
+
+    def test_phases_are_reset_between_tests(self):
+        with phase_timer.time_phase('dbus'):
+            pass
+        test, database = self.run_test(lambda test: None)
+
+        durations = database.record.call_args[0][1]
+        self.assertThat(sorted(durations), Equals(['total']))
+
+    def test_records_later_runs_as_later_attempts(self):
+        database = Mock()
+        result = testresult.TimingResultDecorator(
+            testtools.TestResult(),
+            database,
+            first_attempt=2
+        )
+        test = PlaceHolder('fake_test')
+
+        test.run(result)
+        test.run(result)
+
+        self.assertThat(
+            [c[1]['attempt'] for c in database.record.call_args_list],
+            Equals([2, 3])
+        )
+
+    def test_database_errors_are_logged(self):
+        self.useFixture(FakeLogger())
+        database = Mock()
+        database.record.side_effect = sqlite3.OperationalError('locked')
+        result = testresult.TimingResultDecorator(Mock(), database)
+        test = PlaceHolder('fake_test')
+
+        result.startTest(test)
+        result.stopTest(test)
+
+    def test_closes_database_when_run_stops(self):
+        database = Mock()
+        result = testresult.TimingResultDecorator(Mock(), database)
+
+        result.stopTestRun()
+
+        database.close.assert_called_once_with()
+
+
+class RerunFailuresResultDecoratorTests(TestCase):
+
+    def make_test(self, *outcomes):
+        """Return a test that fails or passes on each run, as *outcomes*
+        says.
+        """
+        outcomes = list(outcomes)
+
+        class ExampleTest(testtools.TestCase):
+            def test_example(self):
+                if not outcomes.pop(0):
+                    self.fail('failed')
+
+        return ExampleTest('test_example')
+
+    def run_with_reruns(self, test, max_reruns):
+        decorated = testtools.TestResult()
+        result = testresult.RerunFailuresResultDecorator(decorated, max_reruns)
+        result.startTestRun()
+        tests = [test]
+        while tests:
+            for t in tests:
+                t.run(result)
+            tests = result.take_tests_to_rerun()
+        result.stopTestRun()
+        return result, decorated
+
+    def test_passing_test_is_reported(self):
+        result, decorated = self.run_with_reruns(self.make_test(True), 1)
+
+        self.assertThat(decorated.testsRun, Equals(1))
+        self.assertTrue(decorated.wasSuccessful())
+
+    def test_failed_test_is_rerun(self):
+        result = testresult.RerunFailuresResultDecorator(
+            testtools.TestResult(), 1)
+        test = self.make_test(False)
+
+        test.run(result)
+
+        self.assertThat(result.take_tests_to_rerun(), Equals([test]))
+
+    def test_failed_test_is_not_reported_before_rerun(self):
+        decorated = testtools.TestResult()
+        result = testresult.RerunFailuresResultDecorator(decorated, 1)
+
+        self.make_test(False).run(result)
+
+        self.assertThat(decorated.testsRun, Equals(0))
+
+    def test_test_passing_on_rerun_is_reported_once_as_passing(self):
+        result, decorated = self.run_with_reruns(
+            self.make_test(False, True), 1)
+
+        self.assertThat(decorated.testsRun, Equals(1))
+        self.assertTrue(decorated.wasSuccessful())
+
+    def test_test_passing_on_rerun_is_flaky(self):
+        test = self.make_test(False, False, True)
+        result, decorated = self.run_with_reruns(test, 2)
+
+        self.assertThat(result.flaky_test_ids, Equals([test.id()]))
+
+    def test_test_passing_on_rerun_is_tagged_flaky(self):
+        tags = []
+
+        class TagRecordingResult(testtools.TestResult):
+            def addSuccess(self, test, details=None):
+                tags.append(self.current_tags)
+                super().addSuccess(test, details)
+
+        result = testresult.RerunFailuresResultDecorator(
+            TagRecordingResult(), 1)
+        test = self.make_test(False, True)
+        result.startTestRun()
+        test.run(result)
+        test.run(result)
+        result.stopTestRun()
+
+        self.assertThat(tags, Equals([{'flaky'}]))
+
+    def test_test_failing_every_run_is_reported_once_as_failing(self):
+        result, decorated = self.run_with_reruns(
+            self.make_test(False, False, False), 2)
+
+        self.assertThat(decorated.testsRun, Equals(1))
+        self.assertThat(len(decorated.failures), Equals(1))
+        self.assertThat(result.flaky_test_ids, Equals([]))
+
+    def test_failed_test_not_rerun_is_reported_when_run_stops(self):
+        decorated = testtools.TestResult()
+        result = testresult.RerunFailuresResultDecorator(decorated, 1)
+        result.startTestRun()
+        self.make_test(False).run(result)
+
+        result.stopTestRun()
+
+        self.assertThat(len(decorated.failures), Equals(1))
+
+
+class ProfileSummaryResultDecoratorTests(TestCase):
+
+    def test_adds_attached_profiles_to_summary(self):
+        summary = Mock()
+        result = testresult.ProfileSummaryResultDecorator(
+            testtools.TestResult(), summary)
+        profile = text_content('{}')
+        PlaceHolder(
+            'test_one',
+            details={'autopilot-profile': profile}
+        ).run(result)
+
+        summary.add_content.assert_called_once_with('test_one', profile)
+
+    def test_ignores_tests_without_profiles(self):
+        summary = Mock()
+        result = testresult.ProfileSummaryResultDecorator(
+            testtools.TestResult(), summary)
+        PlaceHolder('test_one').run(result)
+
+        self.assertFalse(summary.add_content.called)
+
+
+class _RecordingStreamResult(StreamResult):
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def status(self, **kwargs):
+        self.events.append(kwargs)
+
+
+class StreamingDetailsResultDecoratorTests(TestCase):
+
+    def get_file_events(self, events, file_name):
+        return [e for e in events if e.get('file_name') == file_name]
+
+    def run_test(self, test_method, chunk_size=4):
+        class ExampleTest(testtools.TestCase):
+            def test_example(self):
+                test_method(self, stream)
+
+        stream = _RecordingStreamResult()
+        output_stream = Mock()
+        result = testresult.StreamingDetailsResultDecorator(
+            ExtendedToStreamDecorator(stream),
+            output_stream=output_stream,
+            chunk_size=chunk_size,
+        )
+        result.startTestRun()
+        test = ExampleTest('test_example')
+        test.run(result)
+        result.stopTestRun()
+        return test, stream.events, output_stream
+
+    def add_text_detail(self, test, stream):
+        test.addDetail('log', text_content('hello'))
+
+    def test_detail_is_written_when_attached(self):
+        def test_method(test, stream):
+            self.add_text_detail(test, stream)
+            test.events_after_detail = list(stream.events)
+        test, events, _ = self.run_test(test_method)
+
+        self.assertThat(
+            self.get_file_events(test.events_after_detail, 'log'),
+            Not(Equals([]))
+        )
+
+    def test_detail_is_written_in_chunks(self):
+        test, events, _ = self.run_test(self.add_text_detail)
+
+        self.assertThat(
+            [e['file_bytes'] for e in self.get_file_events(events, 'log')],
+            Equals([b'hell', b'o'])
+        )
+
+    def test_detail_is_written_before_the_outcome(self):
+        test, events, _ = self.run_test(self.add_text_detail)
+
+        statuses = [
+            e.get('test_status') or e.get('file_name') for e in events
+        ]
+        self.assertThat(
+            statuses,
+            Equals(['inprogress', 'log', 'log', 'success'])
+        )
+
+    def test_last_chunk_of_detail_is_eof(self):
+        test, events, _ = self.run_test(self.add_text_detail)
+
+        self.assertThat(
+            [e['eof'] for e in self.get_file_events(events, 'log')],
+            Equals([False, True])
+        )
+
+    def test_output_stream_is_flushed_after_detail(self):
+        test, events, output_stream = self.run_test(self.add_text_detail)
+
+        output_stream.flush.assert_called_once_with()
+
+    def test_binary_detail_is_dropped_from_test(self):
+        def test_method(test, stream):
+            test.addDetail(
+                'image',
+                Content(ContentType('image', 'png'), lambda: [b'data'])
+            )
+        test, events, _ = self.run_test(test_method)
+
+        image = test.getDetails()['image']
+        self.assertThat(
+            image.content_type,
+            Equals(ContentType('image', 'png'))
+        )
+        self.assertThat(list(image.iter_bytes()), Equals([]))
+
+    def test_text_detail_is_kept_on_test(self):
+        test, events, _ = self.run_test(self.add_text_detail)
+
+        self.assertThat(test.getDetails()['log'].as_text(), Equals('hello'))
+
+    def test_details_added_without_addDetail_are_written_with_outcome(self):
+        def test_method(test, stream):
+            test.getDetails()['log'] = text_content('hello')
+        test, events, _ = self.run_test(test_method)
+
+        statuses = [
+            e.get('test_status') or e.get('file_name') for e in events
+        ]
+        self.assertThat(statuses, Equals(['inprogress', 'log', 'success']))
+
+    def test_addDetail_is_restored_after_test(self):
+        test, events, _ = self.run_test(lambda test, stream: None)
+
+        self.assertThat(vars(test), Not(Contains('addDetail')))
+
+
 class OutputFormatFactoryTests(TestCase):
 
     def test_has_text_format(self):
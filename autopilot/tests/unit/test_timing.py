@@ -0,0 +1,395 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import sqlite3
+from unittest.mock import call, patch
+
+from fixtures import EnvironmentVariable, FakeLogger, MockPatchObject, TempDir
+from testtools import TestCase
+from testtools.matchers import Equals, FileExists
+
+from autopilot import _timing, _tracing
+
+
+class SplitScenarioTests(TestCase):
+
+    def test_test_without_scenario(self):
+        self.assertThat(
+            _timing.split_scenario_from_test_id('foo.Bar.test_baz'),
+            Equals(('foo.Bar.test_baz', ''))
+        )
+
+    def test_test_with_scenario(self):
+        self.assertThat(
+            _timing.split_scenario_from_test_id('foo.Bar.test_baz(qt,gtk)'),
+            Equals(('foo.Bar.test_baz', 'qt,gtk'))
+        )
+
+    def test_scenario_names_may_contain_parentheses(self):
+        self.assertThat(
+            _timing.split_scenario_from_test_id('foo.test_baz(a (b))'),
+            Equals(('foo.test_baz', 'a (b)'))
+        )
+
+
+class PhaseTimerTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.phase_timer = _timing._PhaseTimer()
+
+    def test_times_phase(self):
+        with patch.object(_timing.time, 'monotonic', side_effect=[1.0, 3.5]):
+            with self.phase_timer.time_phase('setUp'):
+                pass
+
+        self.assertThat(
+            self.phase_timer.get_durations(),
+            Equals({'setUp': 2.5})
+        )
+
+    def test_repeated_phases_are_added_together(self):
+        with patch.object(
+            _timing.time, 'monotonic', side_effect=[0.0, 1.0, 5.0, 7.0]
+        ):
+            with self.phase_timer.time_phase('dbus'):
+                pass
+            with self.phase_timer.time_phase('dbus'):
+                pass
+
+        self.assertThat(
+            self.phase_timer.get_durations(),
+            Equals({'dbus': 3.0})
+        )
+
+    def test_phase_is_timed_when_it_raises(self):
+        def raise_in_phase():
+            with self.phase_timer.time_phase('test'):
+                raise RuntimeError()
+
+        self.assertRaises(RuntimeError, raise_in_phase)
+        self.assertThat(
+            list(self.phase_timer.get_durations()),
+            Equals(['test'])
+        )
+
+    def test_reset_clears_durations(self):
+        with self.phase_timer.time_phase('test'):
+            pass
+        self.phase_timer.reset()
+
+        self.assertThat(self.phase_timer.get_durations(), Equals({}))
+
+    def test_operations_are_not_recorded_by_default(self):
+        with self.phase_timer.time_phase('dbus', 'query'):
+            pass
+
+        self.assertThat(self.phase_timer.get_operations(), Equals([]))
+
+    def test_records_operations(self):
+        self.phase_timer.recording_operations = True
+        with patch.object(_timing.time, 'monotonic', side_effect=[1.0, 1.5]):
+            with self.phase_timer.time_phase('dbus', 'query') as operation:
+                operation.size = 1024
+
+        [operation] = self.phase_timer.get_operations()
+        self.assertThat(
+            (
+                operation.phase,
+                operation.description,
+                operation.duration,
+                operation.size
+            ),
+            Equals(('dbus', 'query', 0.5, 1024))
+        )
+
+    def test_reset_clears_operations(self):
+        self.phase_timer.recording_operations = True
+        with self.phase_timer.time_phase('test'):
+            pass
+        self.phase_timer.reset()
+
+        self.assertThat(self.phase_timer.get_operations(), Equals([]))
+
+
+class PhaseTracingTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.phase_timer = _timing._PhaseTimer()
+        self.useFixture(MockPatchObject(_tracing, 'HAVE_TRACEPOINT', True))
+
+    def patch_tracepoint(self, name):
+        return self.useFixture(MockPatchObject(_tracing, name)).mock
+
+    def test_traces_query_with_size(self):
+        emit_query_event = self.patch_tracepoint('emit_query_event')
+        with self.phase_timer.time_phase('dbus', 'query') as operation:
+            operation.size = 512
+
+        self.assertThat(
+            emit_query_event.call_args_list,
+            Equals([
+                call('started', 'query', -1),
+                call('ended', 'query', 512),
+            ])
+        )
+
+    def test_traces_sleep_reason(self):
+        emit_sleep_event = self.patch_tracepoint('emit_sleep_event')
+        with self.phase_timer.time_phase('sleep', 'input delay'):
+            pass
+
+        self.assertThat(
+            emit_sleep_event.call_args_list,
+            Equals([
+                call('started', 'input delay'),
+                call('ended', 'input delay'),
+            ])
+        )
+
+    def test_traces_launch_milestones(self):
+        emit_launch_event = self.patch_tracepoint('emit_launch_event')
+        with self.phase_timer.time_phase('launch', 'gedit'):
+            pass
+
+        self.assertThat(
+            emit_launch_event.call_args_list,
+            Equals([
+                call('launch started', 'gedit'),
+                call('launch ended', 'gedit'),
+            ])
+        )
+
+    def test_traces_nothing_without_tracepoint_module(self):
+        self.useFixture(MockPatchObject(_tracing, 'HAVE_TRACEPOINT', False))
+        emit_query_event = self.patch_tracepoint('emit_query_event')
+        with self.phase_timer.time_phase('dbus', 'query'):
+            pass
+
+        self.assertFalse(emit_query_event.called)
+
+
+class TimingDatabaseTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = self.useFixture(TempDir()).path
+        self.path = os.path.join(directory, 'cache', 'timings.sqlite')
+        self.database = _timing.TimingDatabase(self.path)
+        self.addCleanup(self.database.close)
+
+    def test_creates_database_file(self):
+        self.assertThat(self.path, FileExists())
+
+    def test_no_recorded_durations(self):
+        self.assertThat(self.database.get_durations(), Equals({}))
+
+    def test_returns_most_recent_duration(self):
+        self.database.record('foo.test_a', {'total': 3.0}, timestamp=1)
+        self.database.record('foo.test_a', {'total': 5.0}, timestamp=2)
+
+        self.assertThat(
+            self.database.get_durations(),
+            Equals({'foo.test_a': 5.0})
+        )
+
+    def test_adds_scenario_durations_together(self):
+        self.database.record('foo.test_a(one)', {'total': 3.0})
+        self.database.record('foo.test_a(two)', {'total': 4.0})
+
+        self.assertThat(
+            self.database.get_durations(),
+            Equals({'foo.test_a': 7.0})
+        )
+
+    def test_durations_are_per_phase(self):
+        self.database.record('foo.test_a', {'total': 3.0, 'setUp': 1.0})
+
+        self.assertThat(
+            self.database.get_durations('setUp'),
+            Equals({'foo.test_a': 1.0})
+        )
+
+    def test_durations_persist(self):
+        self.database.record('foo.test_a', {'total': 3.0})
+        self.database.close()
+
+        with _timing.TimingDatabase(self.path) as database:
+            self.assertThat(
+                database.get_durations(),
+                Equals({'foo.test_a': 3.0})
+            )
+
+
+class LastRunTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = self.useFixture(TempDir()).path
+        self.database = _timing.TimingDatabase(
+            os.path.join(directory, 'timings.sqlite')
+        )
+        self.addCleanup(self.database.close)
+
+    def test_no_recorded_runs(self):
+        self.assertThat(self.database.get_last_runs(), Equals({}))
+
+    def test_returns_most_recent_outcome(self):
+        self.database.record('foo.test_a', {'total': 1.0}, 'fail', 1)
+        self.database.record('foo.test_a', {'total': 1.0}, 'success', 2)
+
+        self.assertThat(
+            self.database.get_last_runs(),
+            Equals({'foo.test_a': _timing.LastRun(False, 2)})
+        )
+
+    def test_errors_are_failures(self):
+        self.database.record('foo.test_a', {'total': 1.0}, 'error', 1)
+
+        self.assertTrue(self.database.get_last_runs()['foo.test_a'].failed)
+
+    def test_test_failed_if_any_scenario_failed(self):
+        self.database.record('foo.test_a(one)', {'total': 1.0}, 'fail', 1)
+        self.database.record('foo.test_a(two)', {'total': 1.0}, 'success', 2)
+
+        self.assertThat(
+            self.database.get_last_runs(),
+            Equals({'foo.test_a': _timing.LastRun(True, 2)})
+        )
+
+    def test_only_total_phase_is_used(self):
+        self.database.record(
+            'foo.test_a', {'total': 1.0, 'setUp': 0.5}, 'success', 1
+        )
+
+        self.assertThat(len(self.database.get_last_runs()), Equals(1))
+
+    def test_recorded_last_runs_of_missing_database(self):
+        directory = self.useFixture(TempDir()).path
+
+        self.assertThat(
+            _timing.get_recorded_last_runs(
+                os.path.join(directory, 'missing.sqlite')
+            ),
+            Equals({})
+        )
+
+
+class AttemptCountsTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = self.useFixture(TempDir()).path
+        self.database = _timing.TimingDatabase(
+            os.path.join(directory, 'timings.sqlite')
+        )
+        self.addCleanup(self.database.close)
+
+    def test_no_recorded_runs(self):
+        self.assertThat(self.database.get_attempt_counts(), Equals({}))
+
+    def test_counts_passes_and_failures_per_attempt(self):
+        self.database.record('foo.test_a', {'total': 1.0}, 'fail', 1)
+        self.database.record('foo.test_a', {'total': 1.0}, 'success', 2, 2)
+        self.database.record('foo.test_a', {'total': 1.0}, 'error', 3)
+        self.database.record('foo.test_a', {'total': 1.0}, 'fail', 4, 2)
+
+        self.assertThat(
+            self.database.get_attempt_counts(),
+            Equals({
+                'foo.test_a': {
+                    1: _timing.AttemptCounts(passed=0, failed=2),
+                    2: _timing.AttemptCounts(passed=1, failed=1),
+                },
+            })
+        )
+
+    def test_skips_are_not_counted(self):
+        self.database.record('foo.test_a', {'total': 1.0}, 'skip')
+
+        self.assertThat(self.database.get_attempt_counts(), Equals({}))
+
+    def test_adds_attempt_column_to_old_database(self):
+        directory = self.useFixture(TempDir()).path
+        path = os.path.join(directory, 'old.sqlite')
+        connection = sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE timings (test_id TEXT NOT NULL, scenario TEXT NOT "
+            "NULL, phase TEXT NOT NULL, duration REAL NOT NULL, outcome TEXT, "
+            "recorded_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "INSERT INTO timings VALUES ('foo.test_a', '', 'total', 1.0, "
+            "'success', 1)"
+        )
+        connection.commit()
+        connection.close()
+
+        with _timing.TimingDatabase(path) as database:
+            database.record('foo.test_a', {'total': 1.0}, 'fail', 2, 2)
+            counts = database.get_attempt_counts()
+
+        self.assertThat(
+            counts,
+            Equals({
+                'foo.test_a': {
+                    1: _timing.AttemptCounts(passed=1, failed=0),
+                    2: _timing.AttemptCounts(passed=0, failed=1),
+                },
+            })
+        )
+
+
+class GetRecordedDurationsTests(TestCase):
+
+    def test_missing_database_has_no_durations(self):
+        directory = self.useFixture(TempDir()).path
+        path = os.path.join(directory, 'missing.sqlite')
+
+        self.assertThat(_timing.get_recorded_durations(path), Equals({}))
+        self.assertFalse(os.path.exists(path))
+
+    def test_corrupt_database_has_no_durations(self):
+        self.useFixture(FakeLogger())
+        directory = self.useFixture(TempDir()).path
+        path = os.path.join(directory, 'corrupt.sqlite')
+        with open(path, 'w') as f:
+            f.write('not a database' * 100)
+
+        self.assertThat(_timing.get_recorded_durations(path), Equals({}))
+
+    def test_reads_recorded_durations(self):
+        directory = self.useFixture(TempDir()).path
+        path = os.path.join(directory, 'timings.sqlite')
+        with _timing.TimingDatabase(path) as database:
+            database.record('foo.test_a', {'total': 2.0})
+
+        self.assertThat(
+            _timing.get_recorded_durations(path),
+            Equals({'foo.test_a': 2.0})
+        )
+
+    def test_default_path_is_in_cache_directory(self):
+        self.useFixture(EnvironmentVariable('XDG_CACHE_HOME', '/tmp/cache'))
+        self.assertThat(
+            _timing.get_default_database_path(),
+            Equals('/tmp/cache/autopilot/timings.sqlite')
+        )
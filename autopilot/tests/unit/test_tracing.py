@@ -0,0 +1,51 @@
+# -*- Mode: Python; coding: utf-8; indent-tabs-mode: nil; tab-width: 4 -*-
+#
+# Autopilot Functional Test Tool
+# Copyright (C) 2017 Canonical
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+from unittest.mock import Mock, patch
+
+from testtools import TestCase
+from testtools.matchers import Equals, Is
+
+from autopilot import _tracing
+
+
+class GetTracepointTests(TestCase):
+
+    def test_returns_tracepoint_of_extension_module(self):
+        module = Mock()
+        with patch.object(_tracing, '_tracepoint_module', new=module):
+            self.assertThat(
+                _tracing._get_tracepoint('emit_query_event'),
+                Is(module.emit_query_event)
+            )
+
+    def test_missing_extension_module_does_nothing(self):
+        with patch.object(_tracing, '_tracepoint_module', new=None):
+            tracepoint = _tracing._get_tracepoint('emit_query_event')
+
+        self.assertThat(tracepoint, Is(_tracing._do_nothing))
+        self.assertThat(tracepoint('started', 'query', -1), Equals(None))
+
+    def test_tracepoint_missing_from_older_module_does_nothing(self):
+        module = Mock(spec=['emit_test_started', 'emit_test_ended'])
+        with patch.object(_tracing, '_tracepoint_module', new=module):
+            self.assertThat(
+                _tracing._get_tracepoint('emit_sleep_event'),
+                Is(_tracing._do_nothing)
+            )
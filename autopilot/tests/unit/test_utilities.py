@@ -43,6 +43,7 @@ from autopilot.utilities import (
     safe_text_content,
     sleep,
 )
+from autopilot._timing import phase_timer
 
 
 class ElapsedTimeCounter(object):
@@ -96,6 +97,46 @@ class MockableSleepTests(TestCase):
 
             patched_time.sleep.assert_called_once_with(1.0)
 
+    def record_sleep_operations(self):
+        self.addCleanup(setattr, phase_timer, 'recording_operations', False)
+        self.addCleanup(phase_timer.reset)
+        phase_timer.reset()
+        phase_timer.recording_operations = True
+
+    def test_unmocked_sleep_records_reason_and_call_site(self):
+        self.record_sleep_operations()
+        with patch('autopilot.utilities.time'):
+            sleep(1.0, 'input delay')
+
+        [operation] = phase_timer.get_operations()
+        self.assertThat(operation.phase, Equals('sleep'))
+        self.assertThat(
+            operation.description,
+            MatchesRegex(
+                r'input delay at autopilot\.tests\.unit\.test_utilities:\d+$'
+            )
+        )
+
+    def test_event_delay_sleeps_are_tagged_with_their_caller(self):
+        self.record_sleep_operations()
+        with patch('autopilot.utilities.time'):
+            _sleep_for_calculated_delta(1.0, 0.5, 1.0)
+
+        [operation] = phase_timer.get_operations()
+        self.assertThat(
+            operation.description,
+            MatchesRegex(
+                r'event delay at autopilot\.tests\.unit\.test_utilities:\d+$'
+            )
+        )
+
+    def test_mocked_sleep_is_not_recorded(self):
+        self.record_sleep_operations()
+        with sleep.mocked():
+            sleep(1.0, 'input delay')
+
+        self.assertThat(phase_timer.get_operations(), Equals([]))
+
 
 class EventDelayTests(TestCase):
 
@@ -28,6 +28,7 @@ import inspect
 import logging
 import os
 import psutil
+import sys
 import time
 import timeit
 from testtools.content import text_content
@@ -35,6 +36,7 @@ from unittest.mock import Mock
 from functools import wraps
 
 from autopilot.exceptions import BackendException
+from autopilot._timing import SLEEP_PHASE, phase_timer
 
 
 logger = logging.getLogger(__name__)
@@ -400,15 +402,22 @@ class MockableSleep(object):
             sleep(10) # actually does nothing!
             self.assertEqual(mock_sleep.total_time_slept(), 10.0)
 
+    Passing a *reason*, such as 'input delay', tags the sleep in test
+    profiles, along with where it was called from.
+
     """
 
     def __init__(self):
         self._mock_count = 0.0
         self._mocked = False
 
-    def __call__(self, t):
+    def __call__(self, t, reason=None):
         if not self._mocked:
-            time.sleep(t)
+            description = reason
+            if phase_timer.recording_operations:
+                description = _get_sleep_description(reason)
+            with phase_timer.time_phase(SLEEP_PHASE, description):
+                time.sleep(t)
         else:
             self._mock_count += t
 
@@ -434,6 +443,19 @@ class MockableSleep(object):
 sleep = MockableSleep()
 
 
+def _get_sleep_description(reason):
+    """Return the reason for a sleep along with where it was called from,
+    outside this module, as in 'input delay at autopilot.input._X11:206'.
+    """
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+    if frame is None:
+        return reason
+    call_site = '%s:%d' % (frame.f_globals.get('__name__'), frame.f_lineno)
+    return '%s at %s' % (reason or 'sleep', call_site)
+
+
 @decorator
 def compatible_repr(f, *args, **kwargs):
     result = f(*args, **kwargs)
@@ -620,7 +642,7 @@ def _sleep_for_calculated_delta(current_time, last_event_time, gap_duration):
     _raise_if_time_delta_not_sane(current_time, last_event_time)
     time_delta = (last_event_time + gap_duration) - current_time
     if time_delta > 0.0:
-        sleep(time_delta)
+        sleep(time_delta, 'event delay')
         return time_delta
     else:
         return 0.0
@@ -637,6 +659,10 @@ class MockableProcessIter:
         else:
             return self.mocked_process_iter()
 
+    @property
+    def is_mocked(self):
+        return self._mocked
+
     @contextmanager
     def mocked(self, fake_processes):
         self.enable_mock(fake_processes)
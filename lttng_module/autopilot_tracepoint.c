@@ -40,9 +40,108 @@ emit_test_ended(PyObject *self, PyObject *args)
     Py_RETURN_NONE;
 }
 
+static PyObject *
+emit_query_event(PyObject *self, PyObject *args)
+{
+    const char *started_or_ended;
+    const char *query;
+    long long size;
+
+    if(!PyArg_ParseTuple(args, "ssL", &started_or_ended, &query, &size))
+    {
+        return NULL;
+    }
+    tracepoint(com_canonical_autopilot, query_event, started_or_ended, query,
+               (int64_t) size);
+
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+emit_search_event(PyObject *self, PyObject *args)
+{
+    const char *started_or_ended;
+    const char *criteria;
+
+    if(!PyArg_ParseTuple(args, "ss", &started_or_ended, &criteria))
+    {
+        return NULL;
+    }
+    tracepoint(com_canonical_autopilot, search_event, started_or_ended,
+               criteria);
+
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+emit_proxy_event(PyObject *self, PyObject *args)
+{
+    const char *class_name;
+    const char *object_path;
+
+    if(!PyArg_ParseTuple(args, "ss", &class_name, &object_path))
+    {
+        return NULL;
+    }
+    tracepoint(com_canonical_autopilot, proxy_event, class_name, object_path);
+
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+emit_input_event(PyObject *self, PyObject *args)
+{
+    const char *started_or_ended;
+    const char *event;
+
+    if(!PyArg_ParseTuple(args, "ss", &started_or_ended, &event))
+    {
+        return NULL;
+    }
+    tracepoint(com_canonical_autopilot, input_event, started_or_ended, event);
+
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+emit_sleep_event(PyObject *self, PyObject *args)
+{
+    const char *started_or_ended;
+    const char *reason;
+
+    if(!PyArg_ParseTuple(args, "ss", &started_or_ended, &reason))
+    {
+        return NULL;
+    }
+    tracepoint(com_canonical_autopilot, sleep_event, started_or_ended, reason);
+
+    Py_RETURN_NONE;
+}
+
+static PyObject *
+emit_launch_event(PyObject *self, PyObject *args)
+{
+    const char *milestone;
+    const char *application;
+
+    if(!PyArg_ParseTuple(args, "ss", &milestone, &application))
+    {
+        return NULL;
+    }
+    tracepoint(com_canonical_autopilot, launch_event, milestone, application);
+
+    Py_RETURN_NONE;
+}
+
 static PyMethodDef TracepointMethods[] = {
     {"emit_test_started", emit_test_started, METH_VARARGS, "Generate a tracepoint for test started."},
     {"emit_test_ended", emit_test_ended, METH_VARARGS, "Generate a tracepoint for test started."},
+    {"emit_query_event", emit_query_event, METH_VARARGS, "Generate a tracepoint for an introspection query starting or ending."},
+    {"emit_search_event", emit_search_event, METH_VARARGS, "Generate a tracepoint for a proxy object search starting or ending."},
+    {"emit_proxy_event", emit_proxy_event, METH_VARARGS, "Generate a tracepoint for a proxy object being constructed."},
+    {"emit_input_event", emit_input_event, METH_VARARGS, "Generate a tracepoint for an input event starting or ending."},
+    {"emit_sleep_event", emit_sleep_event, METH_VARARGS, "Generate a tracepoint for a sleep starting or ending."},
+    {"emit_launch_event", emit_launch_event, METH_VARARGS, "Generate a tracepoint for an application launch milestone."},
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
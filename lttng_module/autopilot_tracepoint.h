@@ -27,6 +27,69 @@ TRACEPOINT_EVENT(
     )
 )
 
+TRACEPOINT_EVENT(
+    com_canonical_autopilot,
+    query_event,
+    TP_ARGS(const char *, started_or_ended, const char *, query,
+            int64_t, size),
+    /* size is -1 when it isn't known. */
+    TP_FIELDS(
+        ctf_string(started_or_ended, started_or_ended)
+        ctf_string(query, query)
+        ctf_integer(int64_t, size, size)
+    )
+)
+
+TRACEPOINT_EVENT(
+    com_canonical_autopilot,
+    search_event,
+    TP_ARGS(const char *, started_or_ended, const char *, criteria),
+    TP_FIELDS(
+        ctf_string(started_or_ended, started_or_ended)
+        ctf_string(criteria, criteria)
+    )
+)
+
+TRACEPOINT_EVENT(
+    com_canonical_autopilot,
+    proxy_event,
+    TP_ARGS(const char *, class_name, const char *, object_path),
+    TP_FIELDS(
+        ctf_string(class_name, class_name)
+        ctf_string(object_path, object_path)
+    )
+)
+
+TRACEPOINT_EVENT(
+    com_canonical_autopilot,
+    input_event,
+    TP_ARGS(const char *, started_or_ended, const char *, event),
+    TP_FIELDS(
+        ctf_string(started_or_ended, started_or_ended)
+        ctf_string(event, event)
+    )
+)
+
+TRACEPOINT_EVENT(
+    com_canonical_autopilot,
+    sleep_event,
+    TP_ARGS(const char *, started_or_ended, const char *, reason),
+    TP_FIELDS(
+        ctf_string(started_or_ended, started_or_ended)
+        ctf_string(reason, reason)
+    )
+)
+
+TRACEPOINT_EVENT(
+    com_canonical_autopilot,
+    launch_event,
+    TP_ARGS(const char *, milestone, const char *, application),
+    TP_FIELDS(
+        ctf_string(milestone, milestone)
+        ctf_string(application, application)
+    )
+)
+
 #endif /* AUTOPILOT_TRACEPOINT_H */
 
 #include <lttng/tracepoint-event.h>